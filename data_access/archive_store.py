@@ -0,0 +1,202 @@
+import os
+import json
+import zlib
+import shutil
+import hashlib
+import datetime
+
+# ----- FUNCTION DEFINITIONS -----
+
+
+def file_chunks(file_path, chunk_size):
+    """Yield successive chunk_size blocks of file_path (the last may be shorter)."""
+
+    f = open(file_path, 'rb')
+    try:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            yield data
+    finally:
+        f.close()
+
+
+# ----- CLASS DEFINITIONS -----
+
+
+class ArchiveStore():
+    """Content-addressed store of archived directories (e.g. generations of current or simple geodatabases).
+
+    Files are split into fixed size chunks stored zlib-compressed under their sha1 digest, so a chunk shared
+    by any number of archived files or generations is stored once. Each archived directory has a json
+    manifest listing its files and their chunk digests, from which it can be restored.
+    """
+
+    def __init__(self, store_dir, chunk_size=4 * 1024 * 1024, level=6):
+        """Open (or create) store at store_dir; chunk_size in bytes, level is the zlib compression level."""
+
+        self.store_dir = store_dir
+        self.chunk_size = chunk_size
+        self.level = level
+        self.chunk_dir = os.path.join(store_dir, 'chunks')
+        self.manifest_dir = os.path.join(store_dir, 'manifests')
+        for d in [self.chunk_dir, self.manifest_dir]:
+            if not os.path.isdir(d):
+                os.makedirs(d)
+
+    def chunk_path(self, digest):
+        """Return path of stored chunk with digest."""
+
+        result = os.path.join(self.chunk_dir, digest[:2], digest)
+        return result
+
+    def manifest_path(self, name):
+        """Return path of manifest for archive name."""
+
+        result = os.path.join(self.manifest_dir, "%s.json" % name)
+        return result
+
+    def put_chunk(self, data):
+        """Store data unless a chunk with the same digest exists; return (digest, stored bytes written)."""
+
+        digest = hashlib.sha1(data).hexdigest()
+        chunk_path = self.chunk_path(digest)
+        if os.path.isfile(chunk_path):
+            return digest, 0
+        if not os.path.isdir(os.path.dirname(chunk_path)):
+            os.makedirs(os.path.dirname(chunk_path))
+        packed = zlib.compress(data, self.level)
+        # write under a temporary name so an interrupted write never leaves a partial chunk
+        temp_path = "%s.%d.tmp" % (chunk_path, os.getpid())
+        f = open(temp_path, 'wb')
+        f.write(packed)
+        f.close()
+        if os.path.isfile(chunk_path):
+            os.remove(temp_path)
+        else:
+            os.rename(temp_path, chunk_path)
+        return digest, len(packed)
+
+    def get_chunk(self, digest):
+        """Return uncompressed data of stored chunk with digest."""
+
+        f = open(self.chunk_path(digest), 'rb')
+        data = zlib.decompress(f.read())
+        f.close()
+        if hashlib.sha1(data).hexdigest() != digest:
+            raise IOError("Archive chunk %s is corrupt" % digest)
+        return data
+
+    def add_directory(self, dir_path, name):
+        """Archive all files under dir_path (lock files excluded) as name and return its manifest.
+
+        The manifest is written after all chunks, so an interrupted archive is simply not listed.
+        """
+
+        if os.path.isfile(self.manifest_path(name)):
+            raise IOError("Archive %s already exists" % name)
+        files = []
+        total_size = 0
+        stored_size = 0
+        for walk_path, dir_names, file_names in os.walk(dir_path):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                if file_name.endswith('.lock'):
+                    continue
+                file_path = os.path.join(walk_path, file_name)
+                chunks = []
+                for data in file_chunks(file_path, self.chunk_size):
+                    digest, written = self.put_chunk(data)
+                    chunks.append(digest)
+                    stored_size += written
+                size = os.path.getsize(file_path)
+                total_size += size
+                files.append({'path': os.path.relpath(file_path, dir_path).replace(os.sep, '/'),
+                              'size': size,
+                              'chunks': chunks})
+        manifest = {'name': name,
+                    'source': os.path.abspath(dir_path),
+                    'created': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'size': total_size,
+                    'stored': stored_size,
+                    'files': files}
+        temp_path = self.manifest_path(name) + '.tmp'
+        f = open(temp_path, 'w')
+        json.dump(manifest, f, indent=1)
+        f.close()
+        os.rename(temp_path, self.manifest_path(name))
+        return manifest
+
+    def get_manifest(self, name):
+        """Return manifest of archive name."""
+
+        if not os.path.isfile(self.manifest_path(name)):
+            raise IOError("Archive %s does not exist" % name)
+        f = open(self.manifest_path(name))
+        result = json.load(f)
+        f.close()
+        return result
+
+    def find_archive(self, dir_path):
+        """Return name of the archive made from dir_path that holds every file left under dir_path.
+
+        Finds the archive of a directory whose delete (see archive_directory) was interrupted: each file left
+        must be in the archive with the same size and chunk digests. Returns None if dir_path has not been
+        archived with its current content.
+        """
+
+        left = {}
+        for walk_path, dir_names, file_names in os.walk(dir_path):
+            for file_name in file_names:
+                if file_name.endswith('.lock'):
+                    continue
+                file_path = os.path.join(walk_path, file_name)
+                left[os.path.relpath(file_path, dir_path).replace(os.sep, '/')] = file_path
+        digests = {}
+        for name in self.list_names():
+            manifest = self.get_manifest(name)
+            if manifest.get('source') != os.path.abspath(dir_path):
+                continue
+            archived = dict((file_vals['path'], file_vals) for file_vals in manifest['files'])
+            if any(path not in archived or archived[path]['size'] != os.path.getsize(file_path)
+                   for path, file_path in left.items()):
+                continue
+            for path, file_path in left.items():
+                if path not in digests:
+                    digests[path] = [hashlib.sha1(data).hexdigest()
+                                     for data in file_chunks(file_path, self.chunk_size)]
+            if all(archived[path]['chunks'] == digests[path] for path in left):
+                return name
+        return None
+
+    def list_names(self):
+        """Return sorted names of archived directories."""
+
+        result = sorted([os.path.splitext(file_name)[0] for file_name in os.listdir(self.manifest_dir)
+                         if file_name.endswith('.json')])
+        return result
+
+    def restore(self, name, out_dir):
+        """Write files of archive name under out_dir (which must not exist) and return out_dir."""
+
+        manifest = self.get_manifest(name)
+        if os.path.exists(out_dir):
+            raise IOError("Restore directory %s already exists" % out_dir)
+        os.makedirs(out_dir)
+        for file_vals in manifest['files']:
+            file_path = os.path.join(out_dir, *file_vals['path'].split('/'))
+            if not os.path.isdir(os.path.dirname(file_path)):
+                os.makedirs(os.path.dirname(file_path))
+            f = open(file_path, 'wb')
+            for digest in file_vals['chunks']:
+                f.write(self.get_chunk(digest))
+            f.close()
+        return out_dir
+
+    def archive_directory(self, dir_path, name):
+        """Archive dir_path as name, then delete dir_path; return the manifest."""
+
+        result = self.add_directory(dir_path, name)
+        shutil.rmtree(dir_path)
+        return result
@@ -0,0 +1,65 @@
+import os
+import argparse
+import arcpy
+from archive_store import ArchiveStore
+
+
+def message(msg):
+    """Write msg to geoprocessing tool messages and standard output."""
+
+    arcpy.AddMessage(msg)
+    print(msg)
+
+
+def list_archives(store_path):
+    """Write name, date and sizes of each archive in the store at store_path; return the names."""
+
+    store = ArchiveStore(store_path)
+    names = store.list_names()
+    for name in names:
+        manifest = store.get_manifest(name)
+        message("%s  (created %s, %d files, %d bytes, %d new bytes stored)" %
+                (name, manifest['created'], len(manifest['files']), manifest['size'], manifest['stored']))
+    return names
+
+
+def restore_archive(store_path, name, out_path):
+    """Restore archive name from the store at store_path into the new directory out_path."""
+
+    message("Archive Store: %s"
+            "\nArchive: %s"
+            "\nRestore Location: %s" %
+            (store_path,
+             name,
+             out_path))
+
+    message("Restoring archive...")
+    store = ArchiveStore(store_path)
+    store.restore(name, out_path)
+    message("Restored %d files." % len(store.get_manifest(name)['files']))
+
+    return out_path
+
+
+def main(argv=None):
+    """Parse command line (or geoprocessing tool) arguments and list or restore archives."""
+
+    parser = argparse.ArgumentParser(description="List or restore archived city data geodatabases.")
+    parser.add_argument('root_path', help="city data root directory (archive store is archive/store)")
+    parser.add_argument('--restore', dest='name', default=None,
+                        help="archive to restore (e.g. 2024_01_31_093000_current); lists archives if omitted")
+    parser.add_argument('--out', dest='out_path', default=None,
+                        help="restore directory (default: root directory/restored/NAME)")
+    args = parser.parse_args(argv)
+
+    store_path = os.path.join(args.root_path, 'archive', 'store')
+
+    if args.name is None:
+        list_archives(store_path)
+    else:
+        out_path = args.out_path or os.path.join(args.root_path, 'restored', args.name)
+        restore_archive(store_path, args.name, out_path)
+
+
+if __name__ == '__main__':
+    main()
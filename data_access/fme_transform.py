@@ -1,16 +1,75 @@
-import arcpy
+import os
+import hashlib
+import multiprocessing
+import schema_mapper
+from shared import LazyModule
+
+arcpy = LazyModule('arcpy')
+
+# ----- FUNCTION DEFINITIONS -----
+
+
+def native_spec_path(city_name):
+    """Return path of the city's native mapping spec (see schema_mapper) in Transformer.mapping_dir, or None."""
+
+    spec_path = os.path.join(Transformer.mapping_dir, "%s.json" % city_name.lower())
+    result = spec_path if os.path.isfile(spec_path) else None
+    return result
+
+
+def tools_digest(city_name):
+    """Return sha1 of the content of what transforms the city: its native mapping spec, or else the toolbox."""
+
+    digest = hashlib.sha1()
+    f = open(native_spec_path(city_name) or Transformer.tools_path, 'rb')
+    try:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    finally:
+        f.close()
+    result = digest.hexdigest()
+    return result
+
+
+def transform_limit(processes=None, cities=None):
+    """Return number of Transformers that may run at once.
+
+    processes (default: CPU count) is capped at Transformer.max_checkouts, the extension checkouts
+    the license allows at once. Raises RuntimeError if the extension is not available.
+    If every city in cities has a native mapping spec, no extension is needed and processes is not capped.
+    """
+
+    if cities and all(native_spec_path(city_name) for city_name in cities):
+        return max(1, processes or multiprocessing.cpu_count())
+    status = arcpy.CheckExtension("DataInteroperability")
+    if status != "Available":
+        raise RuntimeError("Data Interoperability extension is not available: %s" % status)
+    result = max(1, min(processes or multiprocessing.cpu_count(), Transformer.max_checkouts))
+    return result
+
 
 # ----- CLASS DEFINITIONS -----
 
 
 class Transformer():
-    """Transform datasets using data interoperability tools."""
+    """Transform datasets using data interoperability tools, or native mapping specs where available.
+
+    Each Transformer checks out the extension and imports the toolbox in its own process,
+    when the first city without a native mapping spec is transformed.
+    """
 
+    # extension checkouts the license allows at once (seats of a concurrent-use license)
+    max_checkouts = 4
 
-    def __init__(self):
-        """Set toolbox (.tbx) location and city import tool lookup dictionary."""
+    # toolbox (.tbx) location; read without a Transformer to check whether the tools changed
+    tools_path = r'\\fileserv\USA\GIS\CityDataImport\tools\fme\DataInteropLatest.tbx'
+
+    # directory of native mapping specs (<city>.json, see schema_mapper) used in place of the city tools
+    mapping_dir = r'\\fileserv\USA\GIS\CityDataImport\tools\mappings'
+
+    def __init__(self, use_native=True):
+        """Set city import tool lookup dictionary; use_native=False always runs the city tools."""
 
-        self.tools_path = r'\\fileserv\USA\GIS\CityDataImport\tools\fme\DataInteropLatest.tbx'
         self.tools_dict = {'BEAVERTON':'BeavertonToSimpleSewer_DataInteropLatest',
                            'FORESTGROVE':'ForestGroveToSimpleSewer_DataInteropLatest',
                            'HILLSBORO':'HillsboroToSimpleSewer_DataInteropLatest',
@@ -18,20 +77,26 @@ class Transformer():
                            'TIGARD':'TigardToSimpleSewer_DataInteropLatest',
                            'TUALATIN':'TualatinToSimpleSewer_DataInteropLatest',
                            'CWS':'CwsToSimpleSewer_DataInteropLatest'}
-        self.setup()
+        self.use_native = use_native
+        self.tools_ready = False
         
     def setup(self):
         """configure arcpy to use custom data interoperability tools."""
 
         print("checking out data interoperability extension...")
-        arcpy.CheckOutExtension("DataInteroperability")
+        status = arcpy.CheckOutExtension("DataInteroperability")
+        if status != "CheckedOut":
+            raise RuntimeError("Data Interoperability extension was not checked out: %s" % status)
         print("importing city transformation tools...")
         arcpy.ImportToolbox(self.tools_path)
+        self.tools_ready = True
 
     def city_to_simple(self, city_name, source_dataset, dest_dataset):
         """Transform data from city-provided schema to SimpleSewer schema.
 
         Appropriate tool function name retrieved from class-level lookup dict using city name.
+        Cities with a native mapping spec are mapped by schema_mapper.SchemaMapper instead
+        (unless use_native is False).
 
         Parameters source_dataset and dest_dataset are file-geodatabse (.gdb) paths
 
@@ -39,6 +104,16 @@ class Transformer():
         """
 
         dest_dataset = dest_dataset.replace('.gdb', '')
+        spec_path = native_spec_path(city_name) if self.use_native else None
+
+        if spec_path is not None:
+            mapper = schema_mapper.SchemaMapper(schema_mapper.load_spec(spec_path))
+            counts = mapper.run(source_dataset, dest_dataset + '.gdb')
+            print("mapped %d rows natively (%d values not cast)" % (sum(counts.values()), mapper.cast_errors))
+            return
+
+        if not self.tools_ready:
+            self.setup()
         toolname = self.tools_dict[city_name.upper()]
-        toolfunc = arcpy.__dict__[toolname]
+        toolfunc = getattr(arcpy, toolname)
         toolfunc(source_dataset, dest_dataset)
@@ -1,25 +1,58 @@
 import os
+import json
 import time
-import arcpy
-from xml.dom.minidom import parse
+import hashlib
+from shared import LazyModule, hash_field_names, row_hash, combine_hashes
+from schema_cache import workspace_token
+from schema_reader import get_reader
+
+try:
+    from xml.etree import cElementTree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+
+arcpy = LazyModule('arcpy')
+
+XSI_TYPE = '{http://www.w3.org/2001/XMLSchema-instance}type'
+
+# return text as the xml parser does: plain str unless it has non-ascii characters (python 2)
+def text_value(value=None):
+    if value is None:
+        return value
+    try:
+        return str(value)
+    except UnicodeEncodeError:
+        return value
+
+# return tuple of text values from a stored list
+def text_tuple(values=None):
+    return tuple(text_value(value) for value in values)
 
 # result class accepts two lists as arguments, creates sets from the lists,
-# compares the sets and saves detected differences as instance variables
+# compares the sets and exposes detected differences as instance variables;
+# combined/common/removed/added sets and all list views are computed on first access
 class Result():
 
+    set_views = {'combined': 'get_combined',
+                 'common': 'get_common',
+                 'removed': 'get_removed',
+                 'added': 'get_added'}
+
     def __init__(self, base_list=None, test_list=None):
         self.base_set = set(base_list)
         self.test_set = set(test_list)
-        self.combined_set = self.get_combined()
-        self.common_set = self.get_common()
-        self.removed_set = self.get_removed()
-        self.added_set = self.get_added()
-        self.base_list = list(self.base_set)
-        self.test_list = list(self.test_set)
-        self.combined_list = list(self.combined_set)
-        self.common_list = list(self.common_set)
-        self.removed_list = list(self.removed_set)
-        self.added_list = list(self.added_set)
+
+    # compute a <name>_set or <name>_list view when first requested and keep it
+    def __getattr__(self, attr_name):
+        view_name, _, kind = attr_name.rpartition('_')
+        if kind == 'set' and view_name in self.set_views:
+            value = getattr(self, self.set_views[view_name])()
+        elif kind == 'list' and (view_name in self.set_views or view_name in ('base', 'test')):
+            value = list(getattr(self, view_name + '_set'))
+        else:
+            raise AttributeError(attr_name)
+        setattr(self, attr_name, value)
+        return value
 
     # get all items in base and test sets (union)
     def get_combined(self):
@@ -37,31 +70,145 @@ class Result():
     def get_removed(self):
         return self.base_set - self.test_set    
 
+# streams an esri xml workspace document once and keeps only what comparison needs:
+# (name, field type) per domain, (name, shape type) per feature class and a map of
+# (name, shape type) to the (name, type) field values of that class; parsed elements are dropped as they end
+class WorkspaceSchema():
+
+    def __init__(self, xml_path=None):
+        self.xml_path = xml_path
+        self.domains = []
+        self.feat_classes = []
+        self.class_fields = {}
+        if xml_path is not None:
+            self.parse(xml_path)
+
+    # get schema values as lists for storage (see set_values)
+    def get_values(self):
+        values = {'domains': [list(vals) for vals in self.domains],
+                  'feat_classes': [list(vals) for vals in self.feat_classes],
+                  'class_fields': [[list(fc_vals), [list(vals) for vals in fields]]
+                                   for fc_vals, fields in self.class_fields.items()]}
+        return values
+
+    # get stable hash of the sorted, de-duplicated domain, class and field values;
+    # equal fingerprints mean compare_domains, compare_feat_classes and compare_fields find no changes
+    def get_fingerprint(self):
+        canonical = [sorted(set(self.domains), key=json.dumps),
+                     sorted(set(self.feat_classes), key=json.dumps),
+                     sorted([[fc_vals, sorted(set(fields), key=json.dumps)]
+                             for fc_vals, fields in self.class_fields.items()], key=json.dumps)]
+        fingerprint = hashlib.sha1(json.dumps(canonical).encode('utf-8')).hexdigest()
+        return fingerprint
+
+    # restore schema from values created by get_values()
+    def set_values(self, values=None):
+        self.domains = [text_tuple(vals) for vals in values['domains']]
+        self.feat_classes = [text_tuple(vals) for vals in values['feat_classes']]
+        self.class_fields = dict((text_tuple(fc_vals), [text_tuple(vals) for vals in fields])
+                                 for fc_vals, fields in values['class_fields'])
+
+    # read domain, feature class and field values from the document
+    def parse(self, xml_path=None):
+        self.xml_path = xml_path
+        stack = []
+        feat_class = None
+        for event, elem in ElementTree.iterparse(xml_path, events=('start', 'end')):
+            if event == 'start':
+                stack.append(elem)
+                if elem.tag == 'DataElement' and elem.get(XSI_TYPE) == 'esri:DEFeatureClass':
+                    feat_class = {'element': elem, 'Name': None, 'ShapeType': None, 'fields': []}
+                continue
+
+            stack.pop()
+            parent = stack[-1] if stack else None
+            if feat_class is not None and parent is feat_class['element'] and elem.tag in ('Name', 'ShapeType'):
+                feat_class[elem.tag] = elem.text
+            elif elem.tag == 'Domain':
+                self.domains.append((elem.findtext('DomainName'), elem.findtext('FieldType')))
+                self.release(elem, parent)
+            elif elem.tag == 'Field' and feat_class is not None:
+                feat_class['fields'].append((elem.findtext('Name'), elem.findtext('Type')))
+                self.release(elem, parent)
+            elif elem.tag == 'DataElement':
+                if feat_class is not None and elem is feat_class['element']:
+                    fc_vals = (feat_class['Name'], feat_class['ShapeType'])
+                    self.feat_classes.append(fc_vals)
+                    self.class_fields.setdefault(fc_vals, feat_class['fields'])
+                    feat_class = None
+                self.release(elem, parent)
+
+    # free a processed element and detach it from its parent
+    def release(self, elem=None, parent=None):
+        elem.clear()
+        if parent is not None:
+            parent.remove(elem)
+
 # returns Result instances
 class ResultFactory():
 
     def make_result(self, base_list=None, test_list=None):
         return Result(base_list, test_list)
         
-# compares two esri file geodatabases to detect schema changes
+# compares two esri file geodatabases to detect schema changes;
+# schemas are read directly (schema_reader) with xml export as fallback, or always exported if use_export;
+# with a schema_cache (schema_cache.SchemaCache), unchanged workspaces are not read again
 class CompareGDB():
 
-    def __init__(self, base_data_path=None, test_data_path=None):
+    def __init__(self, base_data_path=None, test_data_path=None, schema_cache=None, use_export=False):
         self.base_data_path = base_data_path
         self.test_data_path = test_data_path
-        self.base_xml_path = self.make_xml_workspace_doc(base_data_path)
-        self.test_xml_path = self.make_xml_workspace_doc(test_data_path)
-        self.base_xml_dom = parse(self.base_xml_path)
-        self.test_xml_dom = parse(self.test_xml_path)
+        self.schema_cache = schema_cache
+        self.use_export = use_export
+        self.schema_sources = {}
+        self.base_schema, self.base_xml_path = self.get_schema(base_data_path)
+        self.test_schema, self.test_xml_path = self.get_schema(test_data_path)
         self.result_factory = ResultFactory()
 
     # removes xml workspace documents created by make_xml_workspace_doc()
     def cleanup(self):
-        if os.path.isfile(self.base_xml_path):
+        if self.base_xml_path and os.path.isfile(self.base_xml_path):
             os.remove(self.base_xml_path)
-        if os.path.isfile(self.test_xml_path):
+        if self.test_xml_path and os.path.isfile(self.test_xml_path):
             os.remove(self.test_xml_path)
 
+    # get schema of a workspace from the cache, a direct reader or an xml export (xml path is None unless exported);
+    # how each workspace was read ('cache', 'direct' or 'export') is kept in schema_sources
+    def get_schema(self, in_data=None):
+        token = None
+        schema = WorkspaceSchema()
+        if self.schema_cache is not None:
+            token = workspace_token(in_data)
+            values = self.schema_cache.get(token)
+            if values is not None:
+                schema.set_values(values)
+                self.schema_sources[in_data] = 'cache'
+                return schema, None
+
+        xml_path = None
+        values = self.read_schema_values(in_data)
+        if values is not None:
+            schema.set_values(values)
+            self.schema_sources[in_data] = 'direct'
+        else:
+            xml_path = self.make_xml_workspace_doc(in_data)
+            schema.parse(xml_path)
+            self.schema_sources[in_data] = 'export'
+        if self.schema_cache is not None:
+            self.schema_cache.put(token, schema.get_values(), in_data)
+        return schema, xml_path
+
+    # read schema values without export; None if export is required or the direct reader fails
+    def read_schema_values(self, in_data=None):
+        reader = None if self.use_export else get_reader(in_data)
+        if reader is None:
+            return None
+        try:
+            values = reader.read(in_data)
+        except Exception:
+            values = None
+        return values
+
     # create a esri xml workspace document for a workspace
     def make_xml_workspace_doc(self, in_data=None):
         out_dir = os.path.split(in_data)[0]
@@ -75,66 +222,24 @@ class CompareGDB():
 
     # detect changes in domains between base and test databases
     def compare_domains(self):
-        base_domain_elems = self.get_domain_elements(self.base_xml_dom)
-        base_domain_vals = [(self.get_child_value(elem, 'DomainName'),
-                             self.get_child_value(elem, 'FieldType'))
-                             for elem in base_domain_elems]
-        test_domain_elems = self.get_domain_elements(self.test_xml_dom)
-        test_domain_vals = [(self.get_child_value(elem, 'DomainName'),
-                             self.get_child_value(elem, 'FieldType'))
-                             for elem in test_domain_elems]
-        result = self.result_factory.make_result(base_domain_vals, test_domain_vals)
+        result = self.result_factory.make_result(self.base_schema.domains, self.test_schema.domains)
         return result
     
     # detect changes in feature classes between base and test databases
     def compare_feat_classes(self):
-        base_feat_class_elems = self.get_feat_class_elements(self.base_xml_dom)
-        base_feat_class_names = [(self.get_child_value(elem, 'Name'),
-                                  self.get_child_value(elem, 'ShapeType'))
-                                 for elem in base_feat_class_elems]
-        test_feat_class_elems = self.get_feat_class_elements(self.test_xml_dom)
-        test_feat_class_names = [(self.get_child_value(elem, 'Name'),
-                                  self.get_child_value(elem, 'ShapeType'))
-                                 for elem in test_feat_class_elems]
-        result = self.result_factory.make_result(base_feat_class_names, test_feat_class_names)
+        result = self.result_factory.make_result(self.base_schema.feat_classes, self.test_schema.feat_classes)
         return result
 
     # detect changes in fields for matching feature classes
-    def compare_fields(self, base_feat_class_element=None, test_feat_class_element=None):
-        base_field_elems = self.get_field_elements(base_feat_class_element)
-        base_field_values = [(self.get_child_value(elem, 'Name'),
-                             self.get_child_value(elem, 'Type'))
-                             for elem in base_field_elems]
-        test_field_elems = self.get_field_elements(test_feat_class_element)
-        test_field_values = [(self.get_child_value(elem, 'Name'),
-                             self.get_child_value(elem, 'Type'))
-                             for elem in test_field_elems]
+    def compare_fields(self, base_field_values=None, test_field_values=None):
         result = self.result_factory.make_result(base_field_values, test_field_values)
         return result
 
-    # get DOM elements for all domains below input element
-    def get_domain_elements(self, xml_dom=None):
-        domain_elems = xml_dom.getElementsByTagName('Domain')        
-        return domain_elems
-
-    # get DOM elements for all feature classes below input element
-    def get_feat_class_elements(self, xml_dom=None):
-        data_elems = xml_dom.getElementsByTagName('DataElement')
-        feat_class_elems = [elem for elem in data_elems
-                            if elem.getAttribute('xsi:type') == 'esri:DEFeatureClass']
-        return feat_class_elems
-
-    # get DOM elements for all fields below input element
-    def get_field_elements(self, feat_class_element=None):
-        field_elems = feat_class_element.getElementsByTagName('Field')
-        return field_elems
-
-    # get child node value by name
-    def get_child_value(self, element=None, child_name=None):
-        child_value = element.getElementsByTagName(child_name)[0].firstChild.nodeValue
-        return child_value
-
-    # create text report with results of comparison
+    # check if base and test schemas have the same fingerprint
+    def is_unchanged(self):
+        return self.base_schema.get_fingerprint() == self.test_schema.get_fingerprint()
+
+    # create text report with results of comparison (no diff if schema fingerprints are equal)
     def make_report(self):
         changes = 0
         report_str = "\n"
@@ -148,6 +253,11 @@ class CompareGDB():
         report_str += "  NAME: %s\n" % (os.path.split(self.base_data_path)[-1])
         report_str += "  PATH: %s\n\n" % (self.base_data_path)
 
+        if self.is_unchanged():
+            report_str += "NO CHANGES DETECTED.\n\n"
+            report_str += "----- END REPORT -----\n"
+            return report_str
+
         domain_result = self.compare_domains()
         if len(domain_result.added_list) > 0:
             report_str += "DOMAINS ADDED:\n"
@@ -177,16 +287,9 @@ class CompareGDB():
             report_str += "\n"
             
         for fc_vals in fc_result.common_list:
-            base_feat_class_element = [elem for elem
-                                       in self.get_feat_class_elements(self.base_xml_dom)
-                                       if (self.get_child_value(elem, 'Name'),
-                                          self.get_child_value(elem, 'ShapeType')) == fc_vals][0]
-            test_feat_class_element = [elem for elem
-                                       in self.get_feat_class_elements(self.test_xml_dom)
-                                       if (self.get_child_value(elem, 'Name'),
-                                          self.get_child_value(elem, 'ShapeType')) == fc_vals][0]
-            fld_result = self.compare_fields(base_feat_class_element, test_feat_class_element)
-            if len(fld_result.added_list + fld_result.removed_list) > 0:
+            fld_result = self.compare_fields(self.base_schema.class_fields[fc_vals],
+                                             self.test_schema.class_fields[fc_vals])
+            if fld_result.added_set or fld_result.removed_set:
                 report_str += "CLASS: %s\n" % str(fc_vals)
                 if len(fld_result.added_list) > 0:
                     report_str += "  FIELDS ADDED:\n"
@@ -204,3 +307,137 @@ class CompareGDB():
             report_str += "NO CHANGES DETECTED.\n\n"
         report_str += "----- END REPORT -----\n"
         return report_str
+
+# get (row count, checksum) of feature class content; each row is hashed from its attribute values
+# (ordered by field name) and its vertices quantized to xy_resolution, then the row hashes are combined
+# in sorted order so the checksum does not depend on row order or object ids (hashes as data_import tile_index)
+def class_checksum(class_path=None, xy_resolution=0.001):
+    field_names = hash_field_names(arcpy.Describe(class_path))
+    row_hashes = []
+    with arcpy.da.SearchCursor(class_path, field_names + ['SHAPE@']) as cursor:
+        for row in cursor:
+            row_hashes.append(row_hash(row[:-1], row[-1], xy_resolution))
+    return len(row_hashes), combine_hashes(row_hashes)
+
+# get ({class name: (row count, checksum)}, number of classes taken from the cache) for feature classes of a
+# workspace; with a schema_cache, checksums are taken from it while the workspace token is unchanged, and
+# computed checksums are stored in it
+def workspace_checksums(in_data=None, class_names=None, xy_resolution=0.001, schema_cache=None):
+    token = workspace_token(in_data) if schema_cache is not None else None
+    checksums = {}
+    cached_classes = 0
+    for dir_path, dir_names, file_names in arcpy.da.Walk(in_data, datatype='FeatureClass'):
+        for file_name in file_names:
+            if class_names and file_name not in class_names:
+                continue
+            cached = schema_cache.get_class_checksum(token, file_name, xy_resolution) if token is not None else None
+            if cached is not None:
+                checksums[file_name] = cached
+                cached_classes += 1
+                continue
+            checksums[file_name] = class_checksum(os.path.join(dir_path, file_name), xy_resolution)
+            if token is not None:
+                schema_cache.put_class_checksum(token, file_name, xy_resolution, checksums[file_name], in_data)
+    return checksums, cached_classes
+
+# get checksum of all feature class content of a workspace, combined from its class checksums
+# (see workspace_checksums); equal for workspaces with the same classes and rows, whatever their files
+def content_checksum(in_data=None, xy_resolution=0.001, schema_cache=None):
+    checksums = workspace_checksums(in_data, None, xy_resolution, schema_cache)[0]
+    digests = ["%s|%d|%s" % (name, count, checksum) for name, (count, checksum) in checksums.items()]
+    return combine_hashes([digest.encode('utf-8') for digest in digests])
+
+# compares feature class content of two esri file geodatabases by per-class checksums
+# (see class_checksum) to find classes whose rows changed; class_names restricts the comparison;
+# with a schema_cache (schema_cache.SchemaCache), checksums of unchanged workspaces are not computed again
+class CompareData():
+
+    def __init__(self, base_data_path=None, test_data_path=None, class_names=None, xy_resolution=0.001,
+                 schema_cache=None):
+        self.base_data_path = base_data_path
+        self.test_data_path = test_data_path
+        self.class_names = class_names
+        self.xy_resolution = xy_resolution
+        self.schema_cache = schema_cache
+        self.cached_classes = 0
+        self.base_checksums = self.get_checksums(base_data_path)
+        self.test_checksums = self.get_checksums(test_data_path)
+        self.result_factory = ResultFactory()
+
+    # get {class name: (row count, checksum)} for feature classes of a workspace, from the cache where the
+    # workspace token is unchanged (the number of cached classes is counted in cached_classes)
+    def get_checksums(self, in_data=None):
+        checksums, cached_classes = workspace_checksums(in_data, self.class_names, self.xy_resolution,
+                                                        self.schema_cache)
+        self.cached_classes += cached_classes
+        return checksums
+
+    # get Result of class names; classes in common_list may still have changed content (see get_changed)
+    def compare_classes(self):
+        result = self.result_factory.make_result(self.base_checksums.keys(), self.test_checksums.keys())
+        return result
+
+    # get sorted names of classes in both workspaces whose checksums differ
+    def get_changed(self):
+        changed = sorted([class_name for class_name in self.compare_classes().common_set
+                          if self.base_checksums[class_name] != self.test_checksums[class_name]])
+        return changed
+
+    # get sorted names of classes in both workspaces with identical content
+    def get_unchanged(self):
+        unchanged = sorted([class_name for class_name in self.compare_classes().common_set
+                            if self.base_checksums[class_name] == self.test_checksums[class_name]])
+        return unchanged
+
+    # write class states ('changed', 'unchanged', 'added', 'removed') as json for import_tool --skip-unchanged
+    def save_changes(self, out_path=None):
+        class_result = self.compare_classes()
+        states = {}
+        for class_name in class_result.added_set:
+            states[class_name] = 'added'
+        for class_name in class_result.removed_set:
+            states[class_name] = 'removed'
+        for class_name in self.get_changed():
+            states[class_name] = 'changed'
+        for class_name in self.get_unchanged():
+            states[class_name] = 'unchanged'
+        f = open(out_path, 'w')
+        json.dump({'base': self.base_data_path, 'test': self.test_data_path, 'classes': states},
+                  f, indent=2, sort_keys=True)
+        f.close()
+
+    # create text report of classes with changed content
+    def make_report(self):
+        changes = 0
+        class_result = self.compare_classes()
+        report_str = "\n"
+        report_str += "----- BEGIN REPORT -----\n\n"
+        report_str += "WORKSPACE CONTENT COMPARISON REPORT: "
+        report_str += "%s\n\n" % time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        report_str += "TEST WORKSPACE:\n"
+        report_str += "  NAME: %s\n" % (os.path.split(self.test_data_path)[-1])
+        report_str += "  PATH: %s\n\n" % (self.test_data_path)
+        report_str += "BASE WORKSPACE:\n"
+        report_str += "  NAME: %s\n" % (os.path.split(self.base_data_path)[-1])
+        report_str += "  PATH: %s\n\n" % (self.base_data_path)
+        for title, class_names in [("CLASSES ADDED", sorted(class_result.added_set)),
+                                   ("CLASSES REMOVED", sorted(class_result.removed_set))]:
+            if len(class_names) > 0:
+                report_str += "%s:\n" % title
+                for class_name in class_names:
+                    report_str += "  %s\n" % class_name
+                    changes += 1
+                report_str += "\n"
+        changed = self.get_changed()
+        if len(changed) > 0:
+            report_str += "CLASSES CHANGED:\n"
+            for class_name in changed:
+                report_str += "  %s (rows: %d -> %d)\n" % (class_name,
+                                                           self.base_checksums[class_name][0],
+                                                           self.test_checksums[class_name][0])
+                changes += 1
+            report_str += "\n"
+        if changes == 0:
+            report_str += "NO CHANGES DETECTED.\n\n"
+        report_str += "----- END REPORT -----\n"
+        return report_str
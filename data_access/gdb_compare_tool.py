@@ -1,43 +1,68 @@
+import argparse
 import arcpy
 from gdb_compare import *
+from schema_cache import SchemaCache
 
 
-base_path = arcpy.GetParameterAsText(0)
-test_path = arcpy.GetParameterAsText(1)
-report_path = arcpy.GetParameterAsText(2)
+def message(msg):
+    """Write msg to geoprocessing tool messages and standard output."""
 
-msg = ("Base Geodatabase: %s"
-       "\nTest Geodatabase: %s"
-       "\nReport Location: %s" %
-       (base_path,
-        test_path,
-        report_path))
+    arcpy.AddMessage(msg)
+    print(msg)
 
-arcpy.AddMessage(msg)
-print(msg)
 
-msg = ("Comparing geodatabases...")
-arcpy.AddMessage(msg)
-print(msg)
+def compare_to_report(base_path, test_path, report_path, cache_path=None, use_export=False):
+    """Compare base and test geodatabase schemas, write the report to report_path and return it.
 
-comp = CompareGDB(base_path, test_path)
+    With cache_path, schemas of unchanged geodatabases are read from that schema cache database.
+    With use_export, schemas are always read from exported xml workspace documents.
+    """
 
-msg = ("Creating report...")
-arcpy.AddMessage(msg)
-print(msg)
+    msg = ("Base Geodatabase: %s"
+           "\nTest Geodatabase: %s"
+           "\nReport Location: %s" %
+           (base_path,
+            test_path,
+            report_path))
+    message(msg)
 
-report = comp.make_report()
+    message("Comparing geodatabases...")
+    cache = SchemaCache(cache_path) if cache_path else None
+    comp = CompareGDB(base_path, test_path, cache, use_export)
+    message("Schema sources: base %s, test %s" % (comp.schema_sources[base_path], comp.schema_sources[test_path]))
 
-msg = ("Writing report...")
-arcpy.AddMessage(msg)
-print(msg)
+    try:
+        message("Creating report...")
+        report = comp.make_report()
 
-f = open(report_path, 'w')
-f.write(report)
-f.close()
+        message("Writing report...")
+        f = open(report_path, 'w')
+        f.write(report)
+        f.close()
+    finally:
+        message("Cleaning up...")
+        comp.cleanup()
+        if cache is not None:
+            cache.close()
 
-msg = ("Cleaning up...")
-arcpy.AddMessage(msg)
-print(msg)
+    return report
 
-comp.cleanup()
+
+def main(argv=None):
+    """Parse command line (or geoprocessing tool) arguments and run the comparison."""
+
+    parser = argparse.ArgumentParser(description="Compare the schemas of two file geodatabases.")
+    parser.add_argument('base_path', help="base geodatabase path")
+    parser.add_argument('test_path', help="test geodatabase path")
+    parser.add_argument('report_path', help="output report file path")
+    parser.add_argument('--cache', dest='cache_path', default=None,
+                        help="schema cache database; unchanged geodatabases are not read again")
+    parser.add_argument('--export', dest='use_export', action='store_true',
+                        help="read schemas from exported xml workspace documents instead of directly")
+    args = parser.parse_args(argv)
+
+    compare_to_report(args.base_path, args.test_path, args.report_path, args.cache_path, args.use_export)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import os
+import time
+import argparse
+import arcpy
+import schema_mapper
+import fme_transform
+from gdb_compare import CompareData
+
+
+def message(msg):
+    """Write msg to geoprocessing tool messages and standard output."""
+
+    arcpy.AddMessage(msg)
+    print(msg)
+
+
+def timed(func, *args):
+    """Return (result, wall seconds) of func(*args)."""
+
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+def run_benchmark(city_name, source_path, out_dir, spec_path=None, repeat=3):
+    """Transform source_path with the city's FME tool and with its native mapping spec, repeat times each.
+
+    Outputs are written to out_dir (fme_<n>.gdb, native_<n>.gdb), and the last outputs are compared by
+    class content checksums. Returns {'fme': [seconds], 'native': [seconds], 'fme_setup': seconds,
+    'changed': [classes whose content differs]}.
+    """
+
+    spec_path = spec_path or fme_transform.native_spec_path(city_name)
+    if spec_path is None:
+        raise IOError("No native mapping spec for %s in %s" % (city_name, fme_transform.Transformer.mapping_dir))
+
+    message("City: %s"
+            "\nSource Geodatabase: %s"
+            "\nMapping Spec: %s"
+            "\nOutput Directory: %s" %
+            (city_name,
+             source_path,
+             spec_path,
+             out_dir))
+
+    arcpy.env.overwriteOutput = True
+    results = {'fme': [], 'native': []}
+
+    # extension checkout and toolbox import are timed separately from the transforms
+    trans = fme_transform.Transformer(use_native=False)
+    setup_result, results['fme_setup'] = timed(trans.setup)
+    message("FME setup: %.2f s" % results['fme_setup'])
+
+    mapper = schema_mapper.SchemaMapper(schema_mapper.load_spec(spec_path))
+
+    for n in range(repeat):
+        fme_path = os.path.join(out_dir, "fme_%d.gdb" % n)
+        fme_result, seconds = timed(trans.city_to_simple, city_name, source_path, fme_path)
+        results['fme'].append(seconds)
+        message("FME run %d: %.2f s" % (n + 1, seconds))
+
+        native_path = os.path.join(out_dir, "native_%d.gdb" % n)
+        counts, seconds = timed(mapper.run, source_path, native_path)
+        results['native'].append(seconds)
+        message("Native run %d: %.2f s (%d rows, %d values not cast)" %
+                (n + 1, seconds, sum(counts.values()), mapper.cast_errors))
+
+    message("Comparing outputs...")
+    comp = CompareData(fme_path, native_path)
+    class_result = comp.compare_classes()
+    results['changed'] = comp.get_changed() + sorted(class_result.added_set | class_result.removed_set)
+    message(comp.make_report())
+
+    best_fme = min(results['fme'])
+    best_native = min(results['native'])
+    message("Best FME: %.2f s, best native: %.2f s, speedup %.1fx (%.1fx with FME setup)" %
+            (best_fme, best_native, best_fme / max(best_native, 1e-6),
+             (best_fme + results['fme_setup']) / max(best_native, 1e-6)))
+
+    return results
+
+
+def main(argv=None):
+    """Parse command line (or geoprocessing tool) arguments and run the benchmark."""
+
+    parser = argparse.ArgumentParser(description="Benchmark a city's FME transform against its native mapping.")
+    parser.add_argument('city_name', help="city name (e.g. TIGARD)")
+    parser.add_argument('source_path', help="city (current) geodatabase path")
+    parser.add_argument('out_dir', help="directory for output geodatabases")
+    parser.add_argument('--spec', dest='spec_path', default=None,
+                        help="native mapping spec (default: <city>.json in the mapping directory)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs of each transform")
+    args = parser.parse_args(argv)
+
+    run_benchmark(args.city_name, args.source_path, args.out_dir, args.spec_path, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
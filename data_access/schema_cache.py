@@ -0,0 +1,130 @@
+import os
+import json
+import sqlite3
+import datetime
+from shared import workspace_token
+
+# ----- FUNCTION DEFINITIONS -----
+
+
+def workspace_key(workspace_path):
+    """Return normalized absolute path used as cache key."""
+
+    result = os.path.normcase(os.path.abspath(workspace_path))
+    return result
+
+
+# ----- CLASS DEFINITIONS -----
+
+
+class SchemaCache():
+    """Parsed workspace schema summaries stored in SQLite, keyed by workspace change token (workspace_token).
+
+    Tokens do not depend on the workspace path, so a renamed or copied workspace is found in the cache.
+    """
+
+    def __init__(self, cache_path):
+        """Open (or create) cache database at cache_path (may be shared by several processes)."""
+
+        self.cache_path = cache_path
+        self.conn = sqlite3.connect(self.cache_path, timeout=60)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS schemas ("
+            "token TEXT PRIMARY KEY, schema TEXT, workspace TEXT, updated TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS class_checksums ("
+            "token TEXT, class_name TEXT, xy_resolution REAL, row_count INTEGER, checksum TEXT, "
+            "workspace TEXT, updated TEXT, PRIMARY KEY (token, class_name, xy_resolution))")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS dataset_signatures ("
+            "dataset TEXT PRIMARY KEY, signature TEXT, workspace TEXT, updated TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS transforms ("
+            "city TEXT PRIMARY KEY, input_key TEXT, output TEXT, updated TEXT)")
+        self.conn.commit()
+
+    def get(self, token):
+        """Return cached schema values of the workspace content with token, or None if missing."""
+
+        if token is None:
+            return None
+        row = self.conn.execute("SELECT schema FROM schemas WHERE token=?", (token,)).fetchone()
+        if row is None:
+            return None
+        result = json.loads(row[0])
+        return result
+
+    def put(self, token, schema_values, workspace_path):
+        """Store schema values under token; older entries stored for workspace_path are removed."""
+
+        if token is None:
+            return
+        updated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.conn.execute("DELETE FROM schemas WHERE workspace=?", (workspace_key(workspace_path),))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO schemas VALUES (?, ?, ?, ?)",
+            (token, json.dumps(schema_values), workspace_key(workspace_path), updated))
+        self.conn.commit()
+
+    def get_class_checksum(self, token, class_name, xy_resolution):
+        """Return cached (row count, checksum) of class_name in the workspace content with token, or None."""
+
+        if token is None:
+            return None
+        row = self.conn.execute(
+            "SELECT row_count, checksum FROM class_checksums WHERE token=? AND class_name=? AND xy_resolution=?",
+            (token, class_name, xy_resolution)).fetchone()
+        result = tuple(row) if row is not None else None
+        return result
+
+    def put_class_checksum(self, token, class_name, xy_resolution, checksum, workspace_path):
+        """Store (row count, checksum) of class_name under token; entries of older tokens of workspace_path are removed."""
+
+        if token is None:
+            return
+        updated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.conn.execute("DELETE FROM class_checksums WHERE workspace=? AND token<>?",
+                          (workspace_key(workspace_path), token))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO class_checksums VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (token, class_name, xy_resolution, checksum[0], checksum[1], workspace_key(workspace_path), updated))
+        self.conn.commit()
+
+    def get_dataset_signature(self, dataset):
+        """Return (signature, workspace) last stored for server dataset, or None."""
+
+        row = self.conn.execute(
+            "SELECT signature, workspace FROM dataset_signatures WHERE dataset=?", (dataset,)).fetchone()
+        result = tuple(row) if row is not None else None
+        return result
+
+    def put_dataset_signature(self, dataset, signature, workspace_path):
+        """Store change signature of server dataset and the workspace its data was staged to."""
+
+        updated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.conn.execute(
+            "INSERT OR REPLACE INTO dataset_signatures VALUES (?, ?, ?, ?)",
+            (dataset, signature, workspace_key(workspace_path), updated))
+        self.conn.commit()
+
+    def get_transform(self, city):
+        """Return (input key, output workspace) of the last transform stored for city, or None."""
+
+        row = self.conn.execute(
+            "SELECT input_key, output FROM transforms WHERE city=?", (city,)).fetchone()
+        result = tuple(row) if row is not None else None
+        return result
+
+    def put_transform(self, city, input_key, output_path):
+        """Store key of the inputs (see CityDataImporter.transform_key) city's output workspace was made from."""
+
+        updated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.conn.execute(
+            "INSERT OR REPLACE INTO transforms VALUES (?, ?, ?, ?)",
+            (city, input_key, workspace_key(output_path), updated))
+        self.conn.commit()
+
+    def close(self):
+        """Close cache database."""
+
+        self.conn.close()
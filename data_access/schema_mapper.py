@@ -0,0 +1,215 @@
+import os
+import json
+import datetime
+from shared import LazyModule
+
+arcpy = LazyModule('arcpy')
+
+# maps a city geodatabase to the SimpleSewer schema with arcpy cursors, in place of an FME city transform,
+# from a json spec:
+# {"template": <empty SimpleSewer file geodatabase copied to the output>,
+#  "domains": {<name>: {<city code>: <SimpleSewer code>, ...}, ...},
+#  "classes": [{"source": <class path in city gdb>, "target": <class path in SimpleSewer gdb>,
+#               "where": <optional where clause on source>,
+#               "fields": {<target field>: <source field>
+#                          or {"source": <source field> or "value": <constant>,
+#                              "type": "int" | "float" | "str" | "date",
+#                              "domain": <name of code map>, "default": <value for null or unmapped>}}}]}
+# geometries are copied (projected to the target spatial reference on read); values that cannot be cast
+# are written as null and counted; each class is written in one edit session, one edit operation per
+# insert_batch_rows rows, and a failed class discards its edits and deletes the output geodatabase
+
+# ----- FUNCTION DEFINITIONS -----
+
+date_formats = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%m/%d/%Y', '%Y%m%d']
+insert_batch_rows = 5000
+
+
+def to_date(value):
+    """Return value as datetime, parsing text in one of date_formats."""
+
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day)
+    text = str(value).strip()
+    for date_format in date_formats:
+        try:
+            return datetime.datetime.strptime(text, date_format)
+        except ValueError:
+            pass
+    raise ValueError("Not a date: %r" % value)
+
+
+def to_int(value):
+    """Return value as int (text with a decimal point is accepted)."""
+
+    return int(float(value))
+
+
+def to_text(value):
+    """Return value as text; whole floats lose their decimal part (e.g. codes stored as doubles)."""
+
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return value if isinstance(value, type(u'')) else str(value)
+
+
+casts = {'int': to_int,
+         'float': float,
+         'str': to_text,
+         'date': to_date}
+
+
+def load_spec(spec_path):
+    """Return mapping spec read from json file spec_path; raises ValueError if it is incomplete."""
+
+    f = open(spec_path)
+    spec = json.load(f)
+    f.close()
+    if 'classes' not in spec:
+        raise ValueError("Mapping spec %s has no classes" % spec_path)
+    domains = spec.get('domains', {})
+    for class_spec in spec['classes']:
+        for key in ['source', 'target', 'fields']:
+            if key not in class_spec:
+                raise ValueError("Class mapping in %s has no %s" % (spec_path, key))
+        for target_field, field_spec in class_spec['fields'].items():
+            if not isinstance(field_spec, dict):
+                continue
+            if ('source' in field_spec) == ('value' in field_spec):
+                raise ValueError("Field %s in %s needs one of source or value" % (target_field, spec_path))
+            if field_spec.get('type', 'str') not in casts:
+                raise ValueError("Field %s in %s has unknown type %s" %
+                                 (target_field, spec_path, field_spec['type']))
+            if 'domain' in field_spec and field_spec['domain'] not in domains:
+                raise ValueError("Field %s in %s uses unknown domain %s" %
+                                 (target_field, spec_path, field_spec['domain']))
+    return spec
+
+
+# ----- CLASS DEFINITIONS -----
+
+
+class SchemaMapper():
+    """Streams rows of a city geodatabase through a mapping spec into a copy of the SimpleSewer template."""
+
+    def __init__(self, spec):
+        """Set mapping spec (see load_spec)."""
+
+        self.spec = spec
+        self.domains = spec.get('domains', {})
+        self.cast_errors = 0
+
+    def compile_class(self, class_spec):
+        """Return (source field names, target field names, row function) of a class mapping.
+
+        The row function maps a source row (values in source field order, shape last) to a target row.
+        """
+
+        source_fields = []
+        target_fields = []
+        getters = []
+        for target_field in sorted(class_spec['fields']):
+            field_spec = class_spec['fields'][target_field]
+            if not isinstance(field_spec, dict):
+                field_spec = {'source': field_spec}
+            target_fields.append(target_field)
+            if 'value' in field_spec:
+                getters.append(self.make_constant(field_spec['value']))
+                continue
+            if field_spec['source'] not in source_fields:
+                source_fields.append(field_spec['source'])
+            getters.append(self.make_getter(source_fields.index(field_spec['source']), field_spec))
+
+        def map_row(row):
+            return [getter(row) for getter in getters] + [row[-1]]
+
+        return source_fields, target_fields, map_row
+
+    def make_constant(self, value):
+        """Return getter of a constant target value."""
+
+        def get_value(row):
+            return value
+
+        return get_value
+
+    def make_getter(self, index, field_spec):
+        """Return getter that casts (and remaps, with a domain) the source value at index."""
+
+        cast = casts[field_spec.get('type', 'str')]
+        code_map = self.domains.get(field_spec.get('domain'))
+        has_default = 'default' in field_spec
+        default = field_spec.get('default')
+
+        def get_value(row):
+            value = row[index]
+            if value is None or (isinstance(value, (type(u''), str)) and not value.strip()):
+                return default if has_default else None
+            if code_map is not None:
+                code = to_text(value)
+                if code in code_map:
+                    value = code_map[code]
+                elif has_default:
+                    value = default
+            if value is None:
+                return None
+            try:
+                return cast(value)
+            except (TypeError, ValueError):
+                self.cast_errors += 1
+                return None
+
+        return get_value
+
+    def map_class(self, class_spec, source_gdb, dest_gdb):
+        """Copy mapped rows of one class from source_gdb to dest_gdb and return the row count.
+
+        Rows are inserted in one edit session, one edit operation per insert_batch_rows rows;
+        if a row fails, the session is stopped without saving and the error is raised.
+        """
+
+        source_path = os.path.join(source_gdb, *class_spec['source'].split('/'))
+        target_path = os.path.join(dest_gdb, *class_spec['target'].split('/'))
+        source_fields, target_fields, map_row = self.compile_class(class_spec)
+        spatial_reference = getattr(arcpy.Describe(target_path), 'spatialReference', None)
+        count = 0
+        edit = arcpy.da.Editor(dest_gdb)
+        edit.startEditing(False, False)
+        try:
+            with arcpy.da.SearchCursor(source_path, source_fields + ['SHAPE@'], class_spec.get('where'),
+                                       spatial_reference=spatial_reference) as scur:
+                with arcpy.da.InsertCursor(target_path, target_fields + ['SHAPE@']) as icur:
+                    edit.startOperation()
+                    for row in scur:
+                        icur.insertRow(map_row(row))
+                        count += 1
+                        if count % insert_batch_rows == 0:
+                            edit.stopOperation()
+                            edit.startOperation()
+                    edit.stopOperation()
+        except Exception:
+            edit.stopEditing(False)
+            raise
+        edit.stopEditing(True)
+        return count
+
+    def run(self, source_gdb, dest_gdb):
+        """Copy the template to dest_gdb, map every class into it and return {target class: row count}.
+
+        If a class fails, dest_gdb is deleted and RuntimeError names the class and the error.
+        """
+
+        arcpy.Copy_management(self.spec['template'], dest_gdb)
+        self.cast_errors = 0
+        result = {}
+        for class_spec in self.spec['classes']:
+            try:
+                count = self.map_class(class_spec, source_gdb, dest_gdb)
+            except Exception as e:
+                arcpy.Delete_management(dest_gdb)
+                raise RuntimeError("Mapping %s to %s failed (output %s deleted): %s" %
+                                   (class_spec['source'], class_spec['target'], dest_gdb, e))
+            result[class_spec['target']] = result.get(class_spec['target'], 0) + count
+        return result
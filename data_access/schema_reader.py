@@ -0,0 +1,145 @@
+import os
+import sqlite3
+from shared import LazyModule
+
+arcpy = LazyModule('arcpy')
+
+# schema readers return the values CompareGDB compares, without exporting an xml workspace document:
+# {'domains': [[name, field type], ...],
+#  'feat_classes': [[name, shape type], ...],
+#  'class_fields': [[[name, shape type], [[field name, field type], ...]], ...]}
+# type names follow the xml workspace document (esriFieldType*, esriGeometry*) so results match an export
+
+# ----- CLASS DEFINITIONS -----
+
+
+# reads a file geodatabase through arcpy describe and catalog functions
+class ArcpySchemaReader():
+
+    domain_types = {'Short': 'esriFieldTypeSmallInteger',
+                    'Long': 'esriFieldTypeInteger',
+                    'BigInteger': 'esriFieldTypeBigInteger',
+                    'Float': 'esriFieldTypeSingle',
+                    'Double': 'esriFieldTypeDouble',
+                    'Text': 'esriFieldTypeString',
+                    'Date': 'esriFieldTypeDate'}
+
+    field_types = {'Guid': 'esriFieldTypeGUID',
+                   'GlobalID': 'esriFieldTypeGlobalID'}
+
+    # get schema values of a workspace
+    def read(self, workspace_path=None):
+        domains = [[domain.name, self.domain_types.get(domain.type, 'esriFieldType' + domain.type)]
+                   for domain in arcpy.da.ListDomains(workspace_path)]
+        feat_classes = []
+        class_fields = []
+        for dir_path, dir_names, file_names in arcpy.da.Walk(workspace_path, datatype='FeatureClass'):
+            for file_name in file_names:
+                desc = arcpy.Describe(os.path.join(dir_path, file_name))
+                fc_vals = [desc.name, 'esriGeometry' + desc.shapeType]
+                fields = [[field.name, self.field_types.get(field.type, 'esriFieldType' + field.type)]
+                          for field in desc.fields]
+                feat_classes.append(fc_vals)
+                class_fields.append([fc_vals, fields])
+        values = {'domains': domains, 'feat_classes': feat_classes, 'class_fields': class_fields}
+        return values
+
+
+# reads a geopackage (or other sqlite database with geopackage metadata tables) through sqlite3;
+# used as a local stand-in for file geodatabases, e.g. to compare test workspaces without arcpy
+class GeoPackageSchemaReader():
+
+    geometry_types = {'POINT': 'esriGeometryPoint',
+                      'MULTIPOINT': 'esriGeometryMultipoint',
+                      'LINESTRING': 'esriGeometryPolyline',
+                      'MULTILINESTRING': 'esriGeometryPolyline',
+                      'POLYGON': 'esriGeometryPolygon',
+                      'MULTIPOLYGON': 'esriGeometryPolygon'}
+
+    column_types = {'INTEGER': 'esriFieldTypeInteger',
+                    'INT': 'esriFieldTypeInteger',
+                    'MEDIUMINT': 'esriFieldTypeInteger',
+                    'SMALLINT': 'esriFieldTypeSmallInteger',
+                    'TINYINT': 'esriFieldTypeSmallInteger',
+                    'DOUBLE': 'esriFieldTypeDouble',
+                    'REAL': 'esriFieldTypeDouble',
+                    'FLOAT': 'esriFieldTypeSingle',
+                    'TEXT': 'esriFieldTypeString',
+                    'DATE': 'esriFieldTypeDate',
+                    'DATETIME': 'esriFieldTypeDate',
+                    'BLOB': 'esriFieldTypeBlob'}
+
+    # get schema values of a workspace
+    def read(self, workspace_path=None):
+        if not os.path.isfile(workspace_path):
+            raise IOError("GeoPackage %s does not exist" % workspace_path)
+        conn = sqlite3.connect(workspace_path)
+        try:
+            geometry_columns = dict((table_name, (column_name, geometry_type))
+                                    for table_name, column_name, geometry_type in conn.execute(
+                                        "SELECT table_name, column_name, geometry_type_name "
+                                        "FROM gpkg_geometry_columns"))
+            feat_classes = []
+            class_fields = []
+            column_types = {}
+            for table_name, in conn.execute(
+                    "SELECT table_name FROM gpkg_contents WHERE data_type='features' ORDER BY table_name"):
+                geometry_column, geometry_type = geometry_columns[table_name]
+                fc_vals = [table_name, self.geometry_types.get(geometry_type.upper(), 'esriGeometryAny')]
+                fields = []
+                for cid, name, column_type, notnull, default, pk in conn.execute(
+                        'PRAGMA table_info("%s")' % table_name.replace('"', '""')):
+                    if pk:
+                        field_type = 'esriFieldTypeOID'
+                    elif name == geometry_column:
+                        field_type = 'esriFieldTypeGeometry'
+                    else:
+                        field_type = self.column_types.get(column_type.split('(')[0].upper(), 'esriFieldTypeString')
+                    fields.append([name, field_type])
+                    column_types[(table_name.lower(), name.lower())] = field_type
+                feat_classes.append(fc_vals)
+                class_fields.append([fc_vals, fields])
+            domains = self.read_domains(conn, column_types)
+        finally:
+            conn.close()
+        values = {'domains': domains, 'feat_classes': feat_classes, 'class_fields': class_fields}
+        return values
+
+    # get domains from data column constraints; field type is that of the first column using the constraint
+    def read_domains(self, conn=None, column_types=None):
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        if 'gpkg_data_column_constraints' not in tables:
+            return []
+        domain_types = {}
+        if 'gpkg_data_columns' in tables:
+            for table_name, column_name, constraint_name in conn.execute(
+                    "SELECT table_name, column_name, constraint_name FROM gpkg_data_columns "
+                    "WHERE constraint_name IS NOT NULL ORDER BY table_name, column_name"):
+                field_type = column_types.get((table_name.lower(), column_name.lower()))
+                if field_type is not None:
+                    domain_types.setdefault(constraint_name, field_type)
+        domains = [[name, domain_types.get(name, 'esriFieldTypeString')] for name, in conn.execute(
+                   "SELECT DISTINCT constraint_name FROM gpkg_data_column_constraints ORDER BY constraint_name")]
+        return domains
+
+
+# ----- FUNCTION DEFINITIONS -----
+
+# readers by workspace extension; register_reader() adds or replaces a backend
+readers = {'.gdb': ArcpySchemaReader,
+           '.gpkg': GeoPackageSchemaReader,
+           '.sqlite': GeoPackageSchemaReader}
+
+
+# set reader class used for workspaces with extension (e.g. '.gpkg')
+def register_reader(extension=None, reader_class=None):
+    readers[extension.lower()] = reader_class
+
+
+# get reader instance for a workspace, or None if no backend handles it (use xml export)
+def get_reader(workspace_path=None):
+    extension = os.path.splitext(workspace_path.rstrip('\\/'))[-1].lower()
+    reader_class = readers.get(extension)
+    if reader_class is None:
+        return None
+    return reader_class()
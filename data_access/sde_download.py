@@ -1,19 +1,188 @@
-print("importing Python packages...")
 import os
-import arcpy
+import sys
+import json
 import time
+import shutil
+import traceback
+import multiprocessing
 import gdb_compare
+import schema_cache
+import archive_store
 import fme_transform
+from shared import LazyModule, SdeConnection, LocalConnection
 from tempfile import gettempdir
 
+arcpy = LazyModule('arcpy')
+
+# ----- FUNCTION DEFINITIONS -----
+
+
+def set_pool_executable():
+    """Start pool workers with python.exe when running inside an ArcGIS application (Windows)."""
+
+    if os.name == 'nt' and not os.path.basename(sys.executable).lower().startswith('python'):
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, 'python.exe'))
+
+
+def pool_results(func, tasks, processes=None):
+    """Yield func(task) for each task from a process pool, in order of completion.
+
+    processes defaults to the CPU count and is capped at the number of tasks.
+    """
+
+    processes = min(processes or multiprocessing.cpu_count(), len(tasks))
+    set_pool_executable()
+    pool = multiprocessing.Pool(processes)
+    try:
+        for result in pool.imap_unordered(func, tasks):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def max_value(class_path, field_name):
+    """Return largest value of field_name in class_path (None if empty), sorted by the database."""
+
+    sql_clause = (None, "ORDER BY %s DESC" % field_name)
+    with arcpy.da.SearchCursor(class_path, [field_name], "%s IS NOT NULL" % field_name,
+                               sql_clause=sql_clause) as cursor:
+        for row in cursor:
+            return row[0]
+    return None
+
+
+def dataset_signature(ds_path, checksum=False):
+    """Return change signature (json text) of the feature classes in a server feature dataset.
+
+    Each class contributes its fields, row count, largest object id and, with editor tracking,
+    latest edit date. Classes without a latest edit date also contribute a content checksum
+    (gdb_compare.class_checksum), since in-place edits keep count and object ids unchanged;
+    checksum adds it for every class, which reads every row.
+    """
+
+    values = []
+    for fc_name in sorted(arcpy.ListFeatureClasses(feature_dataset=os.path.basename(ds_path))):
+        class_path = os.path.join(ds_path, fc_name)
+        desc = arcpy.Describe(class_path)
+        fc_vals = [fc_name,
+                   [[field.name, field.type] for field in desc.fields],
+                   int(arcpy.GetCount_management(class_path).getOutput(0)),
+                   max_value(class_path, desc.OIDFieldName)]
+        edited_at = None
+        if getattr(desc, 'editorTrackingEnabled', False) and desc.editedAtFieldName:
+            edited_at = max_value(class_path, desc.editedAtFieldName)
+            fc_vals.append(edited_at)
+        if checksum or edited_at is None:
+            fc_vals.append(gdb_compare.class_checksum(class_path))
+        values.append(fc_vals)
+    result = json.dumps(values, default=str)
+    return result
+
+
+def stage_city(task):
+    """Create a city's staging file geodatabase and fill it with its server datasets in a pool worker.
+
+    task is (city, staging directory, gdb name, sde connection file, dataset names, current gdb path,
+    previous signatures, checksum). previous signatures maps dataset name to the signature of the data
+    in the current gdb; datasets whose server signature still matches are copied from the current gdb
+    instead of downloaded. Each city has its own geodatabase, so workers never write to the same one.
+    Returns (city, downloaded names, carried over names, signatures, None), or the same with traceback
+    text in place of None on failure.
+    """
+
+    city_name, staging_dir, gdb_name, sde_conn_file, ds_names, current_path, previous, checksum = task
+    copied = []
+    carried = []
+    signatures = {}
+    try:
+        arcpy.env.overwriteOutput = False
+        arcpy.CreateFileGDB_management(staging_dir, gdb_name, "CURRENT")
+        arcpy.env.workspace = sde_conn_file
+        for ds_name in ds_names:
+            out_data = os.path.join(staging_dir, "%s.gdb" % gdb_name, ds_name.split('.')[-1])
+            signatures[ds_name] = dataset_signature(os.path.join(sde_conn_file, ds_name), checksum)
+            current_data = os.path.join(current_path, ds_name.split('.')[-1]) if current_path else None
+            if previous.get(ds_name) == signatures[ds_name] and arcpy.Exists(current_data):
+                arcpy.Copy_management(current_data, out_data)
+                carried.append(ds_name)
+            else:
+                arcpy.Copy_management(ds_name, out_data)
+                copied.append(ds_name)
+    except Exception:
+        return (city_name, copied, carried, signatures, traceback.format_exc())
+    return (city_name, copied, carried, signatures, None)
+
+
+# Transformer of this process, created by the first transform_city call in it
+transformer = None
+
+
+def transform_city(task):
+    """Transform a city's current geodatabase to a SIMPLE geodatabase with this process's Transformer.
+
+    task is (city, current gdb path, output gdb path). The Transformer (extension checkout and toolbox
+    import) is created once per process, so pool workers never share one.
+    Returns (city, seconds, None), or (city, seconds, traceback text) if the transform failed.
+    """
+
+    global transformer
+    city_name, gdb_path, out_path = task
+    start = time.time()
+    try:
+        if transformer is None:
+            transformer = fme_transform.Transformer()
+        arcpy.env.overwriteOutput = True
+        transformer.city_to_simple(city_name, gdb_path, out_path)
+    except Exception:
+        return (city_name, time.time() - start, traceback.format_exc())
+    return (city_name, time.time() - start, None)
+
+
+def compare_city(task):
+    """Compare schemas of a city's current (base) and staging (test) geodatabases in a pool worker.
+
+    task is (city, current gdb path, staging gdb path, schema cache path, content changes path).
+    Returns (city, report, changed, content_changed, None), or (city, None, None, None, traceback text)
+    if the comparison failed. changed is False if the staging schema fingerprint equals the current one.
+    With a content changes path, class content checksums (cached per workspace token) are compared and
+    the class states written to it (for import_tool --skip-unchanged); content_changed lists classes with
+    new content. Without one, content is not compared and content_changed is None.
+    """
+
+    city, to_path, from_path, cache_path, changes_path = task
+    content_changed = None
+    cache = schema_cache.SchemaCache(cache_path)
+    try:
+        comp = gdb_compare.CompareGDB(to_path, from_path, cache)
+        try:
+            changed = not comp.is_unchanged()
+            report = comp.make_report()
+        finally:
+            comp.cleanup()
+        if changes_path:
+            data_comp = gdb_compare.CompareData(to_path, from_path, schema_cache=cache)
+            data_comp.save_changes(changes_path)
+            content_changed = data_comp.get_changed() + sorted(data_comp.compare_classes().added_set)
+    except Exception:
+        return (city, None, None, None, traceback.format_exc())
+    finally:
+        cache.close()
+    return (city, report, changed, content_changed, None)
+
+
 # ----- CLASS DEFINITIONS -----
 
 
 class CityDataImporter():
 
-    def __init__(self, root_dir=None):
+    # connection supplies the server workspace (see data_import sde_connection; import_tool.import_city
+    # takes the same connection as its target); by default the gisbug connection
+    # file in the sdeconn directory, which is reused while valid
+    def __init__(self, root_dir=None, connection=None):
         
         self.root_dir = root_dir
+        self.connection = connection
         self.paths = {}
         self.contents = {}
         self.required_dirs = ['staging',
@@ -22,7 +191,8 @@ class CityDataImporter():
                               'reports',
                               'simple',
                               'sdeconn',
-                              'import']
+                              'import',
+                              'cache']
         
         self.import_cities = ['BEAVERTON',
                               'CORNELIUS',
@@ -37,6 +207,7 @@ class CityDataImporter():
     def setup(self):
 
         os.chdir(self.root_dir)
+        self.recover_promotion()
         self.config_paths()
         self.make_sdeconn()
         self.update_contents()
@@ -70,65 +241,109 @@ class CityDataImporter():
 
     def make_sdeconn(self):
 
-        self.update_contents()
-
-        # list existing sde connection files
-        sde_files = [os.path.join(self.paths['sdeconn'], f)
-                     for f in os.listdir(self.paths['sdeconn'])
-                     if os.path.splitext(f)[-1] == '.sde']
-
-        # delete existing sde connection files
-        if len(sde_files) > 0:
-            
-            print("deleting old sde connection file(s)...")
-            for f in sde_files:
-                os.remove(f)
-
-        # new sde connection parameters
-        out_conn_path = self.paths['sdeconn']
-        out_conn_name = "%s_GISBUG_TEMP.sde" % self.today()
-        database_platform = "SQL_SERVER"
-        instance = "washsde.co.washington.or.us,5157"
-        account_authentication = "DATABASE_AUTH"
-        username = "cws"
-        password = "cwsgis"
-        save_user_pass = "SAVE_USERNAME"
-        database = "gisbug"
-        schema = "#"
-        version_type = "TRANSACTIONAL"
-        version = "sde.Default"
-        
-        # create new sde connection file
-        print("creating new sde connection file...")
-        
-        arcpy.env.overwriteOutput = True
-        
-        arcpy.CreateDatabaseConnection_management(out_conn_path,
-                                                  out_conn_name,
-                                                  database_platform,
-                                                  instance,
-                                                  account_authentication,
-                                                  username,
-                                                  password,
-                                                  save_user_pass,
-                                                  database,
-                                                  schema,
-                                                  version_type,
-                                                  version)
-        
-        arcpy.env.overwriteOutput = False
+        if self.connection is not None:
+            return True
+
+        # sde connection parameters
+        self.connection = SdeConnection(self.paths['sdeconn'],
+                                                       'GISBUG',
+                                                       database_platform="SQL_SERVER",
+                                                       instance="washsde.co.washington.or.us,5157",
+                                                       account_authentication="DATABASE_AUTH",
+                                                       username="cws",
+                                                       password="cwsgis",
+                                                       save_user_pass="SAVE_USERNAME",
+                                                       database="gisbug",
+                                                       schema="#",
+                                                       version_type="TRANSACTIONAL",
+                                                       version="sde.Default")
 
         return True
 
     def update_contents(self):
 
         contents = {}
-        for k, v in self.paths.iteritems():
+        for k, v in self.paths.items():
             contents[k] = os.listdir(v)
 
         self.contents = contents
         return True
 
+    # replace a data directory (target_name, e.g. 'current') with source_dir by renaming directories;
+    # the old directory is moved to archive as <time>_<target_name>, so no geodatabase is copied.
+    # the renames are written to a journal first, and an interrupted promotion is completed on next setup
+    def promote(self, source_dir=None, target_name=None):
+
+        stamp = time.strftime("%Y_%m_%d_%H%M%S", time.localtime())
+        archive_dir = os.path.join(self.paths['archive'], "%s_%s" % (stamp, target_name))
+        n = 1
+        while os.path.exists(archive_dir):
+            n += 1
+            archive_dir = os.path.join(self.paths['archive'], "%s_%s_%d" % (stamp, target_name, n))
+
+        journal = {'source': source_dir,
+                   'target': self.paths[target_name],
+                   'archive': archive_dir}
+
+        f = open(os.path.join(self.root_dir, 'promotion.json'), 'w')
+        json.dump(journal, f)
+        f.close()
+
+        # release cached workspace locks held by this process before renaming
+        arcpy.ClearWorkspaceCache_management()
+        self.finish_promotion(journal)
+        self.config_paths()
+
+    # apply the renames of a promotion journal that have not been applied yet, then remove the journal
+    def finish_promotion(self, journal=None):
+
+        if os.path.isdir(journal['source']):
+            if os.path.isdir(journal['target']):
+                print("  archiving directory: %s..." % os.path.basename(journal['archive']))
+                os.rename(journal['target'], journal['archive'])
+            print("  promoting directory: %s..." % os.path.basename(journal['target']))
+            os.rename(journal['source'], journal['target'])
+
+        os.remove(os.path.join(self.root_dir, 'promotion.json'))
+
+    # move directories in archive (promoted-out generations and older geodatabase copies) into the
+    # compressed content-addressed archive store (archive/store, see archive_store.ArchiveStore);
+    # file content unchanged since an earlier archived generation is stored only once; a directory left by an
+    # interrupted delete after packing is removed instead of being packed again
+    def pack_archive(self):
+
+        store = archive_store.ArchiveStore(os.path.join(self.paths['archive'], 'store'))
+
+        for dir_name in sorted(os.listdir(self.paths['archive'])):
+            dir_path = os.path.join(self.paths['archive'], dir_name)
+            if dir_name == 'store' or not os.path.isdir(dir_path):
+                continue
+            archived_name = store.find_archive(dir_path)
+            if archived_name is not None:
+                print("  removing directory already packed as %s: %s..." % (archived_name, dir_name))
+                shutil.rmtree(dir_path)
+                continue
+            archive_name = dir_name
+            n = 1
+            while archive_name in store.list_names():
+                n += 1
+                archive_name = "%s_%d" % (dir_name, n)
+            print("  packing archive: %s..." % archive_name)
+            manifest = store.archive_directory(dir_path, archive_name)
+            print("    %d files, %d bytes, %d new bytes stored" %
+                  (len(manifest['files']), manifest['size'], manifest['stored']))
+
+    def recover_promotion(self):
+
+        journal_path = os.path.join(self.root_dir, 'promotion.json')
+
+        if os.path.isfile(journal_path):
+            print("completing interrupted promotion...")
+            f = open(journal_path)
+            journal = json.load(f)
+            f.close()
+            self.finish_promotion(journal)
+
     def get_gdb_paths(self, directory=None):
 
         temp_env = arcpy.env.workspace
@@ -138,11 +353,15 @@ class CityDataImporter():
         return gdb_paths
         
 
-    def stage(self):
+    # copy city sewer datasets from the server into one staging file geodatabase per city;
+    # cities are staged concurrently by a bounded process pool (processes) to limit load on the server;
+    # with incremental, datasets whose server signature (see dataset_signature) matches the one stored when
+    # the current geodatabase was staged are copied from current instead of downloaded
+    def stage(self, processes=4, incremental=True, checksum=False):
 
         self.update_contents()
 
-        sde_conn_file = os.path.join(self.paths['sdeconn'], self.contents['sdeconn'][0])        
+        sde_conn_file = self.connection.get_path()        
 
         arcpy.env.overwriteOutput = False
 
@@ -162,49 +381,86 @@ class CityDataImporter():
         import_datasets = [ds for ds in arcpy.ListDatasets()
                            if ds.split('.')[1] in self.import_cities
                            and 'sewer' in ds.split('.')[-1].lower()]
+        arcpy.env.workspace = self.root_dir
 
         # get list of names for cities with sewer data in gisbug database
-        have_cities = list(set([ds_name.split('.')[1] for ds_name in import_datasets]))        
+        have_cities = sorted(set([ds_name.split('.')[1] for ds_name in import_datasets]))
 
         # make and populate a staging file geodatabase for each available city
         print("copying data from server to staging...")
+
+        # current geodatabases by city, and the signatures stored when their data was staged
+        current_paths = dict((os.path.splitext(os.path.basename(gdb_path))[0].split('_')[-1], gdb_path)
+                             for gdb_path in self.get_gdb_paths(self.paths['current']))
+        cache = schema_cache.SchemaCache(os.path.join(self.paths['cache'], 'schema_cache.sqlite'))
+
+        tasks = []
         
         for city_name in have_cities:
             
             out_gdb_name = "%s_%s" % (self.today(), city_name)
-            print("  creating staging geodatabase: %s..." % out_gdb_name)
-            arcpy.CreateFileGDB_management(self.paths['staging'], out_gdb_name, "CURRENT")
             city_ds_names = [ds_name for ds_name in import_datasets
                              if city_name in ds_name]
-            
+            current_path = current_paths.get(city_name)
+            previous = {}
             for ds_name in city_ds_names:
-                
-                out_data = os.path.join(self.paths['staging'],
-                                        "%s.gdb" % out_gdb_name,
-                                        ds_name.split('.')[-1])
-                print("    importing feature dataset: %s..." % ds_name)
-                arcpy.Copy_management(ds_name, out_data)
-                self.update_contents()
-                
-        arcpy.env.workspace = self.root_dir
+                stored = cache.get_dataset_signature(ds_name) if incremental and current_path else None
+                # only trust a signature whose staged geodatabase became the current one
+                if stored is not None and os.path.basename(stored[1]) == os.path.basename(schema_cache.workspace_key(current_path)):
+                    previous[ds_name] = stored[0]
+            print("  staging geodatabase: %s (%d datasets)..." % (out_gdb_name, len(city_ds_names)))
+            tasks.append((city_name, self.paths['staging'], out_gdb_name, sde_conn_file, city_ds_names,
+                          current_path, previous, checksum))
+
+        failed = []
+
+        try:
+            if len(tasks) > 0:
+                for city_name, copied, carried, signatures, error in pool_results(stage_city, tasks, processes):
+                    for ds_name in copied:
+                        print("    imported feature dataset: %s" % ds_name)
+                    for ds_name in carried:
+                        print("    unchanged on server, copied from current: %s" % ds_name)
+                    if error:
+                        print("  staging failed for: %s\n%s" % (city_name, error))
+                        failed.append(city_name)
+                    else:
+                        out_gdb_path = os.path.join(self.paths['staging'], "%s_%s.gdb" % (self.today(), city_name))
+                        for ds_name, signature in signatures.items():
+                            cache.put_dataset_signature(ds_name, signature, out_gdb_path)
+                        print("  staged geodatabase for: %s" % city_name)
+        finally:
+            cache.close()
 
-    # compare schemas of staging geodatabases to current geodatabases
-    def compare(self):
+        self.update_contents()
+
+        if len(failed) > 0:
+            raise RuntimeError("staging failed for: %s" % ', '.join(failed))
+
+    # compare schemas of staging geodatabases to current geodatabases;
+    # cities are compared concurrently in a process pool and each report is written as its comparison finishes;
+    # with content, class content is also compared and written to <date>_<city>_CONTENT_CHANGES.json
+    def compare(self, processes=None, content=True):
 
         self.update_contents()
 
         arcpy.env.overwriteOutput = False
         
         print("comparing geodatabase schemas...")
+
+        # list staging and current geodatabases once for all cities
+        staging_gdb_paths = self.get_gdb_paths(self.paths['staging'])
+        current_gdb_paths = self.get_gdb_paths(self.paths['current'])
+
+        # schemas of unchanged geodatabases are taken from the cache
+        cache_path = os.path.join(self.paths['cache'], 'schema_cache.sqlite')
+
+        tasks = []
         
         for city in self.import_cities:
             
             from_path = None
             to_path = None
-
-            staging_gdb_paths = self.get_gdb_paths(self.paths['staging'])
-
-            current_gdb_paths = self.get_gdb_paths(self.paths['current'])
             
             staging_matches = [gdb_path for gdb_path in staging_gdb_paths
                                if city in gdb_path]
@@ -223,15 +479,11 @@ class CityDataImporter():
             if from_path and to_path:
                 
                 print("  comparing geodatabases for: %s" % city)
-                comp = gdb_compare.CompareGDB(to_path, from_path)
-                report = comp.make_report()
-                comp.cleanup()
-                print("    writing comparison report...")
-                write_path = os.path.join(self.paths['reports'],
-                                    "%s_%s_SCHEMA_COMPARISON.txt" % (self.today(), city))
-                f = open(write_path, 'w')
-                f.write(report)
-                f.close()
+                changes_path = None
+                if content:
+                    changes_path = os.path.join(self.paths['reports'],
+                                                "%s_%s_CONTENT_CHANGES.json" % (self.today(), city))
+                tasks.append((city, to_path, from_path, cache_path, changes_path))
                 
             if to_path and not from_path:
                 
@@ -241,7 +493,36 @@ class CityDataImporter():
                 
                 print("  no current geodatabase for: %s" % city)
 
-    # archive current and simple geodatabases and replace with staged data
+        if len(tasks) == 0:
+            return
+
+        failed = []
+
+        for city, report, changed, content_changed, error in pool_results(compare_city, tasks, processes):
+            
+            if error:
+                print("  comparison failed for: %s\n%s" % (city, error))
+                failed.append(city)
+                continue
+
+            if not changed:
+                print("  no schema changes for: %s" % city)
+
+            if content_changed is not None:
+                print("  classes with changed content for %s: %s" % (city, ', '.join(content_changed) or 'none'))
+            
+            print("  writing comparison report for: %s..." % city)
+            write_path = os.path.join(self.paths['reports'],
+                                "%s_%s_SCHEMA_COMPARISON.txt" % (self.today(), city))
+            f = open(write_path, 'w')
+            f.write(report)
+            f.close()
+
+        if len(failed) > 0:
+            raise RuntimeError("schema comparison failed for: %s" % ', '.join(failed))
+
+    # archive current geodatabases and replace with staged data by renaming the directories (see promote);
+    # an empty staging directory is created for the next stage
     def update(self):
 
         self.update_contents()
@@ -252,23 +533,10 @@ class CityDataImporter():
 
         if staged_gdb_count > 0:
 
-            # move file geodatabases from current directory to archive directory
-            print("moving geodatabases from current to archive...")
-        
-            for gdb_path in self.get_gdb_paths(self.paths['current']):
-                gdb_name = os.path.split(gdb_path)[-1]
-                print("  moving geodatabase: %s..." % gdb_name)
-                arcpy.Copy_management(gdb_path, os.path.join(self.paths['archive'], gdb_name))
-                arcpy.Delete_management(gdb_path)            
-
-            # move file geodatabases from staging directory to current directory
-            print("moving geodatabases from staging to current...")
-          
-            for gdb_path in self.get_gdb_paths(self.paths['staging']):
-                gdb_name = os.path.split(gdb_path)[-1]
-                print("  moving geodatabase: %s..." % gdb_name)
-                arcpy.Copy_management(gdb_path, os.path.join(self.paths['current'], gdb_name))
-                arcpy.Delete_management(gdb_path)
+            print("moving current to archive and staging to current...")
+            self.promote(self.paths['staging'], 'current')
+            self.pack_archive()
+            self.update_contents()
 
         else:
 
@@ -297,10 +565,24 @@ class CityDataImporter():
         arcpy.env.workspace = self.root_dir
 
 
-    # MAY NEED MORE WORK IN fme_transform.py
-    # works if only transform_to_simple is called
-    # if all functions are callled in sequence, data interop tool is not bound to CityDataImporter instance
-    def transform_to_simple(self):
+    # get key of a transform's inputs: content checksum of the current geodatabase, combined from its class
+    # checksums (gdb_compare.content_checksum; taken from cache where compare stored them for the staging
+    # geodatabase), and content digest of the toolbox or the city's native mapping spec
+    # (None if the tools cannot be read, which is never reused)
+    def transform_key(self, gdb_path=None, city_name=None, cache=None):
+
+        try:
+            tools_digest = fme_transform.tools_digest(city_name)
+        except (IOError, OSError):
+            return None
+
+        return "%s|%s" % (gdb_compare.content_checksum(gdb_path, schema_cache=cache), tools_digest)
+
+    # transform current geodatabases to SIMPLE geodatabases and replace simple with them (see promote);
+    # cities are transformed concurrently by pool workers, each with its own Transformer, up to the license
+    # limit (fme_transform.transform_limit); with processes=1 cities are transformed in this process;
+    # the SIMPLE geodatabase of a city whose transform_key is unchanged is copied from simple (unless force)
+    def transform_to_simple(self, processes=None, force=False):
 
         self.update_contents()
 
@@ -310,27 +592,82 @@ class CityDataImporter():
 
         if current_gdb_count > 0:
 
-            # move file geodatabases from simple directory to archive directory
-            print("moving geodatabases from simple to archive...")
-        
-            for gdb_path in self.get_gdb_paths(self.paths['simple']):
-                gdb_name = os.path.split(gdb_path)[-1]
-                print("  moving geodatabase: %s..." % gdb_name)
-                arcpy.Copy_management(gdb_path, os.path.join(self.paths['archive'], gdb_name))
-                arcpy.Delete_management(gdb_path)
-                
-            trans = fme_transform.Transformer()
+            # transformed geodatabases are written to a new directory that replaces simple when all are done,
+            # so simple is never left partly written
+            simple_next = os.path.join(self.root_dir, 'simple_next')
+
+            if os.path.isdir(simple_next):
+                print("removing incomplete transformed data...")
+                shutil.rmtree(simple_next)
+
+            os.mkdir(simple_next)
 
-            # transform file geodatabases in current directory and write to simple directory
+            # transform file geodatabases in current directory and write to new simple directory
             print("transforming current geodatabases and writing to simple...")
 
+            cache = schema_cache.SchemaCache(os.path.join(self.paths['cache'], 'schema_cache.sqlite'))
+            tasks = []
+            input_keys = {}
+
             for gdb_path in self.get_gdb_paths(self.paths['current']):
                 gdb_name = os.path.split(gdb_path)[-1]
                 gdb_city = os.path.splitext(gdb_name)[0].split('_')[-1]
                 simple_gdb_name = "%s_%s_SIMPLE" % (self.today(), gdb_city.upper())
+                input_keys[gdb_city] = self.transform_key(gdb_path, gdb_city, cache)
+                stored = cache.get_transform(gdb_city)
+                previous_path = os.path.join(self.paths['simple'], os.path.basename(stored[1])) if stored else None
+
+                if (not force and stored is not None and input_keys[gdb_city] is not None
+                        and stored[0] == input_keys[gdb_city] and os.path.isdir(previous_path)):
+                    print("  unchanged, copying previous output: %s..." % os.path.basename(previous_path))
+                    shutil.copytree(previous_path, os.path.join(simple_next, simple_gdb_name + '.gdb'))
+                    continue
+
                 print("  transforming geodatabase: %s..." % gdb_name)
-                trans.city_to_simple(gdb_city, gdb_path,
-                                     os.path.join(self.paths['simple'], simple_gdb_name))
+                tasks.append((gdb_city, gdb_path, os.path.join(simple_next, simple_gdb_name)))
+
+            start = time.time()
+            timings = []
+            failed = []
+
+            if len(tasks) > 0:
+                task_cities = [task[0] for task in tasks]
+                processes = min(fme_transform.transform_limit(processes, task_cities), len(tasks))
+                print("  transforming with %d process(es)..." % processes)
+
+            if len(tasks) > 1 and processes > 1:
+                results = pool_results(transform_city, tasks, processes)
+            else:
+                results = (transform_city(task) for task in tasks)
+
+            for city_name, seconds, error in results:
+                timings.append((seconds, city_name))
+                if error:
+                    print("  transform failed for: %s after %.1f s\n%s" % (city_name, seconds, error))
+                    failed.append(city_name)
+                else:
+                    print("  transformed: %s in %.1f s" % (city_name, seconds))
+
+            print("transform times (total %.1f s):" % (time.time() - start))
+            for seconds, city_name in sorted(timings, reverse=True):
+                print("  %-12s %8.1f s" % (city_name, seconds))
+
+            # simple is left unchanged unless every city was transformed
+            if len(failed) > 0:
+                cache.close()
+                arcpy.env.overwriteOutput = False
+                raise RuntimeError("transform failed for: %s" % ', '.join(failed))
+
+            print("moving simple to archive and transformed data to simple...")
+            self.promote(simple_next, 'simple')
+
+            for gdb_city, input_key in input_keys.items():
+                simple_gdb_name = "%s_%s_SIMPLE.gdb" % (self.today(), gdb_city.upper())
+                cache.put_transform(gdb_city, input_key, os.path.join(self.paths['simple'], simple_gdb_name))
+            cache.close()
+
+            self.pack_archive()
+            self.update_contents()
 
         else:
 
@@ -341,7 +678,7 @@ class CityDataImporter():
 
 # ----- EXECUTION BLOCK -----
 
-"""
+r"""
 root_dir = r'C:\Users\mangoldd\Desktop\test\city_data'
 
 importer = CityDataImporter(root_dir)
@@ -1,40 +1,64 @@
+import argparse
 import arcpy
 from sde_download import *
 
 
-# root_path = r'C:\Users\mangoldd\Desktop\test\city_data'
-root_path = arcpy.GetParameterAsText(0)
+step_messages = [('stage', "Staging import geodatabases..."),
+                 ('compare', "Comparing geodatabase schemas..."),
+                 ('update', "Updating import geodatabases..."),
+                 ('delete_networks', "Deleting geometric networks...")]
 
-msg = ("Root Directory: %s" % root_path) 
-arcpy.AddMessage(msg)
-print(msg)
 
-msg = ("Initializing importer...") 
-arcpy.AddMessage(msg)
-print(msg)
+def message(msg):
+    """Write msg to geoprocessing tool messages and standard output."""
 
-importer = CityDataImporter(root_path)
+    arcpy.AddMessage(msg)
+    print(msg)
 
-msg = ("Staging import geodatabases...") 
-arcpy.AddMessage(msg)
-print(msg)
 
-importer.stage()
+def run_download(root_path, steps=None, server_path=None, content=True):
+    """Run importer steps (default: stage, compare, update, delete_networks) for root_path.
 
-msg = ("Comparing geodatabase schemas...") 
-arcpy.AddMessage(msg)
-print(msg)
+    With server_path, the local workspace at server_path is read in place of the server.
+    content=False leaves class content out of the compare step (schemas only).
+    Returns the CityDataImporter instance so callers can reuse it.
+    """
 
-importer.compare()
+    steps = steps or [step for step, step_msg in step_messages]
 
-msg = ("Updating import geodatabases...") 
-arcpy.AddMessage(msg)
-print(msg)
+    message("Root Directory: %s" % root_path)
+    message("Initializing importer...")
 
-importer.update()
+    connection = LocalConnection(server_path) if server_path else None
+    importer = CityDataImporter(root_path, connection)
 
-msg = ("Deleting geometric networks...") 
-arcpy.AddMessage(msg)
-print(msg)
+    for step, step_msg in step_messages:
+        if step in steps:
+            message(step_msg)
+            if step == 'compare':
+                importer.compare(content=content)
+            else:
+                getattr(importer, step)()
 
-importer.delete_networks()
+    return importer
+
+
+def main(argv=None):
+    """Parse command line (or geoprocessing tool) arguments and run the importer steps."""
+
+    parser = argparse.ArgumentParser(description="Stage, compare and update city sewer geodatabases.")
+    parser.add_argument('root_path', help="city data root directory")
+    parser.add_argument('--steps', nargs='+', default=None,
+                        choices=[step for step, step_msg in step_messages],
+                        help="run only these steps (in standard order)")
+    parser.add_argument('--server', dest='server_path', default=None,
+                        help="local geodatabase or sqlite workspace to read in place of the sde server")
+    parser.add_argument('--schema-only', dest='content', action='store_false', default=True,
+                        help="compare schemas only, without class content checksums")
+    args = parser.parse_args(argv)
+
+    run_download(args.root_path, args.steps, args.server_path, args.content)
+
+
+if __name__ == '__main__':
+    main()
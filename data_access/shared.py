@@ -0,0 +1,15 @@
+import os
+import sys
+
+# helpers shared with data_import live only in ../data_import; this module puts that directory on the
+# import path (after data_access, so data_access modules are found first) and re-exports the helpers
+
+shared_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_import')
+
+if shared_dir not in sys.path:
+    sys.path.append(shared_dir)
+
+from lazy import LazyModule
+from journal import workspace_token
+from tile_index import geometry_coords, hash_field_names, row_hash, combine_hashes
+from sde_connection import SdeConnection, LocalConnection
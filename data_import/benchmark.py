@@ -0,0 +1,189 @@
+# dev notes:
+# Offline benchmark of Reader, Matcher and Writer on synthetic layers using memory_arcpy
+# usage: python benchmark.py --sizes 10000 100000 1000000 --kinds line point --json results.json
+
+# --- import modules ---
+
+import os
+import sys
+import math
+import json
+import time
+import argparse
+import memory_arcpy
+import synthetic
+
+_cpu_time = getattr(time, 'process_time', None) or time.clock
+
+# --- benchmark configuration ---
+
+"""
+DEFINITIONS
+
+src_classpath......in-memory path of the synthetic source (city) feature class
+tgt_classpath......in-memory path of the synthetic target (server) feature class
+match_dist.........match distance passed to Matcher (grid size is 3 x match_dist, as in import_tool)
+update_fields......fields written by the update operation (juris and maint fields added for insert)
+"""
+
+bench_config = {
+    'src_classpath': r'C:\bench\src.gdb\Sanitary\GravityMains',
+    'tgt_classpath': r'C:\bench\tgt.sde\sde.Sanitary\sde.GravityMains',
+    'match_attr': 'CITYID',
+    'match_dist': 30.0,
+    'match_angle': 45.0,
+    'match_type': 'geom',
+    'update_fields': ['CITYID', 'DIAMETER', 'MATERIAL', 'SHAPE@']
+    }
+
+stages = ['read_source', 'read_target', 'match_index', 'match_find', 'process_matches',
+          'update', 'insert', 'delete']
+
+# --- global functions ---
+
+def load_tools():
+    """Return import.py loaded as module 'tools' (as import_tool imports it)."""
+
+    if 'tools' in sys.modules:
+        return sys.modules['tools']
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'import.py')
+    try:
+        import importlib.util
+        spec = importlib.util.spec_from_file_location('tools', path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['tools'] = module
+        spec.loader.exec_module(module)
+    except ImportError:
+        import imp
+        module = imp.load_source('tools', path)
+    return module
+
+
+def timed(func, *args):
+    """Return (result, wall seconds, cpu seconds) of func(*args)."""
+
+    wall_start = time.time()
+    cpu_start = _cpu_time()
+    result = func(*args)
+    return result, time.time() - wall_start, _cpu_time() - cpu_start
+
+
+def run_case(tools, count, kind, density, jitter, churn, seed=0):
+    """Build synthetic layers of count features, run each pipeline stage and return timings."""
+
+    memory_arcpy.reset()
+    fields, tgt_features, src_features = synthetic.make_layers(count, kind, density, jitter, churn, seed=seed)
+    src_path = bench_config['src_classpath']
+    tgt_path = bench_config['tgt_classpath']
+    synthetic.load_table(memory_arcpy, src_path, fields, src_features, kind)
+    synthetic.load_table(memory_arcpy, tgt_path, fields, tgt_features, kind)
+
+    match_attr = bench_config['match_attr']
+    grid_size = bench_config['match_dist'] * 3.0
+    update_fields = [f for f in bench_config['update_fields'] if f == 'SHAPE@' or f in fields]
+    insert_fields = update_fields + fields[-2:]
+    read_fields = ['OID@', match_attr, 'SHAPE@']
+
+    timings = {}
+
+    src_reader = tools.Reader(src_path)
+    r, timings['read_source'], cpu = timed(src_reader.read, read_fields)
+
+    tgt_reader = tools.Reader(tgt_path)
+    r, timings['read_target'], cpu = timed(tgt_reader.read, read_fields,
+                                           tools.expand_extent(src_reader.extent, grid_size), "")
+
+    matcher, timings['match_index'], cpu = timed(tools.Matcher, src_reader, tgt_reader, match_attr,
+                                                 bench_config['match_dist'], bench_config['match_angle'],
+                                                 grid_size)
+    r, timings['match_find'], cpu = timed(matcher.find_matches)
+
+    writer, timings['process_matches'], cpu = timed(tools.Writer, matcher, tgt_path)
+
+    match_type = bench_config['match_type']
+    r, timings['update'], cpu = timed(writer.update, update_fields, match_type)
+    r, timings['insert'], cpu = timed(writer.insert, insert_fields, match_type)
+    r, timings['delete'], cpu = timed(writer.delete, match_type)
+
+    result = {'count': count,
+              'kind': kind,
+              'src_rows': len(src_features),
+              'candidates_evaluated': matcher.candidates_evaluated,
+              'edits': len(memory_arcpy.edit_log),
+              'timings': timings}
+    return result
+
+
+def scaling_exponent(n1, t1, n2, t2):
+    """Return k in t ~ n**k between two measurements (None if not measurable)."""
+
+    if n1 == n2 or t1 <= 0 or t2 <= 0:
+        return None
+    result = math.log(t2 / t1) / math.log(float(n2) / n1)
+    return result
+
+
+def format_report(results):
+    """Return text table of stage timings, microseconds per feature and scaling exponents."""
+
+    lines = []
+    for kind in sorted(set(r['kind'] for r in results)):
+        kind_results = sorted([r for r in results if r['kind'] == kind], key=lambda r: r['count'])
+        lines.append("KIND: %s" % kind)
+        header = "  %-16s" % "stage"
+        for r in kind_results:
+            header += "%14s" % ("n=%d s" % r['count'])
+            header += "%12s" % "us/feat"
+        header += "%10s" % "scaling"
+        lines.append(header)
+        for stage in stages:
+            line = "  %-16s" % stage
+            for r in kind_results:
+                t = r['timings'][stage]
+                line += "%14.3f%12.2f" % (t, t / r['count'] * 1e6)
+            exps = [scaling_exponent(a['count'], a['timings'][stage], b['count'], b['timings'][stage])
+                    for a, b in zip(kind_results[:-1], kind_results[1:])]
+            exps = [e for e in exps if e is not None]
+            line += "%10s" % ("%.2f" % exps[-1] if exps else "-")
+            lines.append(line)
+        for r in kind_results:
+            lines.append("  n=%d: candidates evaluated %d, edits %d"
+                         % (r['count'], r['candidates_evaluated'], r['edits']))
+        lines.append("")
+    result = '\n'.join(lines)
+    return result
+
+
+def main(argv=None):
+    """Run benchmark cases and print (and optionally save) the report."""
+
+    parser = argparse.ArgumentParser(description="Benchmark Reader, Matcher and Writer on synthetic data.")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000, 1000000])
+    parser.add_argument('--kinds', nargs='+', choices=['line', 'point'], default=['line', 'point'])
+    parser.add_argument('--density', type=float, default=2000.0, help="features per square mile")
+    parser.add_argument('--jitter', type=float, default=2.0, help="max source coordinate shift (feet)")
+    parser.add_argument('--churn', type=float, default=0.05, help="fraction of features changed")
+    parser.add_argument('--json', dest='json_path', default=None, help="write raw results to this file")
+    args = parser.parse_args(argv)
+
+    memory_arcpy.install()
+    tools = load_tools()
+
+    results = []
+    for kind in args.kinds:
+        for count in sorted(args.sizes):
+            print("running %s n=%d..." % (kind, count))
+            results.append(run_case(tools, count, kind, args.density, args.jitter, args.churn))
+
+    print(format_report(results))
+
+    if args.json_path:
+        f = open(args.json_path, 'w')
+        json.dump(results, f, indent=2)
+        f.close()
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -12,7 +12,17 @@ match_type.........one of 'attr', 'geom', 'comb' (attribute-only, geometry-only,
 shp_attr_token.....ESRI-defined geometry attribute token
 oid_attr_token.....ESRI-defined unique table id attribute token (OBJECTID or FID)
 sde_prefix.........object name prefix used in target ArcSDE geodatabase
-log_dir............location of logs written out by the import tool
+log_dir............location of logs (run log, <run>_metrics.jsonl timings, job journal) written out by the import tool
+resume.............True: skip steps recorded as complete in the job journal (log_dir) if inputs unchanged
+profile_classes....class names ('*' for all) whose read, match and write phases are profiled to log_dir
+memory_budget_mb...memory allowed for reader records plus matcher indexes; None for no limit
+                   (over budget, matching runs by spatial partition from temporary spill files)
+match_row_bytes....projected bytes per record (reader data plus indexes) by shape type
+write_batch_rows...source records read per batch by the writer (update, insert)
+write_row_bytes....projected bytes per source record held by the writer (update or insert fields) by shape type
+spill_dir..........directory for matching spill files; None for the system temporary directory
+change_tile_bins...leaf tile size of the content change tile tree, in match grid bins (import_tool --changed-since)
+change_halo_bins...distance around changed tiles that is re-imported, in match grid bins
 """
 
 gen_config = {
@@ -25,7 +35,16 @@ gen_config = {
     'oid_attr_token': 'OID@',
     #  'sde_prefix': '',
     'sde_prefix': 'sde_rm.GIS.',
-    'log_dir': 'logs'
+    'log_dir': 'logs',
+    'resume': True,
+    'profile_classes': [],
+    'memory_budget_mb': None,
+    'match_row_bytes': {'point': 1200, 'polyline': 2500},
+    'write_batch_rows': 5000,
+    'write_row_bytes': {'point': 1000, 'polyline': 2500},
+    'spill_dir': None,
+    'change_tile_bins': 8,
+    'change_halo_bins': 2
     }
 
 # --- edit operation specific import configurations ---
@@ -7,25 +7,35 @@
 import os
 import sys
 import math
-import arcpy
 import logging
-import datetime
-import numpy as np
+import metrics
+import spill
+from lazy import LazyModule
 from config import gen_config
 
+arcpy = LazyModule('arcpy')
+
 # --- get general configuration import variables ---
 
 shp_attr_token = gen_config['shp_attr_token']
 oid_attr_token = gen_config['oid_attr_token']
 log_dir = gen_config['log_dir']
+write_batch_rows = gen_config['write_batch_rows']
 
-# --- configure error and message logging ---
+# --- global functions ---
 
-logname = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-logpath = os.path.join(log_dir, r'%s.txt' % logname)
-logging.basicConfig(filename=logpath, level=logging.DEBUG)
+def configure_logging(log_dir=log_dir):
+    """Send error and message logging to a timestamped file in log_dir and return its path.
+
+    Called by entry points; importing this module does not configure logging.
+    """
+
+    import datetime
+    logname = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    logpath = os.path.join(log_dir, r'%s.txt' % logname)
+    logging.basicConfig(filename=logpath, level=logging.DEBUG)
+    return logpath
 
-# --- global functions ---
 
 def get_workspace_path(table_path):
     """Return workspace space from full table_path.
@@ -103,7 +113,7 @@ def calc_average_dist(geom1, geom2):
         elif geom1.type == 'polyline':
             pnts1 = [geom1.firstPoint, geom1.centroid, geom1.lastPoint]
             pnts2 = [geom2.firstPoint, geom2.centroid, geom2.lastPoint]
-            result = np.array([calc_dist(p1, p2) for p1, p2 in zip(pnts1, pnts2)]).sum()/len(pnts1)
+            result = sum([calc_dist(p1, p2) for p1, p2 in zip(pnts1, pnts2)])/len(pnts1)
         else:
             print("Geometry not of type point or polyline.")
             return
@@ -156,6 +166,33 @@ def expand_extent(extent, distance):
     return result
 
 
+def count_rows(table_path, region=None):
+    """Return number of rows in table_path.
+
+    If region (tile_index.TileRegion) is set, only rows with centroids in region are counted (rows are streamed).
+    """
+
+    if region is None:
+        result = int(arcpy.GetCount_management(table_path).getOutput(0))
+        return result
+    result = 0
+    with arcpy.da.SearchCursor(table_path, [shp_attr_token]) as scur:
+        for row in scur:
+            if row[0] is not None and region.contains(row[0].centroid):
+                result += 1
+    return result
+
+
+def make_oid_query(oid_field_name, oids):
+    """Return where clause selecting oids (selects nothing if oids is empty)."""
+
+    if len(oids) > 0:
+        result = oid_field_name + " IN " + str(tuple(oids)).replace(',)', ')')
+    else:
+        result = oid_field_name + " IN (-1)"
+    return result
+
+
 def validate_value(value):
     """Return value if valid otherwise None.
 
@@ -185,22 +222,34 @@ class Reader(object):
         self.field_names_read = []
         self.data = []
 
-    def read(self, field_names, extent=None, where_clause=""):
+    def read(self, field_names, extent=None, where_clause="", region=None):
         """Read records from source feature class
 
+        If region (tile_index.TileRegion) is set, only records with centroids in region are kept.
         GlobalID field not supported in 10.1, resolved in 10.2.
         """
 
         logging.info("READING RECORDS: %s" % self.table_path)
         result = []
-        with arcpy.da.SearchCursor(self.table_path, field_names, where_clause) as scur:
-            if extent and isinstance(extent, arcpy.Extent):
-                for row in scur:
-                    if extent.contains(row[-1].centroid):
+        with metrics.span('reader.read', table=self.table_path) as span:
+            rows_in = 0
+            with arcpy.da.SearchCursor(self.table_path, field_names, where_clause) as scur:
+                if extent and isinstance(extent, arcpy.Extent):
+                    for row in scur:
+                        rows_in += 1
+                        if extent.contains(row[-1].centroid) and (region is None or region.contains(row[-1].centroid)):
+                            result.append(row)
+                elif region is not None:
+                    for row in scur:
+                        rows_in += 1
+                        if region.contains(row[-1].centroid):
+                            result.append(row)
+                else:
+                    for row in scur:
                         result.append(row)
-            else:
-                for row in scur:
-                    result.append(row)
+                    rows_in = len(result)
+            span.count('rows_in', rows_in)
+            span.count('rows_out', len(result))
         self.field_names_read = [name for name in field_names]
         self.data = result
 
@@ -218,12 +267,16 @@ class Matcher(object):
         self.match_spatial_threshold = match_spatial_threshold
         self.grid_size = grid_size
         self.extent = combine_extents([self.src_reader.extent, self.tgt_reader.extent])
-        self.src_spatial_index = self._build_spatial_index(self.src_reader)
-        self.src_field_index = self._build_field_index(self.src_reader, self.match_attr_name)
-        self.src_oid_index = self._build_field_index(self.src_reader, oid_attr_token)
-        self.tgt_spatial_index = self._build_spatial_index(self.tgt_reader)
-        self.tgt_field_index = self._build_field_index(self.tgt_reader, self.match_attr_name)
-        self.tgt_oid_index = self._build_field_index(self.tgt_reader, oid_attr_token)
+        with metrics.span('matcher.build_indexes') as span:
+            self.src_spatial_index = self._build_spatial_index(self.src_reader)
+            self.src_field_index = self._build_field_index(self.src_reader, self.match_attr_name)
+            self.src_oid_index = self._build_field_index(self.src_reader, oid_attr_token)
+            self.tgt_spatial_index = self._build_spatial_index(self.tgt_reader)
+            self.tgt_field_index = self._build_field_index(self.tgt_reader, self.match_attr_name)
+            self.tgt_oid_index = self._build_field_index(self.tgt_reader, oid_attr_token)
+            span.count('src_rows', len(self.src_reader.data))
+            span.count('tgt_rows', len(self.tgt_reader.data))
+        self.candidates_evaluated = 0
         self.attr_matches = {}
         self.geom_matches = {}
         self.comb_matches = {}
@@ -287,6 +340,7 @@ class Matcher(object):
         """
 
         result = {}
+        candidates = 0
         for rec in self.src_reader.data:
             tgt_neighbors = []
             src_oid = rec[0]
@@ -299,6 +353,7 @@ class Matcher(object):
                         tgt_neighbors += self.tgt_spatial_index[x, y]
                     except KeyError:
                         pass
+            candidates += len(tgt_neighbors)
             near_neighbors = []
             for tgt_nbr in tgt_neighbors:
                 tgt_shape = tgt_nbr[-1]
@@ -313,6 +368,7 @@ class Matcher(object):
             else:
                 tgt_oid = []
             result[src_oid] = tgt_oid
+        self.candidates_evaluated = candidates
         return result
 
     def _find_comb_matches(self, attr_matches, geom_matches):
@@ -345,10 +401,189 @@ class Matcher(object):
         """Find matches and populate class properties accordingly."""
 
         logging.info("FINDING MATCHED RECORDS")
-        self.attr_matches = self._find_attr_matches()
-        self.geom_matches = self._find_geom_matches()
-        self.comb_matches = self._find_comb_matches(self.attr_matches, self.geom_matches)
-        self.unmatched = self._find_unmatched(self.attr_matches, self.geom_matches)
+        with metrics.span('matcher.attr_matches') as span:
+            self.attr_matches = self._find_attr_matches()
+            span.count('rows_in', len(self.src_oid_index))
+            span.count('rows_out', len([v for v in self.attr_matches.values() if v]))
+        with metrics.span('matcher.geom_matches') as span:
+            self.geom_matches = self._find_geom_matches()
+            span.count('rows_in', len(self.src_oid_index))
+            span.count('candidates_evaluated', self.candidates_evaluated)
+            span.count('rows_out', len([v for v in self.geom_matches.values() if v]))
+        with metrics.span('matcher.comb_matches') as span:
+            self.comb_matches = self._find_comb_matches(self.attr_matches, self.geom_matches)
+            span.count('rows_out', len([v for v in self.comb_matches.values() if v]))
+        with metrics.span('matcher.unmatched') as span:
+            self.unmatched = self._find_unmatched(self.attr_matches, self.geom_matches)
+            span.count('rows_out', len(self.unmatched['comb']))
+
+    def writable_src_oids(self):
+        """Return source OIDs the Writer may update from or insert (all matched records)."""
+
+        return self.src_oid_index.keys()
+
+    def writable_tgt_oids(self):
+        """Return target OIDs the Writer may delete (all matched records)."""
+
+        return self.tgt_oid_index.keys()
+
+    def close(self):
+        """Release match resources (nothing to release for in-memory matching)."""
+
+        pass
+
+
+class PartitionedMatcher(Matcher):
+    """Match features one spatial partition at a time from records spilled to temporary files.
+
+    Used instead of Matcher when projected memory for Reader.data plus the Matcher indexes
+    exceeds the memory budget. Readers are streamed by the matcher and need not be read first.
+    Oid indexes are served from the spill files; call close() when the Writer is finished.
+    With region and read_region (tile_index.TileRegion), only records in read_region are spilled and,
+    as for RegionMatcher, only records in region are written.
+    """
+
+    def __init__(self, src_reader, tgt_reader, match_attr_name="cityid", match_spatial_threshold=25, match_angle=45,
+                 grid_size=75, tile_bins=10, tgt_extent=None, tgt_where_clause="", temp_dir=None,
+                 region=None, read_region=None):
+        """Set readers and properties, then stream both readers into a partitioned spill store."""
+
+        self.src_reader = src_reader
+        self.tgt_reader = tgt_reader
+        self.match_attr_name = match_attr_name
+        self.match_angle_threshold = match_angle
+        self.match_spatial_threshold = match_spatial_threshold
+        self.grid_size = grid_size
+        self.extent = combine_extents([self.src_reader.extent, self.tgt_reader.extent])
+        self.store = spill.SpillStore(tile_bins, temp_dir)
+        self.spill_attr_matches = {}
+        self.region = region
+        self.read_region = read_region
+        self.region_oids = {'src': set(), 'tgt': set()}
+        with metrics.span('matcher.spill') as span:
+            self.tgt_field_index = self._spill_reader(self.tgt_reader, 'tgt', tgt_extent, tgt_where_clause)
+            self._spill_reader(self.src_reader, 'src')
+            self.store.finish()
+            span.count('src_rows', len(self.store.indexes['src']))
+            span.count('tgt_rows', len(self.store.indexes['tgt']))
+            span.count('partitions', len(self.store.partitions()))
+        self.src_field_index = {}
+        self.src_oid_index = self.store.indexes['src']
+        self.tgt_oid_index = self.store.indexes['tgt']
+        self.src_spatial_index = {}
+        self.tgt_spatial_index = {}
+        self.candidates_evaluated = 0
+        self.attr_matches = {}
+        self.geom_matches = {}
+        self.comb_matches = {}
+        self.unmatched = {}
+
+    def _spill_reader(self, reader, side, extent=None, where_clause=""):
+        """Stream reader records into the spill store.
+
+        Target side returns {match value: [tgt_oid, ...]}; source side records attribute matches against it.
+        """
+
+        logging.info("SPILLING RECORDS: %s" % reader.table_path)
+        field_names = [oid_attr_token, self.match_attr_name, shp_attr_token]
+        use_extent = extent and isinstance(extent, arcpy.Extent)
+        result = {}
+        with arcpy.da.SearchCursor(reader.table_path, field_names, where_clause) as scur:
+            for oid, value, geom in scur:
+                if use_extent and not extent.contains(geom.centroid):
+                    continue
+                if self.read_region is not None and not self.read_region.contains(geom.centroid):
+                    continue
+                if self.region is not None and self.region.contains(geom.centroid):
+                    self.region_oids[side].add(oid)
+                self.store.add(side, oid, value, geom, self._make_spatial_hash(geom))
+                if side == 'tgt':
+                    if value in result:
+                        result[value].append(oid)
+                    else:
+                        result[value] = [oid]
+                else:
+                    self.spill_attr_matches[oid] = list(self.tgt_field_index.get(value, []))
+        reader.field_names_read = field_names
+        return result
+
+    def _find_attr_matches(self):
+        """Return attribute matches recorded while spilling source records."""
+
+        result = self.spill_attr_matches
+        return result
+
+    def _find_geom_matches(self):
+        """Return geometry matches computed tile by tile (same form as Matcher._find_geom_matches)."""
+
+        result = {}
+        candidates = 0
+        for tile in self.store.partitions():
+            self.src_reader.data = self.store.load('src', tile)
+            self.tgt_spatial_index = {}
+            for rec in self.store.load('tgt', tile):
+                hashid = self._make_spatial_hash(rec[-1])
+                if hashid in self.tgt_spatial_index:
+                    self.tgt_spatial_index[hashid].append(rec)
+                else:
+                    self.tgt_spatial_index[hashid] = [rec]
+            result.update(Matcher._find_geom_matches(self))
+            candidates += self.candidates_evaluated
+        self.src_reader.data = []
+        self.tgt_spatial_index = {}
+        self.candidates_evaluated = candidates
+        return result
+
+    def writable_src_oids(self):
+        """Return source OIDs in region (all spilled records without a region)."""
+
+        if self.region is None:
+            return Matcher.writable_src_oids(self)
+        return self.region_oids['src']
+
+    def writable_tgt_oids(self):
+        """Return target OIDs in region (all spilled records without a region)."""
+
+        if self.region is None:
+            return Matcher.writable_tgt_oids(self)
+        return self.region_oids['tgt']
+
+    def close(self):
+        """Remove spill files."""
+
+        self.store.close()
+
+
+class RegionMatcher(Matcher):
+    """Match features read from around a changed region and write only results for the region.
+
+    Readers are read with region expanded by the match neighbourhood. Only source records in
+    region are updated from or inserted, and only target records in region may be deleted.
+    Geometry matches of records in region are the same as for a full read; attribute matches
+    to records outside the expanded region are not seen, so import_tool does not use a region
+    for attribute-only matching.
+    """
+
+    def __init__(self, src_reader, tgt_reader, match_attr_name="cityid", match_spatial_threshold=25, match_angle=45,
+                 grid_size=75, region=None):
+        """Set readers, properties and region (tile_index.TileRegion)."""
+
+        Matcher.__init__(self, src_reader, tgt_reader, match_attr_name, match_spatial_threshold, match_angle, grid_size)
+        self.region = region
+        self.src_region_oids = set(oid for oid, recs in self.src_oid_index.items()
+                                   if region.contains(recs[0][-1].centroid))
+        self.tgt_region_oids = set(oid for oid, recs in self.tgt_oid_index.items()
+                                   if region.contains(recs[0][-1].centroid))
+
+    def writable_src_oids(self):
+        """Return source OIDs in region."""
+
+        return self.src_region_oids
+
+    def writable_tgt_oids(self):
+        """Return target OIDs in region."""
+
+        return self.tgt_region_oids
 
 
 class Writer(object):
@@ -365,20 +600,24 @@ class Writer(object):
         self.field_name_oid = self.describe.OIDFieldName
         self.field_name_shape = self.describe.shapeFieldName
         self.field_names_write = []
-        self.proc_matches = self._process_matches()
+        with metrics.span('writer.process_matches', table=self.target_table) as span:
+            self.proc_matches = self._process_matches()
+            span.count('rows_in', len(self.matcher.src_oid_index))
+            for match_type, swapped in self.proc_matches.items():
+                span.count('rows_out_%s' % match_type, len(swapped))
 
     def _process_matches(self):
         """Invert match mapping: {src_oid : [tgt_oid]} --> {tgt_oid : [src_oid]} and keep nearest matches."""
 
         attr_matches = self.matcher.attr_matches
         attr_matches_swap = {}
-        for k, v in attr_matches.iteritems():
+        for k, v in attr_matches.items():
             if len(v) > 0:
                 if v[0] in attr_matches_swap:
                     attr_matches_swap[v[0]] += [k]
                 else:
                     attr_matches_swap[v[0]] = [k]
-        for k, v in attr_matches_swap.iteritems():
+        for k, v in attr_matches_swap.items():
             if len(v) > 1:
                 k_rec = self.matcher.tgt_oid_index[k][0]
                 v_recs = [self.matcher.src_oid_index[i][0] for i in v]
@@ -387,13 +626,13 @@ class Writer(object):
 
         geom_matches = self.matcher.geom_matches
         geom_matches_swap = {}
-        for k, v in geom_matches.iteritems():
+        for k, v in geom_matches.items():
             if len(v) > 0:
                 if v[0] in geom_matches_swap:
                     geom_matches_swap[v[0]] += [k]
                 else:
                     geom_matches_swap[v[0]] = [k]
-        for k, v in geom_matches_swap.iteritems():
+        for k, v in geom_matches_swap.items():
             if len(v) > 1:
                 k_rec = self.matcher.tgt_oid_index[k][0]
                 v_recs = [self.matcher.src_oid_index[i][0] for i in v]
@@ -402,13 +641,13 @@ class Writer(object):
 
         comb_matches = self.matcher.comb_matches
         comb_matches_swap = {}
-        for k, v in comb_matches.iteritems():
+        for k, v in comb_matches.items():
             if len(v) > 0:
                 if v[0] in comb_matches_swap:
                     comb_matches_swap[v[0]] += [k]
                 else:
                     comb_matches_swap[v[0]] = [k]
-        for k, v in comb_matches_swap.iteritems():
+        for k, v in comb_matches_swap.items():
             if len(v) > 1:
                 k_rec = self.matcher.tgt_oid_index[k][0]
                 v_recs = [self.matcher.src_oid_index[i][0] for i in v]
@@ -421,6 +660,21 @@ class Writer(object):
         
         return result
 
+    def _read_source_rows(self, field_names, src_oids):
+        """Return {src_oid: values of field_names} for src_oids, read from the matcher's source table.
+
+        The Writer reads source values one batch of write_batch_rows OIDs at a time (not into Reader.data),
+        so write memory does not grow with the size of the source class.
+        """
+
+        src_reader = self.matcher.src_reader
+        query = make_oid_query(src_reader.field_name_oid, sorted(set(src_oids)))
+        result = {}
+        with arcpy.da.SearchCursor(src_reader.table_path, [oid_attr_token] + field_names, query) as scur:
+            for row in scur:
+                result[row[0]] = row[1:]
+        return result
+
     def update(self, field_names, match_type):
         """Update rows in target table based on matched features in writer.matcher.
 
@@ -429,56 +683,55 @@ class Writer(object):
         """
 
         result = 1
-        logging.info("UPDATING RECORDS: %s" % self.target_table)
+        with metrics.span('writer.update', table=self.target_table, match_type=match_type) as span:
+            logging.info("UPDATING RECORDS: %s" % self.target_table)
 
-        tgt_matches = self.proc_matches[match_type]
-        tgt_oids_update = tgt_matches.keys()
-                
-        if len(tgt_oids_update) > 0:
-            query = "OBJECTID IN " + str(tuple(tgt_oids_update)).replace(',)', ')')
-        else:
-            query = "OBJECTID IN (-1)"
+            tgt_matches = self.proc_matches[match_type]
+            src_oids_writable = set(self.matcher.writable_src_oids())
+            tgt_oids_update = sorted(k for k, v in tgt_matches.items() if v[0] in src_oids_writable)
 
-        src_reader = self.matcher.src_reader
-        src_reader.read([oid_attr_token] + field_names)
-        src_reader_dict = {}
-        for rec in src_reader.data:
-            src_reader_dict[rec[0]] = rec[1:]
-
-        target_workspace = get_workspace_path(self.target_table)
-
-        try:
-            # print("--Initializing editor...")
-            edit = arcpy.da.Editor(target_workspace)
-            # print("--Starting edit session...")
-            edit.startEditing(False, True)
-            # print("--Initializing update cursor...")
-            with arcpy.da.UpdateCursor(self.target_table, [oid_attr_token] + field_names, query) as ucur:
-                # print("--Starting edit operation...")
-                edit.startOperation()
-                # print("--Updating records...")
-                for tgt_data in ucur:
-                    try:
-                        tgt_oid = tgt_data[0]
-                        tgt_data = tgt_data[1:]
-                        src_oid = tgt_matches[tgt_oid][0]
-                        src_data = src_reader_dict[src_oid]
-                        src_data_valid = tuple([validate_value(v) for v in src_data])
-                        tgt_data_valid = tuple([validate_value(v) for v in tgt_data])
-                        if src_data_valid != tgt_data_valid:
-                            paired_data = zip(src_data_valid, tgt_data_valid)
-                            out_data = tuple([tgt_oid] + [sd if sd is not None else td for sd, td in paired_data])
-                            ucur.updateRow(out_data)
-                    except (RuntimeError, SystemError) as e:
-                        result = 2
-                        logging.warning("TARGET OID: %s | %s | %s" % (tgt_oid, sys.exc_info()[0], e))
-                edit.stopOperation()
-            edit.stopEditing(True)  # save all changes
-        except (arcpy.ExecuteError, SystemError) as e:
-            result = 0
-            edit.stopEditing(False)  # discard all changes
-            logging.warning("Unexpected error: %s | %s" % (sys.exc_info()[0], e))
-            logging.info("No changes were saved.")
+            target_workspace = get_workspace_path(self.target_table)
+
+            try:
+                # print("--Initializing editor...")
+                edit = arcpy.da.Editor(target_workspace)
+                # print("--Starting edit session...")
+                edit.startEditing(False, True)
+                for start in range(0, len(tgt_oids_update), write_batch_rows):
+                    tgt_oids_batch = tgt_oids_update[start:start + write_batch_rows]
+                    src_reader_dict = self._read_source_rows(field_names, [tgt_matches[k][0] for k in tgt_oids_batch])
+                    query = make_oid_query('OBJECTID', tgt_oids_batch)
+                    span.count('batches')
+                    # print("--Initializing update cursor...")
+                    with arcpy.da.UpdateCursor(self.target_table, [oid_attr_token] + field_names, query) as ucur:
+                        # print("--Starting edit operation...")
+                        edit.startOperation()
+                        # print("--Updating records...")
+                        for tgt_data in ucur:
+                            try:
+                                tgt_oid = tgt_data[0]
+                                tgt_data = tgt_data[1:]
+                                src_oid = tgt_matches[tgt_oid][0]
+                                src_data = src_reader_dict[src_oid]
+                                src_data_valid = tuple([validate_value(v) for v in src_data])
+                                tgt_data_valid = tuple([validate_value(v) for v in tgt_data])
+                                span.count('rows_in')
+                                if src_data_valid != tgt_data_valid:
+                                    paired_data = zip(src_data_valid, tgt_data_valid)
+                                    out_data = tuple([tgt_oid] + [sd if sd is not None else td for sd, td in paired_data])
+                                    ucur.updateRow(out_data)
+                                    span.count('rows_written')
+                            except (RuntimeError, SystemError) as e:
+                                span.count('rows_failed')
+                                result = 2
+                                logging.warning("TARGET OID: %s | %s | %s" % (tgt_oid, sys.exc_info()[0], e))
+                        edit.stopOperation()
+                edit.stopEditing(True)  # save all changes
+            except (arcpy.ExecuteError, SystemError) as e:
+                result = 0
+                edit.stopEditing(False)  # discard all changes
+                logging.warning("Unexpected error: %s | %s" % (sys.exc_info()[0], e))
+                logging.info("No changes were saved.")
 
         return result
 
@@ -490,42 +743,43 @@ class Writer(object):
         """
 
         result = 1
-        logging.info("INSERTING RECORDS: %s" % self.target_table)
+        with metrics.span('writer.insert', table=self.target_table, match_type=match_type) as span:
+            logging.info("INSERTING RECORDS: %s" % self.target_table)
 
-        tgt_matches = self.proc_matches[match_type]
-        src_oids_all = self.matcher.src_oid_index.keys()
-        src_oids_matched = [v[0] for k, v in tgt_matches.iteritems()]
-        src_oids_insert = list(set(src_oids_all) - set(src_oids_matched))
-        
-        src_reader = self.matcher.src_reader
-        src_reader.read([src_reader.field_name_oid] + field_names)
-        src_reader_dict = {}
-        
-        for rec in src_reader.data:
-            src_reader_dict[rec[0]] = rec[1:]
+            tgt_matches = self.proc_matches[match_type]
+            src_oids_all = self.matcher.writable_src_oids()
+            src_oids_matched = [v[0] for k, v in tgt_matches.items()]
+            src_oids_insert = sorted(set(src_oids_all) - set(src_oids_matched))
+            span.count('rows_in', len(src_oids_insert))
 
-        target_workspace = get_workspace_path(self.target_table)
+            target_workspace = get_workspace_path(self.target_table)
 
-        try:
-            edit = arcpy.da.Editor(target_workspace)
-            edit.startEditing(False, True)
-            with arcpy.da.InsertCursor(self.target_table, field_names) as icur:
-                edit.startOperation()
-                for src_oid in src_oids_insert:
-                    try:
-                        src_data = src_reader_dict[src_oid]
-                        out_data = tuple([validate_value(v) for v in src_data])
-                        icur.insertRow(out_data)
-                    except RuntimeError as e:
-                        result = 2
-                        logging.warning("SOURCE OID: %s | %s | %s" % (src_oid, sys.exc_info()[0], e))
-                edit.stopOperation()
-            edit.stopEditing(True)
-        except (arcpy.ExecuteError, SystemError) as e:
-            result = 0
-            edit.stopEditing(False)
-            logging.warning("Unexpected error: %s | %s" % (sys.exc_info()[0], e))
-            logging.info("No changes were saved.")
+            try:
+                edit = arcpy.da.Editor(target_workspace)
+                edit.startEditing(False, True)
+                with arcpy.da.InsertCursor(self.target_table, field_names) as icur:
+                    for start in range(0, len(src_oids_insert), write_batch_rows):
+                        src_oids_batch = src_oids_insert[start:start + write_batch_rows]
+                        src_reader_dict = self._read_source_rows(field_names, src_oids_batch)
+                        span.count('batches')
+                        edit.startOperation()
+                        for src_oid in src_oids_batch:
+                            try:
+                                src_data = src_reader_dict[src_oid]
+                                out_data = tuple([validate_value(v) for v in src_data])
+                                icur.insertRow(out_data)
+                                span.count('rows_written')
+                            except RuntimeError as e:
+                                span.count('rows_failed')
+                                result = 2
+                                logging.warning("SOURCE OID: %s | %s | %s" % (src_oid, sys.exc_info()[0], e))
+                        edit.stopOperation()
+                edit.stopEditing(True)
+            except (arcpy.ExecuteError, SystemError) as e:
+                result = 0
+                edit.stopEditing(False)
+                logging.warning("Unexpected error: %s | %s" % (sys.exc_info()[0], e))
+                logging.info("No changes were saved.")
 
         return result
 
@@ -537,37 +791,37 @@ class Writer(object):
         """
 
         result = 1
-        logging.info("DELETING RECORDS: %s" % self.target_table)
-        
-        tgt_oids_all = self.matcher.tgt_oid_index.keys()
-        tgt_oids_matched = self.proc_matches[match_type].keys()
-        tgt_oids_delete = list(set(tgt_oids_all) - set(tgt_oids_matched))
+        with metrics.span('writer.delete', table=self.target_table, match_type=match_type) as span:
+            logging.info("DELETING RECORDS: %s" % self.target_table)
 
-        if len(tgt_oids_delete) > 0:
-            query = "OBJECTID IN " + str(tuple(tgt_oids_delete)).replace(',)', ')')
-        else:
-            query = "OBJECTID IN (-1)"
+            tgt_oids_all = self.matcher.writable_tgt_oids()
+            tgt_oids_matched = self.proc_matches[match_type].keys()
+            tgt_oids_delete = list(set(tgt_oids_all) - set(tgt_oids_matched))
 
-        target_workspace = get_workspace_path(self.target_table)
+            query = make_oid_query('OBJECTID', tgt_oids_delete)
 
-        try:
-            edit = arcpy.da.Editor(target_workspace)
-            edit.startEditing(False, True)
-            with arcpy.da.UpdateCursor(self.target_table, [oid_attr_token], query) as ucur:
-                edit.startOperation()
-                for row in ucur:
-                    try:
-                        tgt_oid = row[0]
-                        ucur.deleteRow()
-                    except RuntimeError as e:
-                        result = 2
-                        logging.warning("TARGET OID: %s | %s | %s" % (tgt_oid, sys.exc_info()[0], e))
-                edit.stopOperation()
-            edit.stopEditing(True)
-        except (arcpy.ExecuteError, SystemError) as e:
-            result = 0
-            edit.stopEditing(False)
-            logging.warning("Unexpected error: %s | %s" % (sys.exc_info()[0], e))
-            logging.info("No changes were saved.")
+            target_workspace = get_workspace_path(self.target_table)
+
+            try:
+                edit = arcpy.da.Editor(target_workspace)
+                edit.startEditing(False, True)
+                with arcpy.da.UpdateCursor(self.target_table, [oid_attr_token], query) as ucur:
+                    edit.startOperation()
+                    for row in ucur:
+                        try:
+                            tgt_oid = row[0]
+                            ucur.deleteRow()
+                            span.count('rows_written')
+                        except RuntimeError as e:
+                            span.count('rows_failed')
+                            result = 2
+                            logging.warning("TARGET OID: %s | %s | %s" % (tgt_oid, sys.exc_info()[0], e))
+                    edit.stopOperation()
+                edit.stopEditing(True)
+            except (arcpy.ExecuteError, SystemError) as e:
+                result = 0
+                edit.stopEditing(False)
+                logging.warning("Unexpected error: %s | %s" % (sys.exc_info()[0], e))
+                logging.info("No changes were saved.")
 
         return result
@@ -1,7 +1,17 @@
-
 # --- import modules ---
 
+import copy
+import json
+import argparse
+import ledger
+import metrics
+import spill
+import replay
+import tile_index
+import profiling
+import sde_connection
 from tools import *
+from journal import Journal, workspace_token, make_step_token
 from config import gen_config, oper_config, class_config
 
 # --- get general configuration import variables ---
@@ -10,178 +20,402 @@ shp_attr_token = gen_config['shp_attr_token']
 oid_attr_token = gen_config['oid_attr_token']
 sde_prefix = gen_config['sde_prefix']
 log_dir = gen_config['log_dir']
+resume = gen_config['resume']
+profile_classes = gen_config['profile_classes']
+memory_budget_mb = gen_config['memory_budget_mb']
+match_row_bytes = gen_config['match_row_bytes']
+write_batch_rows = gen_config['write_batch_rows']
+write_row_bytes = gen_config['write_row_bytes']
+spill_dir = gen_config['spill_dir']
+change_tile_bins = gen_config['change_tile_bins']
+change_halo_bins = gen_config['change_halo_bins']
 oper_status = oper_config['status']  # oper_order
 oper_results = oper_config['results']  # result_map
 
-# --- get input variables from geoprocessing tool ---
-
-city_name = "'%s'" % arcpy.GetParameterAsText(0)
-src_dbpath = arcpy.GetParameterAsText(1)
-tgt_dbpath = arcpy.GetParameterAsText(2)
-
-# --- begin import process ---
-
-msg = ("Import City: %s"
-       "\nSource Database: %s"
-       "\nTarget Database: %s"
-       "\nLog Location: %s" %
-       (city_name,
-        src_dbpath,
-        tgt_dbpath,
-        log_dir))
-
-arcpy.AddMessage(msg)
-print(msg)
-
-# --- build list of classes available for import ---
-
-src_featclasses = []
-for dataset in class_config.keys():
-    arcpy.env.workspace = os.path.join(src_dbpath, dataset)
-    featclasses = arcpy.ListFeatureClasses()
-    if featclasses:
-        src_featclasses += featclasses
-
-# --- import each available class if 'active' is True in config file ---
-
-for ds_name, class_info in class_config.iteritems():
-    work_sort = sorted([(attrs['work_order'], class_name)
-                       for class_name, attrs in class_info.iteritems()])
-    for work_order, class_name in work_sort:
-        config_info = class_info[class_name]
-        if class_name in src_featclasses:
-            if config_info['active'] is True:
-                
-                msg = "Importing Class: %s" % class_name
-                arcpy.AddMessage(msg)
-                print(msg)
-
-                # --- get class-specific configuration import variables ---
-
-                msg = "  Configuring Import Variables"
-                arcpy.AddMessage(msg)
-                print(msg)
-                
-                src_classpath = os.path.join(src_dbpath, ds_name, class_name)
-                tgt_classpath = os.path.join(tgt_dbpath, sde_prefix + ds_name, sde_prefix + class_name)
-                match_angle = config_info['match_angle']
-                match_dist = config_info['match_dist']
-                grid_size = match_dist * 3.0
-                match_attr = config_info['match_attr']
-                match_type = config_info['match_type']
-                juris_field = config_info['juris_field']
-                maint_field = config_info['maint_field']
-                update_fields = config_info['update_fields']
-                insert_fields = update_fields + [juris_field, maint_field]
-                class_operations = config_info['operations']
-
-                # --- update where clauses with class-specific information ---
-                
-                for oper, attr in class_operations.iteritems():
-                    for attr_name, value in attr.iteritems():
-                        if attr_name == 'where_clause':
-                            class_operations[oper][attr_name] = (
-                                value
-                                .replace('<cityname>', city_name)
-                                .replace('<jurisfield>', juris_field)
-                                .replace('<maintfield>', maint_field)
-                                )
-
-                # --- read data from source feature class ---
-
-                msg = "  Reading Source Features"
-                arcpy.AddMessage(msg)
-                print(msg)
-                
-                src_reader = Reader(src_classpath)
-                src_reader.read([oid_attr_token, match_attr, shp_attr_token])
-
-                oper_sort = sorted([(attrs['order'], oper_name)
-                                    for oper_name, attrs in oper_config['status'].iteritems()
-                                    if attrs['enabled'] is True])
-                
-                for oper_order, oper_name in oper_sort:
-
-                    if class_operations[oper_name]['state'] is True:
-
-                        # --- read data from target feature class ---
-
-                        msg = "  Reading Target Features"
-                        arcpy.AddMessage(msg)
-                        print(msg)
-                        
-                        tgt_reader = Reader(tgt_classpath)
-                        tgt_reader.read([oid_attr_token, match_attr, shp_attr_token],
-                                        expand_extent(src_reader.extent, grid_size),
-                                        class_operations[oper_name]['where_clause'])
-                        
-                        # --- match source and target records ---
-
-                        msg = "  Matching Features"
-                        arcpy.AddMessage(msg)
-                        print(msg)
-                        matcher = Matcher(src_reader,
-                                          tgt_reader,
-                                          match_attr,
-                                          match_dist,
-                                          match_angle,
-                                          grid_size)
-                        matcher.find_matches()
-
-                        writer = Writer(matcher, tgt_classpath)
-
-                        if oper_name == 'delete':
-                            
-                            # --- delete unmatched target records ---
-                            
-                            msg = "  Deleting Target Features"
-                            arcpy.AddMessage(msg)
-                            print(msg)
-                            result = writer.delete(match_type)
-                            msg = oper_config['results'][result].upper()
-                            arcpy.AddMessage(msg)
-                            print(msg)
-
-                        elif oper_name == 'update':
-                            
-                            # --- update matched target records ---
-                            
-                            msg = "  Updating Target Features"
-                            arcpy.AddMessage(msg)
-                            print(msg)
-                            result = writer.update(update_fields, match_type)
-                            msg = oper_config['results'][result].upper()
-                            arcpy.AddMessage(msg)
-                            print(msg)
-
-                        elif oper_name == 'insert':
-                            
-                            # --- insert unmatched source records into target feature class ---
-                            
-                            msg = "  Inserting Target Features"
-                            arcpy.AddMessage(msg)
-                            print(msg)
-                            result = writer.insert(insert_fields, match_type)
-                            msg = oper_config['results'][result].upper()
-                            arcpy.AddMessage(msg)
-                            print(msg)
-
-                        else:
-                            msg = "  Operation %s is not recognized." % oper_name
-                            arcpy.AddMessage(msg)
-                            print(msg)
-                            
-                    else:
-                        msg = "  Operation %s not enabled in config file." % oper_name
-                        arcpy.AddMessage(msg)
-                        print(msg)
-                
+# --- global functions ---
+
+def message(msg):
+    """Write msg to geoprocessing tool messages and standard output."""
+
+    arcpy.AddMessage(msg)
+    print(msg)
+
+
+def list_source_classes(src_dbpath, dataset_names):
+    """Return names of feature classes found in the input datasets of src_dbpath."""
+
+    temp_env = arcpy.env.workspace
+    result = []
+    for dataset in dataset_names:
+        arcpy.env.workspace = os.path.join(src_dbpath, dataset)
+        featclasses = arcpy.ListFeatureClasses()
+        if featclasses:
+            result += featclasses
+    arcpy.env.workspace = temp_env
+    return result
+
+
+def load_unchanged_classes(changes_path):
+    """Return names of classes marked 'unchanged' in a content changes file.
+
+    The file is written by data_access gdb_compare.CompareData.save_changes for the geodatabase last
+    imported (base) and the new source geodatabase (test).
+    """
+
+    f = open(changes_path)
+    changes = json.load(f)
+    f.close()
+    result = sorted(class_name for class_name, state in changes['classes'].items() if state == 'unchanged')
+    return result
+
+
+def plan_partitions(src_reader, tgt_classpath, grid_size, memory_budget_mb, region=None):
+    """Return tile width in grid bins if projected matching memory exceeds memory_budget_mb, else None.
+
+    Projected memory includes one Writer batch of source records (write_batch_rows).
+    If region (tile_index.TileRegion) is set, only records in region are counted.
+    """
+
+    if not memory_budget_mb:
+        return None
+    shape_type = src_reader.describe.shapeType.lower()
+    row_bytes = match_row_bytes.get(shape_type, max(match_row_bytes.values()))
+    write_bytes = write_row_bytes.get(shape_type, max(write_row_bytes.values()))
+    src_count = count_rows(src_reader.table_path, region)
+    projected = spill.projected_match_bytes(src_count, count_rows(tgt_classpath, region), row_bytes,
+                                            min(src_count, write_batch_rows), write_bytes)
+    budget = memory_budget_mb * 1048576.0
+    if projected <= budget:
+        return None
+    tgt_extent = arcpy.Describe(tgt_classpath).extent
+    result = spill.partition_bins(combine_extents([src_reader.extent, tgt_extent]), grid_size, projected, budget)
+    message("  Projected matching memory %.1f MB exceeds budget %.1f MB; matching by spatial partition"
+            % (projected / 1048576.0, memory_budget_mb))
+    return result
+
+
+def plan_region(base_classpath, src_classpath, grid_size):
+    """Return TileRegion of tiles whose content differs between base_classpath and src_classpath.
+
+    Returns None if base_classpath does not exist (whole class is imported).
+    The region has no tiles if the content is unchanged.
+    """
+
+    if not arcpy.Exists(base_classpath):
+        message("  Class not found in base database; importing whole class.")
+        return None
+    tile_size = grid_size * change_tile_bins
+    with metrics.span('import.change_tiles') as span:
+        depth = tile_index.tree_depth([arcpy.Describe(base_classpath).extent,
+                                       arcpy.Describe(src_classpath).extent], tile_size)
+        base_tree = tile_index.build_tree(base_classpath, tile_size, depth=depth)
+        src_tree = tile_index.build_tree(src_classpath, tile_size, depth=depth)
+        tiles = tile_index.changed_tiles(base_tree, src_tree)
+        span.count('tiles', len(src_tree.levels[0]))
+        span.count('tiles_changed', len(tiles))
+    result = tile_index.TileRegion(tiles, tile_size, grid_size * change_halo_bins)
+    message("  %d of %d tiles changed since base database" % (len(tiles), len(src_tree.levels[0])))
+    return result
+
+
+def import_class(city_key, src_dbpath, tgt_dbpath, ds_name, class_name, config_info,
+                 journal, src_token, resume=True, memory_budget_mb=memory_budget_mb, base_dbpath=None):
+    """Run enabled edit operations for one feature class.
+
+    config_info must be a copy of the class_config entry; its where clauses are updated in place.
+    If memory_budget_mb is exceeded, records are streamed into a PartitionedMatcher instead of read.
+    If base_dbpath (the source last imported) is set, only tiles whose content changed since then,
+    plus a halo, are read and matched (within the memory budget); the class is skipped if nothing changed.
+    Attribute matching (match_type 'attr') is not spatial, so those classes are imported whole.
+    Returns dict of operation result codes keyed by operation name (see oper_config['results']).
+    """
+
+    result = {}
+    city_name = "'%s'" % city_key
+
+    # --- get class-specific configuration import variables ---
+
+    message("  Configuring Import Variables")
+
+    src_classpath = os.path.join(src_dbpath, ds_name, class_name)
+    tgt_classpath = os.path.join(tgt_dbpath, sde_prefix + ds_name, sde_prefix + class_name)
+    match_angle = config_info['match_angle']
+    match_dist = config_info['match_dist']
+    grid_size = match_dist * 3.0
+    match_attr = config_info['match_attr']
+    match_type = config_info['match_type']
+    juris_field = config_info['juris_field']
+    maint_field = config_info['maint_field']
+    update_fields = config_info['update_fields']
+    insert_fields = update_fields + [juris_field, maint_field]
+    class_operations = config_info['operations']
+
+    # --- update where clauses with class-specific information ---
+
+    for oper, attr in class_operations.items():
+        for attr_name, value in attr.items():
+            if attr_name == 'where_clause':
+                class_operations[oper][attr_name] = (
+                    value
+                    .replace('<cityname>', city_name)
+                    .replace('<jurisfield>', juris_field)
+                    .replace('<maintfield>', maint_field)
+                    )
+
+    # --- skip class if every enabled operation is complete in the journal ---
+
+    step_token = make_step_token(src_token, tgt_classpath, config_info)
+
+    oper_sort = sorted([(attrs['order'], oper_name)
+                        for oper_name, attrs in oper_config['status'].items()
+                        if attrs['enabled'] is True])
+
+    oper_pending = [oper_name for oper_order, oper_name in oper_sort
+                    if class_operations[oper_name]['state'] is True
+                    and not (resume and journal.is_complete(city_key, ds_name, class_name,
+                                                            oper_name, step_token))]
+
+    if len(oper_pending) == 0:
+        message("  All operations complete in job journal; skipping class.")
+        return result
+
+    # --- find tiles changed since base database ---
+
+    region = None
+    if base_dbpath and match_type == 'attr':
+        message("  Attribute matching is not limited to changed tiles; importing whole class.")
+    elif base_dbpath:
+        region = plan_region(os.path.join(base_dbpath, ds_name, class_name), src_classpath, grid_size)
+        if region is not None and len(region.tiles) == 0:
+            message("  Content unchanged since base database; skipping class.")
+            return result
+    # matches of records in region depend on records up to two match neighbourhoods (4 grid bins) away
+    read_region = region.expand(grid_size * 4) if region is not None else None
+
+    # --- read data from source feature class ---
+
+    message("  Reading Source Features")
+
+    src_reader = Reader(src_classpath)
+    tile_bins = plan_partitions(src_reader, tgt_classpath, grid_size, memory_budget_mb, read_region)
+    if tile_bins is None:
+        with profiling.phase(class_name, 'read_source', {'Reader.data': [Reader.read]}):
+            src_reader.read([oid_attr_token, match_attr, shp_attr_token], region=read_region)
+
+    for oper_order, oper_name in oper_sort:
+
+        if class_operations[oper_name]['state'] is not True:
+            message("  Operation %s not enabled in config file." % oper_name)
+            continue
+
+        if oper_name not in oper_pending:
+            message("  Operation %s complete in job journal; skipping." % oper_name)
+            continue
+
+        if oper_name not in ('delete', 'update', 'insert'):
+            message("  Operation %s is not recognized." % oper_name)
+            continue
+
+        journal.start(city_key, ds_name, class_name, oper_name, step_token)
+        metrics.set_context(operation=oper_name)
+
+        # --- read data from target feature class ---
+
+        message("  Reading Target Features")
+
+        tgt_reader = Reader(tgt_classpath)
+        if tile_bins is None:
+            with profiling.phase(class_name, 'read_target_%s' % oper_name, {'Reader.data': [Reader.read]}):
+                tgt_reader.read([oid_attr_token, match_attr, shp_attr_token],
+                                expand_extent(src_reader.extent, grid_size),
+                                class_operations[oper_name]['where_clause'],
+                                read_region)
+
+        # --- match source and target records ---
+
+        message("  Matching Features")
+        with profiling.phase(class_name, 'match_%s' % oper_name,
+                             {'Matcher indexes': [Matcher._build_spatial_index, Matcher._build_field_index],
+                              'Reader.data': [Reader.read]}):
+            if tile_bins is None and region is not None:
+                matcher = RegionMatcher(src_reader,
+                                        tgt_reader,
+                                        match_attr,
+                                        match_dist,
+                                        match_angle,
+                                        grid_size,
+                                        region)
+            elif tile_bins is None:
+                matcher = Matcher(src_reader,
+                                  tgt_reader,
+                                  match_attr,
+                                  match_dist,
+                                  match_angle,
+                                  grid_size)
+            else:
+                matcher = PartitionedMatcher(src_reader,
+                                             tgt_reader,
+                                             match_attr,
+                                             match_dist,
+                                             match_angle,
+                                             grid_size,
+                                             tile_bins,
+                                             expand_extent(src_reader.extent, grid_size),
+                                             class_operations[oper_name]['where_clause'],
+                                             spill_dir,
+                                             region,
+                                             read_region)
+            matcher.find_matches()
+
+        with profiling.phase(class_name, 'write_%s' % oper_name):
+
+            writer = Writer(matcher, tgt_classpath)
+
+            if oper_name == 'delete':
+
+                # --- delete unmatched target records ---
+
+                message("  Deleting Target Features")
+                oper_result = writer.delete(match_type)
+
+            elif oper_name == 'update':
+
+                # --- update matched target records ---
+
+                message("  Updating Target Features")
+                oper_result = writer.update(update_fields, match_type)
+
             else:
-                msg = "Class '%s' not set to active in config file." % class_name
-                arcpy.AddMessage(msg)
-                print(msg)
-                
-        else:
-            msg = "Class '%s' not found in source database." % class_name
-            arcpy.AddMessage(msg)
-            print(msg)
+
+                # --- insert unmatched source records into target feature class ---
+
+                message("  Inserting Target Features")
+                oper_result = writer.insert(insert_fields, match_type)
+
+        matcher.close()
+
+        journal.finish(city_key, ds_name, class_name, oper_name, step_token, oper_result)
+        message(oper_config['results'][oper_result].upper())
+        result[oper_name] = oper_result
+
+    metrics.set_context(operation=None)
+    return result
+
+
+def import_city(city_key, src_dbpath, tgt_dbpath, class_names=None, resume=resume,
+                memory_budget_mb=memory_budget_mb, skip_classes=None, base_dbpath=None):
+    """Import active configured classes for one city from src_dbpath into tgt_dbpath.
+
+    tgt_dbpath is a target geodatabase path or a connection (see sde_connection, e.g. the
+    CityDataImporter connection used for staging); a connection is validated once and its path is
+    used by every Reader and Writer of the target.
+    class_names optionally restricts the import to the listed classes.
+    skip_classes lists classes whose source content is unchanged since the last import; they are not read.
+    base_dbpath is the source geodatabase of the last import; if set, only changed tiles are imported.
+    Returns dict of operation result codes keyed by (dataset, class, operation).
+    Safe to call repeatedly from one process; class_config is copied for each call.
+    """
+
+    result = {}
+    run_config = copy.deepcopy(class_config)
+    if hasattr(tgt_dbpath, 'get_path'):
+        tgt_dbpath = tgt_dbpath.get_path()
+
+    msg = ("Import City: %s"
+           "\nSource Database: %s"
+           "\nTarget Database: %s"
+           "\nLog Location: %s" %
+           ("'%s'" % city_key,
+            src_dbpath,
+            tgt_dbpath,
+            log_dir))
+    message(msg)
+
+    # --- open job journal and compute source change token ---
+
+    journal = Journal(os.path.join(log_dir, 'import_journal.sqlite'))
+    src_token = workspace_token(src_dbpath)
+
+    # --- build list of classes available for import ---
+
+    src_featclasses = list_source_classes(src_dbpath, run_config.keys())
+
+    # --- import each available class if 'active' is True in config file ---
+
+    try:
+        for ds_name, class_info in run_config.items():
+            work_sort = sorted([(attrs['work_order'], class_name)
+                               for class_name, attrs in class_info.items()])
+            for work_order, class_name in work_sort:
+                config_info = class_info[class_name]
+                if class_names and class_name not in class_names:
+                    continue
+                if class_name not in src_featclasses:
+                    message("Class '%s' not found in source database." % class_name)
+                elif config_info['active'] is not True:
+                    message("Class '%s' not set to active in config file." % class_name)
+                elif skip_classes and class_name in skip_classes:
+                    message("Class '%s' content unchanged since last import; skipping." % class_name)
+                else:
+                    message("Importing Class: %s" % class_name)
+                    metrics.set_context(city=city_key, dataset=ds_name, class_name=class_name)
+                    with metrics.span('import.class'):
+                        class_result = import_class(city_key, src_dbpath, tgt_dbpath, ds_name, class_name,
+                                                    config_info, journal, src_token, resume,
+                                                    memory_budget_mb, base_dbpath)
+                    for oper_name, oper_result in class_result.items():
+                        result[ds_name, class_name, oper_name] = oper_result
+    finally:
+        journal.close()
+        metrics.set_context(city=None, dataset=None, class_name=None, operation=None)
+
+    return result
+
+
+def main(argv=None):
+    """Parse command line (or geoprocessing tool) arguments and run the import."""
+
+    parser = argparse.ArgumentParser(description="Import city sewer features into the target database.")
+    parser.add_argument('city', help="city name as stored in the maintenance field, e.g. BEAVERTON")
+    parser.add_argument('src_dbpath', help="source geodatabase path")
+    parser.add_argument('tgt_dbpath', help="target geodatabase path or sde connection file (validated before import)")
+    parser.add_argument('--classes', nargs='+', default=None, help="import only these classes")
+    parser.add_argument('--no-resume', dest='resume', action='store_false', default=resume,
+                        help="re-run steps already recorded as complete in the job journal")
+    parser.add_argument('--memory-budget', dest='memory_budget_mb', type=float, default=memory_budget_mb,
+                        metavar='MB', help="match by spatial partition when projected memory exceeds MB")
+    parser.add_argument('--skip-unchanged', dest='changes_path', default=None, metavar='CHANGES_JSON',
+                        help="skip classes marked unchanged in this content changes file (gdb_compare.CompareData)")
+    parser.add_argument('--changed-since', dest='base_dbpath', default=None, metavar='BASE_DBPATH',
+                        help="source geodatabase of the last import; only tiles changed since then are imported")
+    parser.add_argument('--record', default=None, metavar='FIXTURE',
+                        help="record cursor streams, Describe metadata and write calls to this fixture file")
+    parser.add_argument('--profile', nargs='+', default=profile_classes, metavar='CLASS',
+                        help="write cProfile and tracemalloc stats for these classes ('*' for all) to the log directory")
+    args = parser.parse_args(argv)
+
+    logpath = configure_logging(log_dir)
+    metrics_path = metrics.configure(os.path.splitext(logpath)[0] + '_metrics.jsonl')
+    profiling.configure(args.profile, log_dir, os.path.splitext(os.path.basename(logpath))[0])
+    skip_classes = load_unchanged_classes(args.changes_path) if args.changes_path else None
+    tgt_connection = sde_connection.open_connection(args.tgt_dbpath)
+    tgt_connection.get_path()  # validate before recording, so the check is not part of a fixture
+    recorder = replay.start_recording(args.record) if args.record else None
+    try:
+        result = import_city(args.city, args.src_dbpath, tgt_connection, args.classes, args.resume,
+                             args.memory_budget_mb, skip_classes, args.base_dbpath)
+    finally:
+        metrics.close()
+        perf_ledger = ledger.Ledger()
+        perf_ledger.ingest(metrics_path)
+        perf_ledger.close()
+        if recorder is not None:
+            replay.stop_recording(recorder, city=args.city, src_dbpath=args.src_dbpath,
+                                  tgt_dbpath=args.tgt_dbpath, class_names=args.classes,
+                                  memory_budget_mb=args.memory_budget_mb, skip_classes=skip_classes,
+                                  base_dbpath=args.base_dbpath)
+    return result
+
+
+if __name__ == '__main__':
+    main()
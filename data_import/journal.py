@@ -0,0 +1,148 @@
+# dev notes:
+# Journal steps are keyed by (city, dataset, class, operation)
+# A step is skipped on resume only if it completed and its input token is unchanged
+
+# --- import modules ---
+
+import os
+import json
+import sqlite3
+import hashlib
+import datetime
+
+# --- module constants ---
+
+sqlite_workspace_types = ('.gpkg', '.sqlite')
+sqlite_header_bytes = 100  # holds the file change counter and schema cookie
+gdb_table_types = ('.gdbtable', '.gdbtablx')
+gdb_header_bytes = 40  # holds the row count and offsets of a table or its index
+
+# --- global functions ---
+
+def sqlite_file_token(workspace_path):
+    """Return change token for a geopackage or sqlite database.
+
+    The token is made from the size and modified time of the file (and of a write-ahead log file, if
+    present), the database header and the table definitions in sqlite_master.
+    """
+
+    digest = hashlib.sha1()
+    for file_path in [workspace_path, workspace_path + '-wal']:
+        if not os.path.isfile(file_path):
+            continue
+        file_stat = os.stat(file_path)
+        digest.update(("%s|%d|%.6f\n" % (file_path[len(workspace_path):], file_stat.st_size,
+                                          file_stat.st_mtime)).encode('utf-8'))
+    f = open(workspace_path, 'rb')
+    digest.update(f.read(sqlite_header_bytes))
+    f.close()
+    conn = sqlite3.connect(workspace_path)
+    try:
+        tables = conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+    finally:
+        conn.close()
+    digest.update(json.dumps(tables).encode('utf-8'))
+    result = digest.hexdigest()
+    return result
+
+
+def workspace_token(workspace_path):
+    """Return change token for a file geodatabase from file names, sizes, modified times and table headers.
+
+    Geopackage and sqlite files get a token from sqlite_file_token. Returns None for other
+    workspaces (.sde, .mdb), which are never skipped.
+    The token does not include the workspace path, so a renamed or copied geodatabase has the same token.
+    """
+
+    if os.path.isfile(workspace_path) and os.path.splitext(workspace_path)[1].lower() in sqlite_workspace_types:
+        return sqlite_file_token(workspace_path)
+    if not os.path.isdir(workspace_path):
+        return None
+    digest = hashlib.sha1()
+    for dir_path, dir_names, file_names in os.walk(workspace_path):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.endswith('.lock'):
+                continue
+            file_stat = os.stat(os.path.join(dir_path, file_name))
+            rel_path = os.path.relpath(os.path.join(dir_path, file_name), workspace_path)
+            digest.update(("%s|%d|%.6f\n" % (rel_path, file_stat.st_size, file_stat.st_mtime)).encode('utf-8'))
+            if os.path.splitext(file_name)[1].lower() in gdb_table_types:
+                f = open(os.path.join(dir_path, file_name), 'rb')
+                digest.update(f.read(gdb_header_bytes))
+                f.close()
+    result = digest.hexdigest()
+    return result
+
+
+def make_step_token(src_token, tgt_path, class_info):
+    """Return token combining source workspace token, target path and class configuration.
+
+    Returns None if src_token is None.
+    """
+
+    if src_token is None:
+        return None
+    config_str = json.dumps(class_info, sort_keys=True, default=str)
+    digest = hashlib.sha1(("%s|%s|%s" % (src_token, tgt_path, config_str)).encode('utf-8'))
+    result = digest.hexdigest()
+    return result
+
+
+# --- global classes ---
+
+
+class Journal(object):
+    """Record outcome of each import step in a SQLite database so interrupted runs can resume."""
+
+    complete_results = (1, 2)
+
+    def __init__(self, journal_path):
+        """Open (or create) journal database at journal_path."""
+
+        self.journal_path = journal_path
+        self.conn = sqlite3.connect(self.journal_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS steps ("
+            "city TEXT, dataset TEXT, class_name TEXT, operation TEXT, "
+            "token TEXT, result INTEGER, updated TEXT, "
+            "PRIMARY KEY (city, dataset, class_name, operation))")
+        self.conn.commit()
+
+    def is_complete(self, city, dataset, class_name, operation, token):
+        """Return True if step completed in a previous run with the same input token."""
+
+        if token is None:
+            return False
+        row = self.conn.execute(
+            "SELECT token, result FROM steps "
+            "WHERE city=? AND dataset=? AND class_name=? AND operation=?",
+            (city, dataset, class_name, operation)).fetchone()
+        if row is None:
+            return False
+        result = row[0] == token and row[1] in self.complete_results
+        return result
+
+    def start(self, city, dataset, class_name, operation, token):
+        """Record step as started (result NULL) before any edits are made."""
+
+        self._write(city, dataset, class_name, operation, token, None)
+
+    def finish(self, city, dataset, class_name, operation, token, result):
+        """Record step result code (see oper_config['results'])."""
+
+        self._write(city, dataset, class_name, operation, token, result)
+
+    def _write(self, city, dataset, class_name, operation, token, result):
+        """Insert or replace step row and commit immediately."""
+
+        updated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.conn.execute(
+            "INSERT OR REPLACE INTO steps VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (city, dataset, class_name, operation, token, result, updated))
+        self.conn.commit()
+
+    def close(self):
+        """Close journal database."""
+
+        self.conn.close()
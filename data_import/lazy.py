@@ -0,0 +1,33 @@
+# --- import modules ---
+
+import sys
+import importlib
+
+# --- global classes ---
+
+
+class LazyModule(object):
+    """Module stand-in that imports the named module on first attribute access.
+
+    The module is looked up in sys.modules on every access so a substitute module
+    registered under the same name is picked up.
+    """
+
+    def __init__(self, module_name):
+        """Set name of module to import on first use."""
+
+        self.__dict__['_module_name'] = module_name
+
+    def _load(self):
+        """Return the imported module, importing it if necessary."""
+
+        module = sys.modules.get(self._module_name)
+        if module is None:
+            module = importlib.import_module(self._module_name)
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
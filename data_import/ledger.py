@@ -0,0 +1,213 @@
+# dev notes:
+# Performance ledger: per-run, per-class, per-phase timings ingested from <run>_metrics.jsonl files
+# Regressions are judged on seconds per row against the median of the previous runs (rolling baseline)
+# usage: python ledger.py ingest logs\20240101_120000_metrics.jsonl   |   python ledger.py report
+
+# --- import modules ---
+
+import os
+import json
+import sqlite3
+import argparse
+import datetime
+from config import gen_config
+
+# --- get general configuration import variables ---
+
+log_dir = gen_config['log_dir']
+
+# --- global functions ---
+
+def phase_rows(counters):
+    """Return number of rows a span worked on (rows in, else index rows, else rows out)."""
+
+    if 'rows_in' in counters:
+        return counters['rows_in']
+    if 'src_rows' in counters:
+        return counters['src_rows'] + counters.get('tgt_rows', 0)
+    result = counters.get('rows_out', 0)
+    return result
+
+
+def median(values):
+    """Return median of a non-empty list of numbers."""
+
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[mid]
+    result = (ordered[mid - 1] + ordered[mid]) / 2.0
+    return result
+
+
+# --- global classes ---
+
+
+class Ledger(object):
+    """History of phase timings and row counts stored in SQLite."""
+
+    def __init__(self, ledger_path=None):
+        """Open (or create) ledger database (default log_dir/perf_ledger.sqlite)."""
+
+        self.ledger_path = ledger_path or os.path.join(log_dir, 'perf_ledger.sqlite')
+        self.conn = sqlite3.connect(self.ledger_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS phases ("
+            "run_id TEXT, run_time TEXT, city TEXT, class_name TEXT, operation TEXT, phase TEXT, "
+            "wall REAL, cpu REAL, rows INTEGER, "
+            "PRIMARY KEY (run_id, city, class_name, operation, phase))")
+        self.conn.commit()
+
+    def ingest(self, metrics_path):
+        """Aggregate span records of one metrics file by (city, class, operation, phase) and store them.
+
+        Returns number of phase rows stored. Re-ingesting a run replaces its rows.
+        """
+
+        totals = {}
+        run_id = None
+        run_start = None
+        f = open(metrics_path)
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            run_id = record.get('run_id') or run_id
+            if run_start is None or record['start'] < run_start:
+                run_start = record['start']
+            key = (record.get('city') or '',
+                   record.get('class_name') or '',
+                   record.get('operation') or '',
+                   record['name'])
+            total = totals.setdefault(key, [0.0, 0.0, 0])
+            total[0] += record['wall']
+            total[1] += record['cpu']
+            total[2] += phase_rows(record.get('counters') or {})
+        f.close()
+
+        if run_id is None:
+            return 0
+        run_time = datetime.datetime.fromtimestamp(run_start).strftime("%Y-%m-%d %H:%M:%S")
+        self.conn.execute("DELETE FROM phases WHERE run_id=?", (run_id,))
+        self.conn.executemany(
+            "INSERT INTO phases VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, run_time) + key + tuple(total) for key, total in totals.items()])
+        self.conn.commit()
+        return len(totals)
+
+    def history(self, city=None, class_name=None):
+        """Return {(city, class, operation, phase): [(run_time, run_id, wall, cpu, rows), ...]} oldest first."""
+
+        query = "SELECT city, class_name, operation, phase, run_time, run_id, wall, cpu, rows FROM phases"
+        clauses = []
+        params = []
+        if city:
+            clauses.append("city=?")
+            params.append(city)
+        if class_name:
+            clauses.append("class_name=?")
+            params.append(class_name)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY run_time, run_id"
+        result = {}
+        for row in self.conn.execute(query, params):
+            result.setdefault(tuple(row[:4]), []).append(tuple(row[4:]))
+        return result
+
+    def regressions(self, threshold=0.25, window=5, min_rows=100, city=None, class_name=None):
+        """Return phases whose latest seconds per row exceed the rolling baseline by more than threshold.
+
+        Baseline is the median seconds per row of up to window earlier runs with at least min_rows rows.
+        Result is a list of (key, latest_sec_per_row, baseline_sec_per_row, ratio), worst first.
+        """
+
+        result = []
+        for key, runs in self.history(city, class_name).items():
+            runs = [r for r in runs if r[4] >= min_rows]
+            if len(runs) < 2:
+                continue
+            latest = runs[-1][2] / runs[-1][4]
+            baseline = median([r[2] / r[4] for r in runs[-1 - window:-1]])
+            if baseline > 0 and latest > baseline * (1.0 + threshold):
+                result.append((key, latest, baseline, latest / baseline))
+        result.sort(key=lambda r: -r[3])
+        return result
+
+    def throughput_trend(self, prefixes=('matcher.', 'writer.'), window=5, city=None, class_name=None):
+        """Return {(city, class, phase): [(run_time, rows per second), ...]} for the last window runs.
+
+        Operations are summed so each run has one value per class and phase.
+        """
+
+        per_run = {}
+        for (run_city, run_class, operation, phase), runs in self.history(city, class_name).items():
+            if not phase.startswith(prefixes):
+                continue
+            for run_time, run_id, wall, cpu, rows in runs:
+                total = per_run.setdefault((run_city, run_class, phase), {}).setdefault(run_time, [0.0, 0])
+                total[0] += wall
+                total[1] += rows
+        result = {}
+        for key, runs in per_run.items():
+            trend = [(run_time, rows / wall if wall > 0 else 0.0)
+                     for run_time, (wall, rows) in sorted(runs.items()) if rows > 0]
+            if trend:
+                result[key] = trend[-window:]
+        return result
+
+    def close(self):
+        """Close ledger database."""
+
+        self.conn.close()
+
+
+def format_report(ledger, threshold=0.25, window=5, city=None, class_name=None):
+    """Return text report of regressions and Matcher/Writer throughput trends."""
+
+    lines = ["PERFORMANCE REGRESSIONS (threshold %d%%, baseline median of %d runs):" % (threshold * 100, window)]
+    regressions = ledger.regressions(threshold, window, city=city, class_name=class_name)
+    for (run_city, run_class, operation, phase), latest, baseline, ratio in regressions:
+        lines.append("  %s %s %s %s: %.2f us/row vs %.2f us/row (x%.2f)"
+                     % (run_city, run_class, operation or '-', phase, latest * 1e6, baseline * 1e6, ratio))
+    if not regressions:
+        lines.append("  NONE")
+    lines.append("")
+    lines.append("THROUGHPUT TREND (rows/s, oldest to newest):")
+    trend = ledger.throughput_trend(window=window, city=city, class_name=class_name)
+    for key in sorted(trend):
+        lines.append("  %s %s %s: %s" % (key + (' -> '.join("%.0f" % tput for run_time, tput in trend[key]),)))
+    result = '\n'.join(lines) + '\n'
+    return result
+
+
+def main(argv=None):
+    """Ingest metrics files or print the regression report."""
+
+    parser = argparse.ArgumentParser(description="Track import performance across runs.")
+    parser.add_argument('--ledger', default=None, help="ledger database (default log_dir/perf_ledger.sqlite)")
+    subparsers = parser.add_subparsers(dest='command')
+    ingest_parser = subparsers.add_parser('ingest', help="add metrics files to the ledger")
+    ingest_parser.add_argument('metrics_paths', nargs='+')
+    report_parser = subparsers.add_parser('report', help="report regressions and throughput trends")
+    report_parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown per row (0.25 = 25%%)")
+    report_parser.add_argument('--window', type=int, default=5, help="number of earlier runs in the baseline")
+    report_parser.add_argument('--city', default=None)
+    report_parser.add_argument('--class', dest='class_name', default=None)
+    args = parser.parse_args(argv)
+
+    ledger = Ledger(args.ledger)
+    try:
+        if args.command == 'ingest':
+            for metrics_path in args.metrics_paths:
+                print("%s: %d phases" % (metrics_path, ledger.ingest(metrics_path)))
+        elif args.command == 'report':
+            print(format_report(ledger, args.threshold, args.window, args.city, args.class_name))
+        else:
+            parser.print_help()
+    finally:
+        ledger.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+# dev notes:
+# In-memory stand-in for the parts of arcpy used by import.py (da cursors, Describe, Extent, geometries)
+# Install with install() before the first arcpy attribute access; import.py resolves arcpy lazily
+# Where clauses: only "OBJECTID IN (...)" is evaluated, any other clause selects all rows
+
+# --- import modules ---
+
+import os
+import re
+import sys
+import math
+import types
+
+# --- module state ---
+
+tables = {}
+messages = []
+edit_log = []
+
+_oid_query = re.compile(r'^\s*OBJECTID\s+IN\s*\(([^)]*)\)\s*$', re.IGNORECASE)
+
+# --- global classes ---
+
+
+class ExecuteError(Exception):
+    """Stand-in for arcpy.ExecuteError."""
+
+
+class Env(object):
+    """Stand-in for arcpy.env."""
+
+    def __init__(self):
+        self.workspace = None
+        self.overwriteOutput = False
+
+
+env = Env()
+
+
+class Point(object):
+    """Stand-in for arcpy.Point."""
+
+    __slots__ = ('X', 'Y')
+
+    def __init__(self, X=0.0, Y=0.0):
+        self.X = X
+        self.Y = Y
+
+
+class Extent(object):
+    """Stand-in for arcpy.Extent."""
+
+    def __init__(self, XMin=None, YMin=None, XMax=None, YMax=None):
+        self.XMin = XMin
+        self.YMin = YMin
+        self.XMax = XMax
+        self.YMax = YMax
+
+    def contains(self, geom):
+        """Return True if point (or geometry centroid) lies within the extent."""
+
+        point = getattr(geom, 'centroid', geom)
+        result = self.XMin <= point.X <= self.XMax and self.YMin <= point.Y <= self.YMax
+        return result
+
+
+class Geometry(object):
+    """Stand-in for arcpy point and polyline geometries built from a list of (x, y) vertices."""
+
+    __slots__ = ('type', 'coords', 'firstPoint', 'lastPoint', 'centroid')
+
+    def __init__(self, geom_type, coords):
+        self.type = geom_type
+        self.coords = [tuple(c) for c in coords]
+        self.firstPoint = Point(*self.coords[0])
+        self.lastPoint = Point(*self.coords[-1])
+        self.centroid = self._calc_centroid()
+
+    def _calc_centroid(self):
+        """Return length-weighted centre of polyline segments (or the point itself)."""
+
+        if self.type == 'point' or len(self.coords) == 1:
+            return Point(*self.coords[0])
+        total = sx = sy = 0.0
+        for (x1, y1), (x2, y2) in zip(self.coords[:-1], self.coords[1:]):
+            seg = math.hypot(x2 - x1, y2 - y1)
+            total += seg
+            sx += seg * (x1 + x2) / 2.0
+            sy += seg * (y1 + y2) / 2.0
+        if total == 0:
+            return Point(*self.coords[0])
+        return Point(sx / total, sy / total)
+
+    @property
+    def extent(self):
+        xs = [c[0] for c in self.coords]
+        ys = [c[1] for c in self.coords]
+        return Extent(min(xs), min(ys), max(xs), max(ys))
+
+    def __iter__(self):
+        """Yield parts as lists of points (polylines are single-part)."""
+
+        yield [Point(x, y) for x, y in self.coords]
+
+    def distanceTo(self, other):
+        """Return minimum vertex-to-vertex distance (exact for points)."""
+
+        result = min(math.hypot(x1 - x2, y1 - y2)
+                     for x1, y1 in self.coords
+                     for x2, y2 in other.coords)
+        return result
+
+    def __eq__(self, other):
+        return isinstance(other, Geometry) and self.type == other.type and self.coords == other.coords
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = object.__hash__
+
+
+class Field(object):
+    """Stand-in for arcpy.Field."""
+
+    def __init__(self, name, field_type='String'):
+        self.name = name
+        self.type = field_type
+
+
+class Table(object):
+    """In-memory feature class: ordered field names and rows keyed by OID."""
+
+    def __init__(self, path, field_names, shape_type, oid_field='OBJECTID', shape_field='Shape'):
+        self.path = path
+        self.shape_type = shape_type
+        self.oid_field = oid_field
+        self.shape_field = shape_field
+        self.field_names = [oid_field] + list(field_names) + [shape_field]
+        self.field_pos = dict((name.lower(), i) for i, name in enumerate(self.field_names))
+        self.field_pos['oid@'] = 0
+        self.field_pos['shape@'] = len(self.field_names) - 1
+        self.rows = {}
+        self.next_oid = 1
+
+    def add_row(self, values, shape):
+        """Append row (values ordered as field_names without OID and shape) and return its OID."""
+
+        oid = self.next_oid
+        self.next_oid += 1
+        self.rows[oid] = [oid] + list(values) + [shape]
+        return oid
+
+    def positions(self, field_names):
+        """Return row positions of requested field names (case-insensitive, tokens supported)."""
+
+        result = [self.field_pos[name.lower()] for name in field_names]
+        return result
+
+    def select(self, where_clause):
+        """Return OIDs selected by where_clause."""
+
+        match = _oid_query.match(where_clause or '')
+        if match is None:
+            return sorted(self.rows)
+        oids = [int(v) for v in match.group(1).split(',') if v.strip()]
+        result = sorted(oid for oid in set(oids) if oid in self.rows)
+        return result
+
+    @property
+    def extent(self):
+        xs = []
+        ys = []
+        for row in self.rows.values():
+            for x, y in row[-1].coords:
+                xs.append(x)
+                ys.append(y)
+        if not xs:
+            return Extent(0.0, 0.0, 0.0, 0.0)
+        return Extent(min(xs), min(ys), max(xs), max(ys))
+
+
+class Describe(object):
+    """Stand-in for arcpy.Describe on a registered table."""
+
+    def __init__(self, path):
+        table = get_table(path)
+        self.catalogPath = table.path
+        self.extent = table.extent
+        self.fields = [Field(name, 'OID' if i == 0 else 'String')
+                       for i, name in enumerate(table.field_names)]
+        self.fields[-1].type = 'Geometry'
+        self.OIDFieldName = table.oid_field
+        self.shapeFieldName = table.shape_field
+        self.shapeType = table.shape_type
+
+
+class SearchCursor(object):
+    """Stand-in for arcpy.da.SearchCursor."""
+
+    def __init__(self, path, field_names, where_clause=None, *args, **kwargs):
+        self.table = get_table(path)
+        self.positions = self.table.positions(field_names)
+        self.oids = self.table.select(where_clause)
+
+    def __iter__(self):
+        rows = self.table.rows
+        positions = self.positions
+        for oid in self.oids:
+            row = rows[oid]
+            yield tuple([row[i] for i in positions])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class UpdateCursor(SearchCursor):
+    """Stand-in for arcpy.da.UpdateCursor."""
+
+    def __iter__(self):
+        rows = self.table.rows
+        positions = self.positions
+        for oid in self.oids:
+            if oid not in rows:
+                continue
+            self.current = oid
+            yield [rows[oid][i] for i in positions]
+
+    def updateRow(self, values):
+        row = self.table.rows[self.current]
+        for i, value in zip(self.positions, values):
+            if i != 0:
+                row[i] = value
+        edit_log.append(('update', self.table.path, self.current))
+
+    def deleteRow(self):
+        del self.table.rows[self.current]
+        edit_log.append(('delete', self.table.path, self.current))
+
+
+class InsertCursor(object):
+    """Stand-in for arcpy.da.InsertCursor."""
+
+    def __init__(self, path, field_names):
+        self.table = get_table(path)
+        self.positions = self.table.positions(field_names)
+
+    def insertRow(self, values):
+        row = [None] * len(self.table.field_names)
+        for i, value in zip(self.positions, values):
+            row[i] = value
+        oid = self.table.add_row(row[1:-1], row[-1])
+        edit_log.append(('insert', self.table.path, oid))
+        return oid
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class Editor(object):
+    """Stand-in for arcpy.da.Editor; edits are applied immediately."""
+
+    def __init__(self, workspace):
+        self.workspace = workspace
+
+    def startEditing(self, with_undo=True, multiuser_mode=True):
+        pass
+
+    def stopEditing(self, save_changes=True):
+        pass
+
+    def startOperation(self):
+        pass
+
+    def stopOperation(self):
+        pass
+
+
+# --- global functions ---
+
+def _normalize(path):
+    """Return path key used for the table registry."""
+
+    result = path.replace('/', '\\').rstrip('\\').lower()
+    return result
+
+
+def create_table(path, field_names, shape_type='polyline', oid_field='OBJECTID', shape_field='Shape'):
+    """Register and return an empty in-memory feature class at path."""
+
+    table = Table(path, field_names, shape_type, oid_field, shape_field)
+    tables[_normalize(path)] = table
+    return table
+
+
+def get_table(path):
+    """Return registered table for path; raise ExecuteError if missing."""
+
+    try:
+        return tables[_normalize(path)]
+    except KeyError:
+        raise ExecuteError("Dataset %s does not exist or is not supported" % path)
+
+
+def reset():
+    """Remove all tables, messages and logged edits."""
+
+    tables.clear()
+    del messages[:]
+    del edit_log[:]
+
+
+def Exists(path):
+    return _normalize(path) in tables
+
+
+def ListFeatureClasses(wild_card=None, feature_type=None, feature_dataset=None):
+    prefix = _normalize(os.path.join(env.workspace or '', feature_dataset or '')) + '\\'
+    result = [t.path.replace('/', '\\').split('\\')[-1] for key, t in sorted(tables.items())
+              if key.startswith(prefix) and '\\' not in key[len(prefix):]]
+    return result
+
+
+def Walk(top, datatype=None):
+    """Stand-in for arcpy.da.Walk: yield (dir path, dir names, table names) below top."""
+
+    prefix = _normalize(top) + '\\'
+    dirs = {}
+    for key, table in sorted(tables.items()):
+        if key.startswith(prefix):
+            parts = table.path.replace('/', '\\').rstrip('\\').split('\\')
+            rel_dir = parts[len(prefix.rstrip('\\').split('\\')):-1]
+            dirs.setdefault(tuple(rel_dir), []).append(parts[-1])
+    for rel_dir in sorted(dirs):
+        dir_names = sorted(set(d[len(rel_dir)] for d in dirs if len(d) > len(rel_dir) and d[:len(rel_dir)] == rel_dir))
+        yield ('\\'.join([top.rstrip('\\/')] + list(rel_dir)), dir_names, dirs[rel_dir])
+
+
+class Result(object):
+    """Stand-in for a geoprocessing Result."""
+
+    def __init__(self, *outputs):
+        self.outputs = outputs
+
+    def getOutput(self, index):
+        return self.outputs[index]
+
+
+def GetCount_management(path):
+    return Result(str(len(get_table(path).rows)))
+
+
+def AddMessage(msg):
+    messages.append(msg)
+
+
+def GetParameterAsText(index):
+    return ''
+
+
+da = types.ModuleType('arcpy.da')
+da.SearchCursor = SearchCursor
+da.UpdateCursor = UpdateCursor
+da.InsertCursor = InsertCursor
+da.Editor = Editor
+da.Walk = Walk
+
+
+def install():
+    """Register this module as arcpy (and arcpy.da) in sys.modules and return it."""
+
+    module = sys.modules[__name__]
+    sys.modules['arcpy'] = module
+    sys.modules['arcpy.da'] = da
+    return module
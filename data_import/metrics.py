@@ -0,0 +1,109 @@
+# dev notes:
+# Spans are always timed; records are only written once configure() has been called
+# One JSON object per line: run_id, name, context tags, span tags, wall/cpu seconds and counters
+
+# --- import modules ---
+
+import os
+import json
+import time
+
+# --- module state ---
+
+_cpu_time = getattr(time, 'process_time', None) or time.clock
+
+_state = {
+    'file': None,
+    'run_id': None,
+    'context': {}
+    }
+
+# --- global functions ---
+
+def configure(metrics_path, run_id=None):
+    """Write span records to metrics_path (JSON lines) for the rest of the run."""
+
+    close()
+    _state['file'] = open(metrics_path, 'a')
+    _state['run_id'] = run_id or os.path.splitext(os.path.basename(metrics_path))[0]
+    _state['context'] = {}
+    return metrics_path
+
+
+def close():
+    """Stop writing span records."""
+
+    if _state['file'] is not None:
+        _state['file'].close()
+    _state['file'] = None
+
+
+def set_context(**tags):
+    """Set tags (city, dataset, class_name, operation...) added to every following record.
+
+    Tags with value None are removed.
+    """
+
+    for k, v in tags.items():
+        if v is None:
+            _state['context'].pop(k, None)
+        else:
+            _state['context'][k] = v
+
+
+def span(name, **tags):
+    """Return Span context manager for a named pipeline stage."""
+
+    return Span(name, tags)
+
+
+def _write(record):
+    """Write record as one JSON line if a metrics file is configured."""
+
+    metrics_file = _state['file']
+    if metrics_file is not None:
+        metrics_file.write(json.dumps(record, sort_keys=True, default=str) + '\n')
+        metrics_file.flush()
+
+
+# --- global classes ---
+
+
+class Span(object):
+    """Time a block of work (wall and CPU seconds) and collect named counters."""
+
+    def __init__(self, name, tags=None):
+        """Set span name and tags."""
+
+        self.name = name
+        self.tags = tags or {}
+        self.counters = {}
+        self.wall = None
+        self.cpu = None
+        self._wall_start = None
+        self._cpu_start = None
+
+    def count(self, key, value=1):
+        """Add value to counter key."""
+
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def __enter__(self):
+        self._wall_start = time.time()
+        self._cpu_start = _cpu_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wall = time.time() - self._wall_start
+        self.cpu = _cpu_time() - self._cpu_start
+        record = dict(_state['context'])
+        record.update(self.tags)
+        record.update({'run_id': _state['run_id'],
+                       'name': self.name,
+                       'start': self._wall_start,
+                       'wall': round(self.wall, 6),
+                       'cpu': round(self.cpu, 6),
+                       'counters': self.counters,
+                       'error': exc_type.__name__ if exc_type else None})
+        _write(record)
+        return False
@@ -0,0 +1,142 @@
+# dev notes:
+# Profiling is opt-in per class (gen_config['profile_classes'] or import_tool --profile)
+# tracemalloc is not available in the ArcGIS Desktop (2.7) interpreter; CPU profiles are still written there
+
+# --- import modules ---
+
+import os
+import dis
+import logging
+import cProfile
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# --- module state ---
+
+_state = {
+    'classes': set(),
+    'out_dir': None,
+    'prefix': None,
+    'top': 25
+    }
+
+# --- global functions ---
+
+def configure(class_names, out_dir, prefix, top=25):
+    """Profile read, match and write phases of class_names ('*' for all) and write stats to out_dir."""
+
+    _state['classes'] = set(class_names or [])
+    _state['out_dir'] = out_dir
+    _state['prefix'] = prefix
+    _state['top'] = top
+
+
+def enabled(class_name):
+    """Return True if class_name is selected for profiling."""
+
+    classes = _state['classes']
+    result = bool(classes) and (class_name in classes or '*' in classes)
+    return result
+
+
+def phase(class_name, phase_name, sites=None):
+    """Return context manager profiling one phase of class_name, or a no-op if not selected.
+
+    sites is an optional dict of {label: [function, ...]} whose allocations are summarized.
+    """
+
+    if not enabled(class_name):
+        return _null_phase
+    return Phase(class_name, phase_name, sites)
+
+
+def _code_range(func):
+    """Return (filename, first line, last line) of a function or method."""
+
+    code = getattr(func, '__func__', func).__code__
+    line_numbers = [line for offset, line in dis.findlinestarts(code) if line is not None]
+    result = code.co_filename, code.co_firstlineno, max(line_numbers + [code.co_firstlineno])
+    return result
+
+
+# --- global classes ---
+
+
+class _NullPhase(object):
+    """Do-nothing context manager used when profiling is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_null_phase = _NullPhase()
+
+
+class Phase(object):
+    """Profile CPU (cProfile) and memory (tracemalloc) for a block of work."""
+
+    def __init__(self, class_name, phase_name, sites=None):
+        """Set class and phase names and allocation sites to summarize."""
+
+        self.class_name = class_name
+        self.phase_name = phase_name
+        self.sites = sites or {}
+        self.profile = cProfile.Profile()
+        self.started_tracing = False
+        self.base_path = os.path.join(_state['out_dir'], "%s_%s_%s" % (_state['prefix'], class_name, phase_name))
+
+    def __enter__(self):
+        if tracemalloc is not None and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self.started_tracing = True
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profile.disable()
+        self.profile.dump_stats(self.base_path + '.prof')
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            self._write_memory_summary(snapshot)
+            if self.started_tracing:
+                tracemalloc.stop()
+        else:
+            logging.info("tracemalloc not available; memory profile skipped for %s" % self.base_path)
+        logging.info("PROFILE WRITTEN: %s" % self.base_path)
+        return False
+
+    def _write_memory_summary(self, snapshot):
+        """Write top allocation sites and totals for each labelled site to <base>_mem.txt."""
+
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                           tracemalloc.Filter(False, cProfile.__file__)])
+        lines = ["TOP ALLOCATION SITES: %s %s" % (self.class_name, self.phase_name)]
+        for stat in snapshot.statistics('lineno')[:_state['top']]:
+            lines.append("  %s" % stat)
+
+        site_ranges = dict((label, [_code_range(func) for func in funcs])
+                           for label, funcs in self.sites.items())
+        site_totals = dict((label, [0, 0]) for label in site_ranges)
+        for stat in snapshot.statistics('traceback'):
+            for label, ranges in site_ranges.items():
+                if any(frame.filename == filename and first <= frame.lineno <= last
+                       for frame in stat.traceback
+                       for filename, first, last in ranges):
+                    site_totals[label][0] += stat.size
+                    site_totals[label][1] += stat.count
+        if site_totals:
+            lines.append("")
+            lines.append("LIVE ALLOCATIONS BY SITE:")
+            for label in sorted(site_totals):
+                size, count = site_totals[label]
+                lines.append("  %s: %.1f MiB in %d blocks" % (label, size / 1048576.0, count))
+
+        f = open(self.base_path + '_mem.txt', 'w')
+        f.write('\n'.join(lines) + '\n')
+        f.close()
@@ -0,0 +1,576 @@
+# dev notes:
+# Record mode wraps the real arcpy: cursor row streams, Describe metadata, ListFeatureClasses,
+# GetCount_management and Exists results and write calls (updateRow, insertRow, deleteRow) are captured
+# Fixtures are gzipped JSON lines: one line per cursor stream and per write call as they happen, and a
+# header line (metadata, Describe, listings, counts) at the end; replay reads one cursor stream at a time
+# Replay mode installs an arcpy stand-in that serves the recorded streams back in call order
+# Geometries keep the centroid, end points and length computed by arcpy; replay serves them verbatim
+# usage: python replay.py run FIXTURE [--writes OUT]   |   python replay.py compare A B
+
+# --- import modules ---
+
+import os
+import sys
+import gzip
+import json
+import time
+import types
+import numbers
+import argparse
+import datetime
+import memory_arcpy
+from tile_index import geometry_coords
+
+# --- global functions ---
+
+def encode_value(value):
+    """Return JSON-safe representation of a cursor value (geometries and dates tagged)."""
+
+    if value is None or isinstance(value, (numbers.Integral, float)):
+        return value
+    if isinstance(value, datetime.datetime):
+        return {'$dt': value.strftime("%Y-%m-%dT%H:%M:%S.%f")}
+    if hasattr(value, 'type') and hasattr(value, 'firstPoint'):
+        return {'$geom': value.type,
+                'coords': geometry_coords(value),
+                'centroid': point_xy(value.centroid),
+                'first': point_xy(value.firstPoint),
+                'last': point_xy(value.lastPoint),
+                'length': getattr(value, 'length', None)}
+    try:
+        return unicode(value)
+    except NameError:
+        return str(value)
+
+
+def decode_value(value):
+    """Return cursor value from encode_value() output; geometries become RecordedGeometry objects."""
+
+    if isinstance(value, dict):
+        if '$dt' in value:
+            return datetime.datetime.strptime(value['$dt'], "%Y-%m-%dT%H:%M:%S.%f")
+        if '$geom' in value:
+            return RecordedGeometry(value['$geom'], value['coords'], value['centroid'],
+                                    value['first'], value['last'], value['length'])
+    return value
+
+
+def point_xy(point):
+    """Return [x, y] of an arcpy Point (None for the missing points of an empty geometry)."""
+
+    if point is None:
+        return None
+    result = [point.X, point.Y]
+    return result
+
+
+def make_point(xy):
+    """Return memory_arcpy Point from point_xy() output."""
+
+    if xy is None:
+        return None
+    result = memory_arcpy.Point(*xy)
+    return result
+
+
+def stream_key(path, field_names, where_clause):
+    """Return key identifying a cursor stream."""
+
+    result = "%s|%s|%s" % (path, ','.join(field_names), where_clause or '')
+    return result
+
+
+def save_fixture(fixture, fixture_path):
+    """Write fixture dict (header items plus 'streams' and 'writes' lists) to a fixture file."""
+
+    writer = FixtureWriter(fixture_path)
+    for stream in fixture.get('streams', []):
+        writer.add('stream', stream)
+    for write in fixture.get('writes', []):
+        writer.add('write', write)
+    writer.close(dict((k, v) for k, v in fixture.items() if k not in ('streams', 'writes')))
+
+
+def iter_records(fixture_path, tag):
+    """Yield values of fixture lines tagged tag ('stream', 'write' or 'header'), reading one line at a time."""
+
+    prefix = ('["%s",' % tag).encode('utf-8')
+    f = gzip.open(fixture_path, 'rb')
+    try:
+        for line in f:
+            if line.startswith(prefix):
+                yield json.loads(line.decode('utf-8'))[1]
+    finally:
+        f.close()
+
+
+def load_fixture(fixture_path):
+    """Return fixture header dict with its 'writes' list; cursor streams are not loaded (see Player)."""
+
+    result = {}
+    for header in iter_records(fixture_path, 'header'):
+        result = header
+    result['writes'] = list(iter_records(fixture_path, 'write'))
+    return result
+
+
+def normalize_writes(writes):
+    """Return sorted write calls with insert OIDs dropped, for order-insensitive comparison."""
+
+    result = []
+    for write in writes:
+        op, path, oid, values = write
+        if op == 'insert':
+            oid = None
+        result.append(json.dumps([op, path.lower(), oid, values], sort_keys=True))
+    result.sort()
+    return result
+
+
+def compare_writes(writes_a, writes_b):
+    """Return (only_in_a, only_in_b) lists of normalized write calls."""
+
+    norm_a = normalize_writes(writes_a)
+    norm_b = normalize_writes(writes_b)
+    count_b = {}
+    for w in norm_b:
+        count_b[w] = count_b.get(w, 0) + 1
+    only_a = []
+    for w in norm_a:
+        if count_b.get(w, 0) > 0:
+            count_b[w] -= 1
+        else:
+            only_a.append(w)
+    only_b = []
+    for w, n in count_b.items():
+        only_b += [w] * n
+    return only_a, sorted(only_b)
+
+
+# --- geometry classes ---
+
+
+class RecordedGeometry(memory_arcpy.Geometry):
+    """memory_arcpy geometry whose centroid, end points and length are the values recorded from arcpy.
+
+    Matching uses these values, so replay does not depend on memory_arcpy reproducing arcpy's
+    centroid (e.g. of multipart or curved lines).
+    """
+
+    __slots__ = ('length',)
+
+    def __init__(self, geom_type, coords, centroid, first, last, length):
+        self.type = geom_type
+        self.coords = [tuple(c) for c in coords]
+        self.centroid = make_point(centroid)
+        self.firstPoint = make_point(first)
+        self.lastPoint = make_point(last)
+        self.length = length
+
+
+# --- recording classes ---
+
+
+class FixtureWriter(object):
+    """Write fixture lines to a gzipped JSON lines file as they are recorded."""
+
+    def __init__(self, fixture_path):
+        """Open fixture_path for writing."""
+
+        self.file = gzip.open(fixture_path, 'wb')
+
+    def add(self, tag, value):
+        """Write one [tag, value] line."""
+
+        self.file.write(json.dumps([tag, value], separators=(',', ':')).encode('utf-8'))
+        self.file.write(b'\n')
+
+    def close(self, header):
+        """Write the header line and close the file."""
+
+        self.add('header', header)
+        self.file.close()
+
+
+class Recorder(object):
+    """Capture arcpy calls made by Reader and Writer into a fixture file."""
+
+    def __init__(self, arcpy_module, fixture_path):
+        """Wrap arcpy_module (the real arcpy) and open fixture_path for writing."""
+
+        self.arcpy = arcpy_module
+        self.writer = FixtureWriter(fixture_path)
+        self.fixture = {'meta': {}, 'describe': {}, 'lists': [], 'counts': {}, 'exists': {}}
+
+    def describe(self, path):
+        """Record Describe metadata for path."""
+
+        desc = self.arcpy.Describe(path)
+        ext = desc.extent
+        self.fixture['describe'][path] = {
+            'extent': [ext.XMin, ext.YMin, ext.XMax, ext.YMax],
+            'fields': [[fld.name, fld.type] for fld in desc.fields],
+            'OIDFieldName': desc.OIDFieldName,
+            'shapeFieldName': desc.shapeFieldName,
+            'shapeType': desc.shapeType}
+        return desc
+
+    def list_feature_classes(self, *args, **kwargs):
+        """Record ListFeatureClasses result for the current workspace."""
+
+        result = self.arcpy.ListFeatureClasses(*args, **kwargs)
+        self.fixture['lists'].append([self.arcpy.env.workspace, result])
+        return result
+
+    def get_count(self, path):
+        """Record GetCount_management result for path."""
+
+        result = self.arcpy.GetCount_management(path)
+        self.fixture['counts'].setdefault(path, []).append(int(result.getOutput(0)))
+        return result
+
+    def exists(self, path, *args, **kwargs):
+        """Record Exists result for path."""
+
+        result = self.arcpy.Exists(path, *args, **kwargs)
+        self.fixture['exists'].setdefault(path, []).append(bool(result))
+        return result
+
+    def new_stream(self, kind, path, field_names, where_clause):
+        """Return new empty stream record; it is written to the fixture by end_stream()."""
+
+        stream = {'kind': kind,
+                  'key': stream_key(path, field_names, where_clause),
+                  'rows': []}
+        return stream
+
+    def end_stream(self, stream):
+        """Write a finished stream record to the fixture."""
+
+        self.writer.add('stream', stream)
+
+    def write(self, op, path, oid, values):
+        """Record a write call."""
+
+        self.writer.add('write', [op, path, oid, [encode_value(v) for v in values]])
+
+    def save(self, **meta):
+        """Write the fixture header with run metadata (city, src_dbpath, tgt_dbpath...) and close the fixture."""
+
+        self.fixture['meta'].update(meta)
+        self.writer.close(self.fixture)
+
+
+class _RecordingCursor(object):
+    """Wrap a real da cursor, recording rows read and write calls."""
+
+    def __init__(self, recorder, kind, cursor, path, field_names, where_clause=None):
+        self.recorder = recorder
+        self.cursor = cursor
+        self.path = path
+        self.field_names = list(field_names)
+        self.stream = recorder.new_stream(kind, path, self.field_names, where_clause)
+        self.current = None
+
+    def __iter__(self):
+        for row in self.cursor:
+            self.current = row
+            self.stream['rows'].append([encode_value(v) for v in row])
+            yield row
+        self.end_stream()
+
+    def end_stream(self):
+        """Write the stream to the fixture (once, when iteration ends or the cursor is closed)."""
+
+        if self.stream is not None:
+            self.recorder.end_stream(self.stream)
+            self.stream = None
+
+    def updateRow(self, values):
+        self.cursor.updateRow(values)
+        self.recorder.write('update', self.path, self.current[0], list(values)[1:])
+
+    def deleteRow(self):
+        self.cursor.deleteRow()
+        self.recorder.write('delete', self.path, self.current[0], [])
+
+    def insertRow(self, values):
+        result = self.cursor.insertRow(values)
+        self.recorder.write('insert', self.path, None, list(values))
+        return result
+
+    def __enter__(self):
+        self.cursor.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end_stream()
+        return self.cursor.__exit__(exc_type, exc_value, traceback)
+
+
+def make_recording_module(recorder):
+    """Return arcpy stand-in module that delegates to the real arcpy through recorder."""
+
+    real = recorder.arcpy
+    module = types.ModuleType('arcpy')
+    module.__dict__.update(dict((k, v) for k, v in real.__dict__.items() if not k.startswith('__')))
+    module.Describe = recorder.describe
+    module.ListFeatureClasses = recorder.list_feature_classes
+    module.GetCount_management = recorder.get_count
+    module.Exists = recorder.exists
+    da = types.ModuleType('arcpy.da')
+    da.__dict__.update(dict((k, v) for k, v in real.da.__dict__.items() if not k.startswith('__')))
+
+    def search_cursor(path, field_names, where_clause=None, *args, **kwargs):
+        cursor = real.da.SearchCursor(path, field_names, where_clause, *args, **kwargs)
+        return _RecordingCursor(recorder, 'search', cursor, path, field_names, where_clause)
+
+    def update_cursor(path, field_names, where_clause=None, *args, **kwargs):
+        cursor = real.da.UpdateCursor(path, field_names, where_clause, *args, **kwargs)
+        return _RecordingCursor(recorder, 'update', cursor, path, field_names, where_clause)
+
+    def insert_cursor(path, field_names, *args, **kwargs):
+        cursor = real.da.InsertCursor(path, field_names, *args, **kwargs)
+        return _RecordingCursor(recorder, 'insert', cursor, path, field_names)
+
+    da.SearchCursor = search_cursor
+    da.UpdateCursor = update_cursor
+    da.InsertCursor = insert_cursor
+    module.da = da
+    return module
+
+
+def start_recording(fixture_path):
+    """Install recording arcpy in sys.modules and return the Recorder writing to fixture_path."""
+
+    import arcpy
+    recorder = Recorder(arcpy, fixture_path)
+    module = make_recording_module(recorder)
+    sys.modules['arcpy'] = module
+    sys.modules['arcpy.da'] = module.da
+    return recorder
+
+
+def stop_recording(recorder, **meta):
+    """Restore the real arcpy and finish the recorded fixture."""
+
+    sys.modules['arcpy'] = recorder.arcpy
+    sys.modules['arcpy.da'] = recorder.arcpy.da
+    recorder.save(**meta)
+
+
+# --- replay classes ---
+
+
+class Player(object):
+    """Serve recorded streams, Describe metadata and listings back in recorded order.
+
+    Streams are read from the fixture file as cursors ask for them; streams recorded before
+    the requested one are held until their cursor is opened.
+    """
+
+    def __init__(self, fixture_path):
+        """Load fixture header and open the fixture streams for reading."""
+
+        fixture = load_fixture(fixture_path)
+        self.fixture = fixture
+        self.streams = {}
+        self.stream_records = iter_records(fixture_path, 'stream')
+        self.lists = list(fixture['lists'])
+        self.counts = dict((path, list(counts)) for path, counts in fixture.get('counts', {}).items())
+        self.exists_results = dict((path, list(results)) for path, results in fixture.get('exists', {}).items())
+        self.writes = []
+
+    def next_result(self, results, name, path):
+        """Return next recorded result of call name for path (the last result is repeated)."""
+
+        try:
+            path_results = results[path]
+        except KeyError:
+            raise memory_arcpy.ExecuteError("No recorded %s for %s" % (name, path))
+        if len(path_results) > 1:
+            return path_results.pop(0)
+        return path_results[0]
+
+    def next_rows(self, path, field_names, where_clause):
+        """Return decoded rows of the next recorded stream for this cursor call."""
+
+        key = stream_key(path, field_names, where_clause)
+        if self.streams.get(key):
+            stream = self.streams[key].pop(0)
+        else:
+            for stream in self.stream_records:
+                if stream['key'] == key:
+                    break
+                self.streams.setdefault(stream['key'], []).append(stream)
+            else:
+                raise memory_arcpy.ExecuteError("No recorded stream for %s" % key)
+        result = [[decode_value(v) for v in row] for row in stream['rows']]
+        return result
+
+    def describe(self, path):
+        """Return Describe stand-in built from recorded metadata."""
+
+        info = self.fixture['describe'][path]
+        desc = _Describe()
+        desc.extent = memory_arcpy.Extent(*info['extent'])
+        desc.fields = [memory_arcpy.Field(name, field_type) for name, field_type in info['fields']]
+        desc.OIDFieldName = info['OIDFieldName']
+        desc.shapeFieldName = info['shapeFieldName']
+        desc.shapeType = info['shapeType']
+        return desc
+
+    def list_feature_classes(self, *args, **kwargs):
+        """Return next recorded listing."""
+
+        if not self.lists:
+            return []
+        result = self.lists.pop(0)[1]
+        return result
+
+    def get_count(self, path):
+        """Return GetCount_management stand-in result with the recorded row count."""
+
+        result = memory_arcpy.Result(str(self.next_result(self.counts, 'GetCount_management', path)))
+        return result
+
+    def exists(self, path, *args, **kwargs):
+        """Return recorded Exists result."""
+
+        result = self.next_result(self.exists_results, 'Exists', path)
+        return result
+
+    def write(self, op, path, oid, values):
+        """Record a write call made during replay."""
+
+        self.writes.append([op, path, oid, [encode_value(v) for v in values]])
+
+
+class _Describe(object):
+    """Describe result rebuilt from recorded metadata."""
+
+
+class _ReplayCursor(object):
+    """Serve a recorded stream and capture write calls."""
+
+    def __init__(self, player, path, field_names, where_clause=None, recorded=True):
+        self.player = player
+        self.path = path
+        self.rows = player.next_rows(path, list(field_names), where_clause) if recorded else []
+        self.current = None
+
+    def __iter__(self):
+        for row in self.rows:
+            self.current = row
+            yield tuple(row)
+
+    def updateRow(self, values):
+        self.player.write('update', self.path, self.current[0], list(values)[1:])
+
+    def deleteRow(self):
+        self.player.write('delete', self.path, self.current[0], [])
+
+    def insertRow(self, values):
+        self.player.write('insert', self.path, None, list(values))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+def make_replay_module(player):
+    """Return arcpy stand-in module serving the player's recorded data."""
+
+    module = types.ModuleType('arcpy')
+    for name in ('ExecuteError', 'Extent', 'Point', 'Geometry', 'Field', 'env', 'AddMessage',
+                 'GetParameterAsText'):
+        setattr(module, name, getattr(memory_arcpy, name))
+    module.Describe = player.describe
+    module.ListFeatureClasses = player.list_feature_classes
+    module.GetCount_management = player.get_count
+    module.Exists = player.exists
+    da = types.ModuleType('arcpy.da')
+    da.Editor = memory_arcpy.Editor
+    da.SearchCursor = lambda path, field_names, where_clause=None, *a, **k: \
+        _ReplayCursor(player, path, field_names, where_clause)
+    da.UpdateCursor = lambda path, field_names, where_clause=None, *a, **k: \
+        _ReplayCursor(player, path, field_names, where_clause)
+    da.InsertCursor = lambda path, field_names, *a, **k: \
+        _ReplayCursor(player, path, field_names, recorded=False)
+    module.da = da
+    return module
+
+
+def install_replay(fixture_path):
+    """Install replay arcpy in sys.modules and return the Player of fixture_path."""
+
+    player = Player(fixture_path)
+    module = make_replay_module(player)
+    sys.modules['arcpy'] = module
+    sys.modules['arcpy.da'] = module.da
+    return player
+
+
+def run_replay(fixture_path):
+    """Replay the recorded import and return (player, elapsed seconds)."""
+
+    player = install_replay(fixture_path)
+    fixture = player.fixture
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from benchmark import load_tools
+    load_tools()
+    import import_tool
+    if not os.path.isdir(import_tool.log_dir):
+        os.makedirs(import_tool.log_dir)
+    meta = fixture['meta']
+    start = time.time()
+    import_tool.import_city(meta['city'], meta['src_dbpath'], meta['tgt_dbpath'],
+                            meta.get('class_names'), resume=False,
+                            memory_budget_mb=meta.get('memory_budget_mb'),
+                            skip_classes=meta.get('skip_classes'),
+                            base_dbpath=meta.get('base_dbpath'))
+    result = player, time.time() - start
+    return result
+
+
+def main(argv=None):
+    """Replay a fixture or compare the write calls of two fixtures / replay outputs."""
+
+    parser = argparse.ArgumentParser(description="Replay recorded import runs offline.")
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', help="replay a recorded import")
+    run_parser.add_argument('fixture')
+    run_parser.add_argument('--writes', default=None, help="save replay write calls to this file")
+    compare_parser = subparsers.add_parser('compare', help="compare write calls of two files")
+    compare_parser.add_argument('fixture_a')
+    compare_parser.add_argument('fixture_b')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        player, elapsed = run_replay(args.fixture)
+        only_recorded, only_replayed = compare_writes(player.fixture['writes'], player.writes)
+        print("replayed in %.3f s: %d write calls (%d recorded)"
+              % (elapsed, len(player.writes), len(player.fixture['writes'])))
+        print("write calls differing from recording: %d recorded only, %d replay only"
+              % (len(only_recorded), len(only_replayed)))
+        if args.writes:
+            save_fixture({'meta': player.fixture['meta'], 'writes': player.writes}, args.writes)
+        return len(only_recorded) + len(only_replayed)
+
+    elif args.command == 'compare':
+        only_a, only_b = compare_writes(load_fixture(args.fixture_a)['writes'],
+                                        load_fixture(args.fixture_b)['writes'])
+        for w in only_a:
+            print("- %s" % w)
+        for w in only_b:
+            print("+ %s" % w)
+        print("%d only in %s, %d only in %s" % (len(only_a), args.fixture_a, len(only_b), args.fixture_b))
+        return len(only_a) + len(only_b)
+
+    parser.print_help()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+# dev notes:
+# Connections give every step the same workspace handle: get_path() returns a path that arcpy tools,
+# cursors and pool workers can use as a workspace (an .sde file, or a local geodatabase for testing)
+# Shared by data_access (CityDataImporter staging) and import_tool (Reader and Writer tables)
+
+# --- import modules ---
+
+import os
+import json
+import hashlib
+from lazy import LazyModule
+
+arcpy = LazyModule('arcpy')
+
+# --- global functions ---
+
+
+def is_connection_file(path):
+    """Return True if path is an .sde connection file that connects to a database."""
+
+    if not os.path.isfile(path):
+        return False
+    try:
+        return arcpy.Exists(path) and arcpy.Describe(path).workspaceType == 'RemoteDatabase'
+    except Exception:
+        return False
+
+
+def open_connection(workspace_path):
+    """Return connection for workspace_path: ConnectionFile for an .sde file, otherwise LocalConnection."""
+
+    if os.path.splitext(workspace_path)[1].lower() == '.sde':
+        result = ConnectionFile(workspace_path)
+    else:
+        result = LocalConnection(workspace_path)
+    return result
+
+
+# --- global classes ---
+
+
+class SdeConnection(object):
+    """Enterprise geodatabase connection file that is reused while it is valid.
+
+    The file name is keyed by the connection parameters, so a changed parameter gives a new file
+    instead of reusing a stale one.
+    """
+
+    param_names = ['database_platform', 'instance', 'account_authentication', 'username', 'password',
+                   'save_user_pass', 'database', 'schema', 'version_type', 'version']
+
+    def __init__(self, conn_dir=None, name='GISBUG', **params):
+        """Set connection file directory, name and CreateDatabaseConnection parameters (all of param_names)."""
+
+        self.conn_dir = conn_dir
+        self.name = name
+        self.params = params
+        self.checked_path = None
+        missing = [param for param in self.param_names if param not in params]
+        if missing:
+            raise ValueError("Missing connection parameters: %s" % ', '.join(missing))
+
+    def get_key(self):
+        """Return key of the connection parameters."""
+
+        param_str = json.dumps([[param, self.params[param]] for param in self.param_names])
+        result = hashlib.sha1(param_str.encode('utf-8')).hexdigest()[:12]
+        return result
+
+    def get_file_path(self):
+        """Return connection file path for the current parameters."""
+
+        result = os.path.join(self.conn_dir, "%s_%s.sde" % (self.name, self.get_key()))
+        return result
+
+    def is_valid(self, path=None):
+        """Return True if the connection file exists and connects to a database."""
+
+        result = is_connection_file(path)
+        return result
+
+    def create(self):
+        """Delete other connection files of this connection, create the connection file and return its path."""
+
+        path = self.get_file_path()
+        for file_name in os.listdir(self.conn_dir):
+            if file_name.endswith('.sde') and (file_name.startswith(self.name + '_') or
+                                               file_name.endswith('_%s_TEMP.sde' % self.name)):
+                print("deleting old sde connection file: %s..." % file_name)
+                os.remove(os.path.join(self.conn_dir, file_name))
+
+        print("creating new sde connection file...")
+        temp_overwrite = arcpy.env.overwriteOutput
+        arcpy.env.overwriteOutput = True
+        try:
+            arcpy.CreateDatabaseConnection_management(self.conn_dir,
+                                                      os.path.basename(path),
+                                                      *[self.params[param] for param in self.param_names])
+        finally:
+            arcpy.env.overwriteOutput = temp_overwrite
+        if not self.is_valid(path):
+            raise IOError("Cannot connect with sde connection file %s" % path)
+        return path
+
+    def get_path(self):
+        """Return validated connection file path, creating the file if missing or invalid.
+
+        The file is validated once per instance.
+        """
+
+        if self.checked_path is None:
+            path = self.get_file_path()
+            if self.is_valid(path):
+                print("reusing sde connection file: %s" % os.path.basename(path))
+            else:
+                path = self.create()
+            self.checked_path = path
+        return self.checked_path
+
+    def invalidate(self):
+        """Forget validation (e.g. after a connection error) so the next get_path checks the file again."""
+
+        self.checked_path = None
+
+
+class ConnectionFile(object):
+    """Existing .sde connection file (e.g. one made by SdeConnection), validated once."""
+
+    def __init__(self, file_path=None):
+        """Set connection file path."""
+
+        self.file_path = file_path
+        self.checked_path = None
+
+    def get_path(self):
+        """Return validated connection file path; raise IOError if it does not connect."""
+
+        if self.checked_path is None:
+            if not is_connection_file(self.file_path):
+                raise IOError("Cannot connect with sde connection file %s" % self.file_path)
+            self.checked_path = self.file_path
+        return self.checked_path
+
+    def invalidate(self):
+        """Forget validation so the next get_path checks the file again."""
+
+        self.checked_path = None
+
+
+class LocalConnection(object):
+    """Local workspace (file geodatabase, geopackage or sqlite database) used in place of the server.
+
+    Used e.g. to run the steps against a copy of the server datasets.
+    """
+
+    def __init__(self, workspace_path=None):
+        """Set workspace path."""
+
+        self.workspace_path = workspace_path
+        self.checked_path = None
+
+    def is_valid(self, path=None):
+        """Return True if the workspace exists."""
+
+        result = os.path.exists(path)
+        return result
+
+    def get_path(self):
+        """Return validated workspace path; raise IOError if it does not exist."""
+
+        if self.checked_path is None:
+            if not self.is_valid(self.workspace_path):
+                raise IOError("Workspace %s does not exist" % self.workspace_path)
+            self.checked_path = self.workspace_path
+        return self.checked_path
+
+    def invalidate(self):
+        """Forget validation so the next get_path checks the workspace again."""
+
+        self.checked_path = None
@@ -0,0 +1,230 @@
+# dev notes:
+# Spill store for memory-budgeted matching: compact match records written to temporary files,
+# grouped by spatial tile and read back one tile at a time through mmap
+# Spilled geometries keep only what matching needs: type, firstPoint, centroid, lastPoint
+
+# --- import modules ---
+
+import os
+import mmap
+import math
+import array
+import struct
+import marshal
+import shutil
+import tempfile
+
+# --- module constants ---
+
+_header = struct.Struct('<IqBdddddd')
+_type_codes = {'point': 0, 'polyline': 1}
+_type_names = dict((v, k) for k, v in _type_codes.items())
+
+try:
+    _offset_code = array.array('q').typecode
+except ValueError:
+    _offset_code = 'd'  # no 64-bit integer arrays before Python 3.3; doubles hold offsets exactly
+
+# --- global functions ---
+
+def projected_match_bytes(src_count, tgt_count, row_bytes, write_rows=0, write_row_bytes=0):
+    """Return projected bytes for Reader.data plus Matcher indexes of src_count + tgt_count rows.
+
+    write_rows source records of write_row_bytes held by the Writer (one batch) are added.
+    """
+
+    result = (src_count + tgt_count) * row_bytes + write_rows * write_row_bytes
+    return result
+
+
+def partition_bins(extent, grid_size, projected_bytes, budget_bytes):
+    """Return tile width (in grid bins) so one tile's share of projected_bytes fits half the budget."""
+
+    bins_x = max(1, int(math.ceil((extent.XMax - extent.XMin) / grid_size)) + 1)
+    bins_y = max(1, int(math.ceil((extent.YMax - extent.YMin) / grid_size)) + 1)
+    tiles_needed = max(1.0, projected_bytes / (budget_bytes * 0.5))
+    tiles_per_axis = int(math.ceil(math.sqrt(tiles_needed)))
+    result = max(1, int(math.ceil(max(bins_x, bins_y) / float(tiles_per_axis))))
+    return result
+
+
+# --- global classes ---
+
+
+class SpillPoint(object):
+    """Point with X and Y, as read back from a spill file."""
+
+    __slots__ = ('X', 'Y')
+
+    def __init__(self, x, y):
+        self.X = x
+        self.Y = y
+
+
+class SpillGeometry(object):
+    """Reduced geometry supporting calc_angle, calc_average_dist and spatial hashing."""
+
+    __slots__ = ('type', 'firstPoint', 'centroid', 'lastPoint')
+
+    def __init__(self, geom_type, first, centroid, last):
+        self.type = geom_type
+        self.firstPoint = first
+        self.centroid = centroid
+        self.lastPoint = last
+
+    def distanceTo(self, other):
+        """Return centroid distance (exact for points, the only type this is used for)."""
+
+        result = math.hypot(self.centroid.X - other.centroid.X, self.centroid.Y - other.centroid.Y)
+        return result
+
+
+class SpillFile(object):
+    """Append-only file of match records (oid, attr value, reduced geometry), read back through mmap."""
+
+    def __init__(self, path):
+        """Open path for writing."""
+
+        self.path = path
+        self.file = open(path, 'wb')
+        self.size = 0
+        self.map = None
+
+    def append(self, oid, value, geom):
+        """Write record and return its offset."""
+
+        first, centroid, last = geom.firstPoint, geom.centroid, geom.lastPoint
+        value_bytes = marshal.dumps(value)
+        header = _header.pack(_header.size + len(value_bytes), oid, _type_codes[geom.type],
+                              first.X, first.Y, centroid.X, centroid.Y, last.X, last.Y)
+        offset = self.size
+        self.file.write(header)
+        self.file.write(value_bytes)
+        self.size += len(header) + len(value_bytes)
+        return offset
+
+    def finish(self):
+        """Close for writing and map file into memory for reading."""
+
+        self.file.close()
+        if self.size > 0:
+            f = open(self.path, 'rb')
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            f.close()
+
+    def record(self, offset):
+        """Return record (oid, value, SpillGeometry) stored at offset."""
+
+        offset = int(offset)
+        fields = _header.unpack_from(self.map, offset)
+        length, oid, type_code, fx, fy, cx, cy, lx, ly = fields
+        value = marshal.loads(self.map[offset + _header.size:offset + length])
+        geom = SpillGeometry(_type_names[type_code], SpillPoint(fx, fy), SpillPoint(cx, cy), SpillPoint(lx, ly))
+        result = (oid, value, geom)
+        return result
+
+    def close(self):
+        """Unmap and close file."""
+
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if not self.file.closed:
+            self.file.close()
+
+
+class SpillIndex(object):
+    """Read-only {oid: [record]} mapping backed by a SpillFile, as Matcher oid indexes."""
+
+    def __init__(self, spill_file):
+        """Set spill file; offsets are added with add()."""
+
+        self.spill_file = spill_file
+        self.offsets = {}
+
+    def add(self, oid, offset):
+        self.offsets[oid] = offset
+
+    def __getitem__(self, oid):
+        return [self.spill_file.record(self.offsets[oid])]
+
+    def __contains__(self, oid):
+        return oid in self.offsets
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def keys(self):
+        return list(self.offsets.keys())
+
+
+class SpillStore(object):
+    """Source and target match records partitioned by square tiles of tile_bins grid bins.
+
+    Target records near a tile edge are listed in each adjacent tile so a tile holds
+    every target record within one grid bin of its source records.
+    """
+
+    def __init__(self, tile_bins, temp_dir=None):
+        """Create temporary directory and spill files."""
+
+        self.tile_bins = tile_bins
+        self.temp_dir = tempfile.mkdtemp(prefix='match_spill_', dir=temp_dir)
+        self.files = {'src': SpillFile(os.path.join(self.temp_dir, 'src.bin')),
+                      'tgt': SpillFile(os.path.join(self.temp_dir, 'tgt.bin'))}
+        self.indexes = {'src': SpillIndex(self.files['src']),
+                        'tgt': SpillIndex(self.files['tgt'])}
+        self.tiles = {'src': {}, 'tgt': {}}
+
+    def _tile_offsets(self, side, tile):
+        """Return offset array for side and tile (created on first use)."""
+
+        tiles = self.tiles[side]
+        if tile not in tiles:
+            tiles[tile] = array.array(_offset_code)
+        return tiles[tile]
+
+    def add(self, side, oid, value, geom, hashid):
+        """Spill record with spatial hash (x_bin, y_bin) to side ('src' or 'tgt')."""
+
+        offset = self.files[side].append(oid, value, geom)
+        self.indexes[side].add(oid, offset)
+        x_bin, y_bin = hashid
+        size = self.tile_bins
+        if side == 'src':
+            self._tile_offsets(side, (x_bin // size, y_bin // size)).append(offset)
+        else:
+            x_tiles = set([(x_bin - 1) // size, x_bin // size, (x_bin + 1) // size])
+            y_tiles = set([(y_bin - 1) // size, y_bin // size, (y_bin + 1) // size])
+            for x_tile in x_tiles:
+                for y_tile in y_tiles:
+                    self._tile_offsets(side, (x_tile, y_tile)).append(offset)
+
+    def finish(self):
+        """Finish writing and map spill files for reading."""
+
+        for spill_file in self.files.values():
+            spill_file.finish()
+
+    def partitions(self):
+        """Return sorted tiles holding source records."""
+
+        result = sorted(self.tiles['src'].keys())
+        return result
+
+    def load(self, side, tile):
+        """Return list of (oid, value, SpillGeometry) records of side in tile."""
+
+        spill_file = self.files[side]
+        result = [spill_file.record(offset) for offset in self.tiles[side].get(tile, [])]
+        return result
+
+    def close(self):
+        """Close spill files and remove temporary directory."""
+
+        for spill_file in self.files.values():
+            spill_file.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
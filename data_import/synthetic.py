@@ -0,0 +1,115 @@
+# dev notes:
+# Synthetic GravityMains (polyline) and SaniManholes (point) style layers for benchmarking
+# Target layer is the "server" copy; source layer is the city copy with jitter and churn applied
+
+# --- import modules ---
+
+import math
+import random
+
+# --- general configuration ---
+
+"""
+DEFINITIONS
+
+density............features per square mile (controls extent size and neighbour counts)
+jitter.............maximum coordinate shift (feet) applied to source copies of target features
+churn..............fraction of features deleted, added and attribute-edited in the source layer
+main_length........(min, max) gravity main length in feet
+"""
+
+line_fields = ['CITYID', 'DIAMETER', 'MATERIAL', 'SLOPE', 'JURISDICTION', 'FO_MAINT']
+point_fields = ['CITYID', 'RIM_ELEV', 'DEPTH', 'MATERIAL', 'Jurisdiction', 'FoMaint']
+
+materials = ['PVC', 'CONC', 'VCP', 'DI', 'HDPE']
+
+# --- global functions ---
+
+def extent_side(count, density):
+    """Return side length (feet) of a square extent holding count features at density per sq mile."""
+
+    sq_miles = count / float(density)
+    result = math.sqrt(sq_miles) * 5280.0
+    return result
+
+
+def make_line(rnd, side, main_length):
+    """Return vertex list for a random two-vertex gravity main inside a square of side feet."""
+
+    x1 = rnd.uniform(0, side)
+    y1 = rnd.uniform(0, side)
+    length = rnd.uniform(*main_length)
+    angle = rnd.uniform(0, 2 * math.pi)
+    result = [(x1, y1), (x1 + length * math.cos(angle), y1 + length * math.sin(angle))]
+    return result
+
+
+def make_point(rnd, side):
+    """Return single-vertex list for a random manhole inside a square of side feet."""
+
+    result = [(rnd.uniform(0, side), rnd.uniform(0, side))]
+    return result
+
+
+def make_attrs(rnd, kind, cityid):
+    """Return attribute values (ordered as line_fields or point_fields) for one feature."""
+
+    if kind == 'line':
+        result = [cityid, rnd.choice([8, 10, 12, 15, 18, 24]), rnd.choice(materials),
+                  round(rnd.uniform(0.001, 0.05), 4), 'BEAVERTON', 'BEAVERTON']
+    else:
+        result = [cityid, round(rnd.uniform(150, 400), 2), round(rnd.uniform(4, 20), 1),
+                  rnd.choice(materials), 'BEAVERTON', 'BEAVERTON']
+    return result
+
+
+def jitter_coords(rnd, coords, jitter):
+    """Return coords shifted by up to jitter feet in x and y."""
+
+    result = [(x + rnd.uniform(-jitter, jitter), y + rnd.uniform(-jitter, jitter)) for x, y in coords]
+    return result
+
+
+def make_layers(count, kind='line', density=2000.0, jitter=2.0, churn=0.05,
+                main_length=(80.0, 400.0), seed=0):
+    """Return (fields, tgt_features, src_features) lists of (attrs, coords) for a synthetic network.
+
+    The target layer has count features. The source layer is the target with jitter applied,
+    churn/3 of features removed, churn/3 new features added and churn/3 attribute-edited.
+    """
+
+    rnd = random.Random(seed)
+    side = extent_side(count, density)
+    fields = line_fields if kind == 'line' else point_fields
+
+    tgt_features = []
+    for i in range(count):
+        coords = make_line(rnd, side, main_length) if kind == 'line' else make_point(rnd, side)
+        tgt_features.append((make_attrs(rnd, kind, 'C%07d' % i), coords))
+
+    part = churn / 3.0
+    src_features = []
+    for attrs, coords in tgt_features:
+        roll = rnd.random()
+        if roll < part:
+            continue
+        attrs = list(attrs)
+        if roll < 2 * part:
+            attrs[1] = make_attrs(rnd, kind, attrs[0])[1]
+        src_features.append((attrs, jitter_coords(rnd, coords, jitter)))
+    for i in range(int(count * part)):
+        coords = make_line(rnd, side, main_length) if kind == 'line' else make_point(rnd, side)
+        src_features.append((make_attrs(rnd, kind, 'N%07d' % i), coords))
+
+    result = fields, tgt_features, src_features
+    return result
+
+
+def load_table(arcpy_module, path, fields, features, kind):
+    """Create an in-memory table at path and insert features; return the table."""
+
+    shape_type = 'polyline' if kind == 'line' else 'point'
+    table = arcpy_module.create_table(path, fields, shape_type)
+    for attrs, coords in features:
+        table.add_row(attrs, arcpy_module.Geometry(shape_type, coords))
+    return table
@@ -0,0 +1,219 @@
+# dev notes:
+# Merkle quadtree of feature content: leaf tiles hash the rows whose centroid falls in them, each parent
+# tile hashes its (up to four) child tiles, up to the depth where the data extent spans at most two tiles
+# per axis; trees of two versions are built to the depth of their combined extent so they share their roots
+# Tiles are aligned to the coordinate origin, so trees built from different extents compare tile for tile
+# Row hashes use attribute values (OID and shape fields excluded) and vertices quantized to xy_resolution;
+# the same row and content hashes are used by data_access gdb_compare.class_checksum
+
+# --- import modules ---
+
+import json
+import math
+import hashlib
+from lazy import LazyModule
+
+arcpy = LazyModule('arcpy')
+
+# --- module constants ---
+
+skip_field_types = ('OID', 'Geometry', 'Blob', 'Raster')
+
+# --- global functions ---
+
+def geometry_coords(geom):
+    """Return list of (x, y) for every vertex of geom (parts in order, ring separators skipped)."""
+
+    if geom is None:
+        return []
+    if geom.type == 'point':
+        if geom.firstPoint is None:
+            return []
+        return [(geom.firstPoint.X, geom.firstPoint.Y)]
+    result = [(point.X, point.Y) for part in geom for point in part if point is not None]
+    return result
+
+
+def hash_field_names(desc):
+    """Return names of the fields of Describe result desc that row hashes use, sorted case-insensitively.
+
+    OID, shape, blob and raster fields and the derived length and area fields are left out.
+    """
+
+    derived_fields = [getattr(desc, 'lengthFieldName', None), getattr(desc, 'areaFieldName', None)]
+    result = sorted([fld.name for fld in desc.fields
+                     if fld.type not in skip_field_types and fld.name not in derived_fields],
+                    key=lambda name: name.lower())
+    return result
+
+
+def row_hash(values, geom, xy_resolution):
+    """Return digest of attribute values and geometry vertices quantized to xy_resolution."""
+
+    coords = [[int(round(x / xy_resolution)), int(round(y / xy_resolution))] for x, y in geometry_coords(geom)]
+    row_str = json.dumps([list(values), coords], default=str)
+    result = hashlib.sha1(row_str.encode('utf-8')).digest()
+    return result
+
+
+def combine_hashes(digests):
+    """Return hex digest of row digests, independent of their order."""
+
+    result = hashlib.sha1(b''.join(sorted(digests))).hexdigest()
+    return result
+
+
+def tree_depth(extents, tile_size):
+    """Return number of parent levels above leaf tiles of tile_size at which extents span at most four root tiles.
+
+    Higher levels would not reduce the roots of extents across the coordinate origin (keys -1 and 0).
+    Empty extents (None or NaN bounds) are ignored; returns 0 if there are none.
+    """
+
+    keys = []
+    for ext in extents:
+        bounds = [getattr(ext, name, None) for name in ('XMin', 'YMin', 'XMax', 'YMax')]
+        if None in bounds or any(math.isnan(value) for value in bounds):
+            continue
+        keys += [int(math.floor(bounds[0] / tile_size)), int(math.floor(bounds[1] / tile_size)),
+                 int(math.floor(bounds[2] / tile_size)), int(math.floor(bounds[3] / tile_size))]
+    if not keys:
+        return 0
+    x_keys = keys[0::2]
+    y_keys = keys[1::2]
+    x_min, x_max, y_min, y_max = min(x_keys), max(x_keys), min(y_keys), max(y_keys)
+    result = 0
+    while (x_max >> result) - (x_min >> result) > 1 or (y_max >> result) - (y_min >> result) > 1:
+        result += 1
+    return result
+
+
+def build_tree(class_path, tile_size, xy_resolution=0.001, where_clause=None, depth=None):
+    """Return finished TileTree of the rows of class_path (optionally limited by where_clause).
+
+    depth defaults to the tree_depth of the class extent; trees that are compared need the same depth.
+    """
+
+    desc = arcpy.Describe(class_path)
+    field_names = hash_field_names(desc)
+    if depth is None:
+        depth = tree_depth([desc.extent], tile_size)
+    result = TileTree(tile_size, depth)
+    with arcpy.da.SearchCursor(class_path, field_names + ['SHAPE@'], where_clause) as scur:
+        for row in scur:
+            geom = row[-1]
+            if geom is None:
+                continue
+            result.add(geom.centroid, row_hash(row[:-1], geom, xy_resolution))
+    result.finish()
+    return result
+
+
+def changed_tiles(base_tree, test_tree):
+    """Return sorted leaf tile keys whose content differs between two trees of the same tile size.
+
+    Descends only into tiles whose hashes differ, so the work is proportional to the number of
+    changed tiles times the tree depth rather than to the number of tiles.
+    """
+
+    if base_tree.tile_size != test_tree.tile_size:
+        raise ValueError("Tile trees have different tile sizes: %s, %s" % (base_tree.tile_size, test_tree.tile_size))
+    if base_tree.depth != test_tree.depth:
+        raise ValueError("Tile trees have different depths: %s, %s" % (base_tree.depth, test_tree.depth))
+    result = []
+    top = base_tree.depth
+    stack = [(top, key) for key in set(base_tree.levels[top]) | set(test_tree.levels[top])]
+    while stack:
+        level, key = stack.pop()
+        if base_tree.levels[level].get(key) == test_tree.levels[level].get(key):
+            continue
+        if level == 0:
+            result.append(key)
+            continue
+        x_tile, y_tile = key
+        for child in [(x_tile * 2, y_tile * 2), (x_tile * 2 + 1, y_tile * 2),
+                      (x_tile * 2, y_tile * 2 + 1), (x_tile * 2 + 1, y_tile * 2 + 1)]:
+            if child in base_tree.levels[level - 1] or child in test_tree.levels[level - 1]:
+                stack.append((level - 1, child))
+    result.sort()
+    return result
+
+
+# --- global classes ---
+
+
+class TileTree(object):
+    """Quadtree of tile hashes; levels[0] holds leaf tiles, levels[depth] the root tiles."""
+
+    def __init__(self, tile_size, depth):
+        """Set leaf tile size (map units) and number of parent levels (see tree_depth)."""
+
+        self.tile_size = float(tile_size)
+        self.depth = depth
+        self.levels = [{} for level in range(depth + 1)]
+        self.rows = {}
+
+    def tile_key(self, point):
+        """Return (x, y) leaf tile key of point."""
+
+        result = (int(math.floor(point.X / self.tile_size)), int(math.floor(point.Y / self.tile_size)))
+        return result
+
+    def add(self, point, digest):
+        """Add row digest to the leaf tile containing point."""
+
+        key = self.tile_key(point)
+        if key in self.rows:
+            self.rows[key].append(digest)
+        else:
+            self.rows[key] = [digest]
+
+    def finish(self):
+        """Hash leaf tiles from their sorted row digests, then each parent level from its children."""
+
+        leaves = self.levels[0]
+        for key, digests in self.rows.items():
+            leaves[key] = combine_hashes(digests)
+        self.rows = {}
+        for level in range(1, self.depth + 1):
+            children = {}
+            for (x_tile, y_tile), tile_hash in self.levels[level - 1].items():
+                parent = (x_tile >> 1, y_tile >> 1)
+                children.setdefault(parent, []).append("%d,%d:%s" % (x_tile, y_tile, tile_hash))
+            self.levels[level] = dict((key, hashlib.sha1('|'.join(sorted(values)).encode('utf-8')).hexdigest())
+                                      for key, values in children.items())
+
+
+class TileRegion(object):
+    """Changed leaf tiles plus a halo distance; used to limit Reader records and Matcher writes."""
+
+    def __init__(self, tile_keys, tile_size, halo=0.0):
+        """Set tile keys, tile size and halo (map units)."""
+
+        self.tiles = set(tile_keys)
+        self.tile_size = float(tile_size)
+        self.halo = float(halo)
+        self.reach = int(math.ceil(self.halo / self.tile_size))
+
+    def expand(self, distance):
+        """Return region with the same tiles and the halo increased by distance."""
+
+        result = TileRegion(self.tiles, self.tile_size, self.halo + distance)
+        return result
+
+    def contains(self, point):
+        """Return True if point lies in a tile of the region or within halo of one."""
+
+        x_tile = int(math.floor(point.X / self.tile_size))
+        y_tile = int(math.floor(point.Y / self.tile_size))
+        if (x_tile, y_tile) in self.tiles:
+            return True
+        size = self.tile_size
+        for x in range(x_tile - self.reach, x_tile + self.reach + 1):
+            for y in range(y_tile - self.reach, y_tile + self.reach + 1):
+                if (x, y) in self.tiles:
+                    dx = max(x * size - point.X, 0.0, point.X - (x + 1) * size)
+                    dy = max(y * size - point.Y, 0.0, point.Y - (y + 1) * size)
+                    if math.hypot(dx, dy) <= self.halo:
+                        return True
+        return False
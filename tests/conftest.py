@@ -0,0 +1,15 @@
+import os
+import sys
+
+# tests import the data_import modules (and memory_arcpy in place of arcpy) by name, as the tools do
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for dir_name in ['data_access', 'data_import']:
+    dir_path = os.path.join(root_dir, dir_name)
+    if dir_path not in sys.path:
+        sys.path.insert(0, dir_path)
+
+import memory_arcpy
+
+memory_arcpy.install()
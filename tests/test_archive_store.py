@@ -0,0 +1,35 @@
+import os
+import shutil
+from archive_store import ArchiveStore
+
+
+def write_file(path, text):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    f = open(path, 'w')
+    f.write(text)
+    f.close()
+
+
+def test_find_archive_after_interrupted_delete(tmp_path):
+    store = ArchiveStore(str(tmp_path / 'store'))
+    dir_path = str(tmp_path / '2024_01_31_093000_current')
+    write_file(os.path.join(dir_path, 'city.gdb', 'a00000001.gdbtable'), 'rows')
+    write_file(os.path.join(dir_path, 'city.gdb', 'a00000002.gdbtable'), 'more rows')
+    backup_path = str(tmp_path / 'backup')
+    shutil.copytree(dir_path, backup_path)
+
+    assert store.find_archive(dir_path) is None
+    store.archive_directory(dir_path, '2024_01_31_093000_current')
+
+    # a delete interrupted after removing one file leaves a directory that is already archived
+    shutil.copytree(backup_path, dir_path)
+    os.remove(os.path.join(dir_path, 'city.gdb', 'a00000001.gdbtable'))
+    assert store.find_archive(dir_path) == '2024_01_31_093000_current'
+
+    # a changed file of the same size, a changed size, or the same files in another directory are not archived
+    write_file(os.path.join(dir_path, 'city.gdb', 'a00000002.gdbtable'), 'MORE ROWS')
+    assert store.find_archive(dir_path) is None
+    write_file(os.path.join(dir_path, 'city.gdb', 'a00000002.gdbtable'), 'changed rows')
+    assert store.find_archive(dir_path) is None
+    assert store.find_archive(backup_path) is None
@@ -0,0 +1,58 @@
+import os
+import memory_arcpy
+import synthetic
+from schema_cache import SchemaCache
+from gdb_compare import CompareData, content_checksum
+
+
+def make_gdb(path, features, fields):
+    """Create a file geodatabase directory at path and load features into its in-memory GravityMains class."""
+
+    if not os.path.isdir(path):
+        os.mkdir(path)
+        f = open(os.path.join(path, 'a00000001.gdbtable'), 'w')
+        f.write(os.path.basename(path))
+        f.close()
+    return synthetic.load_table(memory_arcpy, path + r'\Sanitary\GravityMains', fields, features, 'line')
+
+
+def test_cached_checksums(tmp_path):
+    memory_arcpy.reset()
+    fields, tgt_features, src_features = synthetic.make_layers(200, 'line', seed=3)
+    base_path = str(tmp_path / 'current.gdb')
+    test_path = str(tmp_path / 'city_staging.gdb')
+    make_gdb(base_path, tgt_features, fields)
+    table = make_gdb(test_path, tgt_features, fields)
+    table.rows[10][fields.index('MATERIAL') + 1] = 'EDITED'
+
+    cache = SchemaCache(str(tmp_path / 'schema_cache.sqlite'))
+    comp = CompareData(base_path, test_path, schema_cache=cache)
+    assert comp.cached_classes == 0
+    assert comp.get_changed() == ['GravityMains']
+    base_checksums = comp.base_checksums
+
+    # a renamed geodatabase keeps its token, so its checksums come from the cache without reading rows
+    # (the class registered at the new path is empty)
+    moved_path = str(tmp_path / 'archived.gdb')
+    os.rename(base_path, moved_path)
+    make_gdb(moved_path, [], fields)
+    comp = CompareData(moved_path, test_path, schema_cache=cache)
+    assert comp.cached_classes == 2
+    assert comp.base_checksums == base_checksums
+
+    assert CompareData(moved_path, test_path).base_checksums['GravityMains'][0] == 0
+    cache.close()
+
+
+def test_content_checksum(tmp_path):
+    memory_arcpy.reset()
+    fields, tgt_features, src_features = synthetic.make_layers(200, 'line', seed=5)
+    base_path = str(tmp_path / 'current.gdb')
+    test_path = str(tmp_path / 'city_staging.gdb')
+    make_gdb(base_path, tgt_features, fields)
+    table = make_gdb(test_path, list(reversed(tgt_features)), fields)
+
+    # geodatabases with different files and row order but the same rows have the same checksum
+    assert content_checksum(base_path) == content_checksum(test_path)
+    table.rows[10][fields.index('MATERIAL') + 1] = 'EDITED'
+    assert content_checksum(base_path) != content_checksum(test_path)
@@ -0,0 +1,139 @@
+import pytest
+import memory_arcpy
+import synthetic
+from benchmark import load_tools
+
+tools = load_tools()
+
+import import_tool
+from config import class_config, oper_config
+
+city = 'BEAVERTON'
+class_name = 'GravityMains'
+src_dbpath = r'C:\test\city.gdb'
+base_dbpath = r'C:\test\base.gdb'
+region_dbpath = r'C:\test\region.sde'
+full_dbpath = r'C:\test\full.sde'
+
+
+def class_path(dbpath, prefix=''):
+    return r'%s\%sSanitary\%s%s' % (dbpath, prefix, prefix, class_name)
+
+
+def load_tables(base_features, src_features, tgt_features):
+    """Load base and source GravityMains tables and two copies of the target; return the field names."""
+
+    config_info = class_config['Sanitary'][class_name]
+    fields = [f for f in config_info['update_fields'] if f != 'SHAPE@'] + \
+        [config_info['juris_field'], config_info['maint_field']]
+    positions = [synthetic.line_fields.index(f) if f in synthetic.line_fields else None for f in fields]
+
+    def to_fields(features):
+        return [([attrs[i] if i is not None else None for i in positions], coords) for attrs, coords in features]
+
+    synthetic.load_table(memory_arcpy, class_path(base_dbpath), fields, to_fields(base_features), 'line')
+    synthetic.load_table(memory_arcpy, class_path(src_dbpath), fields, to_fields(src_features), 'line')
+    for dbpath in [region_dbpath, full_dbpath]:
+        synthetic.load_table(memory_arcpy, class_path(dbpath, import_tool.sde_prefix), fields,
+                             to_fields(tgt_features), 'line')
+    return fields
+
+
+def table_rows(dbpath):
+    """Return sorted (values, coordinates) of the target rows, without object ids."""
+
+    table = memory_arcpy.get_table(class_path(dbpath, import_tool.sde_prefix))
+    result = sorted((tuple(row[1:-1]), tuple(row[-1].coords)) for row in table.rows.values())
+    return result
+
+
+class StubConnection(object):
+    """Connection stand-in that counts get_path calls."""
+
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0
+
+    def get_path(self):
+        self.calls += 1
+        return self.path
+
+
+def run_imports(memory_budget_mb=None):
+    """Import the source into the region target (changed since base) and the full target; return both rows.
+
+    The full target is passed as a connection, which import_city validates once.
+    """
+
+    connection = StubConnection(full_dbpath)
+    for target, changed_since in [(region_dbpath, base_dbpath), (connection, None)]:
+        import_tool.import_city(city, src_dbpath, target, [class_name], resume=False,
+                                memory_budget_mb=memory_budget_mb, base_dbpath=changed_since)
+    assert connection.calls == 1
+    return table_rows(region_dbpath), table_rows(full_dbpath)
+
+
+@pytest.fixture
+def import_env(tmp_path, monkeypatch):
+    """Enable every operation, log to tmp_path and install a fresh memory_arcpy."""
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(import_tool, 'log_dir', str(tmp_path))
+    for oper_name in oper_config['status']:
+        monkeypatch.setitem(oper_config['status'][oper_name], 'enabled', True)
+    memory_arcpy.reset()
+    memory_arcpy.install()
+
+
+def edit_corner(features, side):
+    """Return features with attributes of those in the lower left corner edited, one removed and one added."""
+
+    result = []
+    removed = False
+    for attrs, coords in features:
+        if coords[0][0] < side * 0.2 and coords[0][1] < side * 0.2:
+            if not removed:
+                removed = True
+                continue
+            attrs = list(attrs)
+            attrs[2] = 'EDITED'
+        result.append((attrs, coords))
+    result.append((['NEW0001', 8.0, 'PVC', 0.01, city, city], [(10.0, 10.0), (60.0, 10.0)]))
+    return result
+
+
+@pytest.mark.parametrize('memory_budget_mb', [None, 0.01])
+def test_geom_region_import_matches_full_import(import_env, monkeypatch, memory_budget_mb):
+    partitioned = []
+    matcher_class = import_tool.PartitionedMatcher
+
+    def make_partitioned(*args):
+        partitioned.append(args[10] if len(args) > 10 else None)
+        return matcher_class(*args)
+
+    monkeypatch.setattr(import_tool, 'PartitionedMatcher', make_partitioned)
+    fields, tgt_features, src_features = synthetic.make_layers(1500, 'line', seed=9)
+    side = synthetic.extent_side(1500, 2000.0)
+    load_tables(tgt_features, edit_corner(tgt_features, side), tgt_features)
+
+    region_rows, full_rows = run_imports(memory_budget_mb)
+    assert region_rows == full_rows
+    # over budget, the changed region is matched by partition too
+    assert any(region is not None for region in partitioned) == bool(memory_budget_mb)
+
+
+def test_attr_region_import_matches_full_import(import_env, monkeypatch):
+    monkeypatch.setitem(class_config['Sanitary'][class_name], 'match_type', 'attr')
+    fields, tgt_features, src_features = synthetic.make_layers(1500, 'line', seed=9)
+    side = synthetic.extent_side(1500, 2000.0)
+
+    # the target's copy of a feature far from the edited corner lies in the corner; by key it matches
+    # an unchanged source feature outside the changed tiles
+    far = max(range(len(tgt_features)), key=lambda i: tgt_features[i][1][0][0] + tgt_features[i][1][0][1])
+    moved_features = list(tgt_features)
+    moved_features[far] = (tgt_features[far][0], [(30.0, 30.0), (90.0, 30.0)])
+    load_tables(tgt_features, edit_corner(tgt_features, side), moved_features)
+
+    region_rows, full_rows = run_imports()
+    assert region_rows == full_rows
+    assert [row for row in region_rows if row[0][3] == tgt_features[far][0][0]]
@@ -0,0 +1,35 @@
+import os
+from journal import workspace_token
+
+
+def write_table(path, data, mtime):
+    f = open(path, 'wb')
+    f.write(data)
+    f.close()
+    os.utime(path, (mtime, mtime))
+
+
+def test_same_size_edit_in_same_second_changes_token(tmp_path):
+    gdb_path = str(tmp_path / 'city.gdb')
+    os.mkdir(gdb_path)
+    table_path = os.path.join(gdb_path, 'a00000009.gdbtable')
+    write_table(table_path, b'\x03' + b'\x00' * 63, 1700000000.25)
+    token = workspace_token(gdb_path)
+
+    # rewritten later in the same second with the same size
+    write_table(table_path, b'\x04' + b'\x00' * 63, 1700000000.75)
+    assert workspace_token(gdb_path) != token
+
+    # rewritten with the same size and modified time: only the table header tells
+    token = workspace_token(gdb_path)
+    write_table(table_path, b'\x05' + b'\x00' * 63, 1700000000.75)
+    assert workspace_token(gdb_path) != token
+
+
+def test_token_does_not_depend_on_path(tmp_path):
+    gdb_path = str(tmp_path / 'city.gdb')
+    os.mkdir(gdb_path)
+    write_table(os.path.join(gdb_path, 'a00000009.gdbtable'), b'\x03' * 64, 1700000000.25)
+    token = workspace_token(gdb_path)
+    os.rename(gdb_path, str(tmp_path / 'archived.gdb'))
+    assert workspace_token(str(tmp_path / 'archived.gdb')) == token
@@ -0,0 +1,76 @@
+import pytest
+import memory_arcpy
+import synthetic
+import spill
+from benchmark import load_tools
+
+tools = load_tools()
+
+src_path = r'C:\test\src.gdb\Sanitary\GravityMains'
+tgt_path = r'C:\test\tgt.sde\sde.Sanitary\sde.GravityMains'
+part_tgt_path = r'C:\test\part.sde\sde.Sanitary\sde.GravityMains'
+read_fields = ['OID@', 'CITYID', 'SHAPE@']
+match_dist = 30.0
+match_angle = 45.0
+grid_size = match_dist * 3.0
+
+
+def table_rows(path):
+    """Return rows of the in-memory table at path as comparable tuples (OID, values, coordinates)."""
+
+    table = memory_arcpy.get_table(path)
+    result = sorted((row[0], tuple(row[1:-1]), tuple(row[-1].coords)) for row in table.rows.values())
+    return result
+
+
+def write_all(matcher, path, fields):
+    """Run update, insert and delete for matcher against path and return the Writer."""
+
+    writer = tools.Writer(matcher, path)
+    update_fields = [f for f in ['CITYID', 'DIAMETER', 'MATERIAL', 'SHAPE@'] if f == 'SHAPE@' or f in fields]
+    assert writer.update(update_fields, 'geom') == 1
+    assert writer.insert(update_fields + fields[-2:], 'geom') == 1
+    assert writer.delete('geom') == 1
+    return writer
+
+
+@pytest.mark.parametrize('kind', ['line', 'point'])
+def test_partitioned_matcher_matches_matcher(kind, monkeypatch):
+    monkeypatch.setattr(tools, 'write_batch_rows', 500)
+    memory_arcpy.reset()
+    fields, tgt_features, src_features = synthetic.make_layers(3000, kind, seed=3)
+    synthetic.load_table(memory_arcpy, src_path, fields, src_features, kind)
+    synthetic.load_table(memory_arcpy, tgt_path, fields, tgt_features, kind)
+    synthetic.load_table(memory_arcpy, part_tgt_path, fields, tgt_features, kind)
+
+    src_reader = tools.Reader(src_path)
+    src_reader.read(read_fields)
+    tgt_reader = tools.Reader(tgt_path)
+    tgt_extent = tools.expand_extent(src_reader.extent, grid_size)
+    tgt_reader.read(read_fields, tgt_extent, "")
+    matcher = tools.Matcher(src_reader, tgt_reader, 'CITYID', match_dist, match_angle, grid_size)
+    matcher.find_matches()
+
+    part_src_reader = tools.Reader(src_path)
+    part_tgt_reader = tools.Reader(part_tgt_path)
+    extent = tools.combine_extents([part_src_reader.extent, part_tgt_reader.extent])
+    tile_bins = spill.partition_bins(extent, grid_size, 100e6, 5e6)
+    part_matcher = tools.PartitionedMatcher(part_src_reader, part_tgt_reader, 'CITYID', match_dist, match_angle,
+                                            grid_size, tile_bins, tgt_extent, "")
+    try:
+        part_matcher.find_matches()
+        assert len(part_matcher.store.partitions()) > 1
+
+        assert part_matcher.attr_matches == matcher.attr_matches
+        assert part_matcher.geom_matches == matcher.geom_matches
+        for match_type in matcher.unmatched:
+            assert sorted(part_matcher.unmatched[match_type]) == sorted(matcher.unmatched[match_type])
+        assert sorted(part_matcher.tgt_oid_index.keys()) == sorted(matcher.tgt_oid_index.keys())
+
+        writer = write_all(matcher, tgt_path, fields)
+        part_writer = write_all(part_matcher, part_tgt_path, fields)
+        assert part_writer.proc_matches == writer.proc_matches
+    finally:
+        part_matcher.close()
+
+    assert table_rows(part_tgt_path) == table_rows(tgt_path)
@@ -0,0 +1,64 @@
+import pytest
+import memory_arcpy
+import synthetic
+import replay
+from benchmark import load_tools
+
+tools = load_tools()
+
+import import_tool
+from config import class_config
+
+city = 'TESTCITY'
+src_dbpath = r'C:\test\city.gdb'
+tgt_dbpath = r'C:\test\server.sde'
+class_name = 'GravityMains'
+
+
+def load_city_tables():
+    """Create source and target GravityMains tables from synthetic layers and return the target path."""
+
+    config_info = class_config['Sanitary'][class_name]
+    fields = [f for f in config_info['update_fields'] if f != 'SHAPE@'] + \
+        [config_info['juris_field'], config_info['maint_field']]
+    synthetic_fields, tgt_features, src_features = synthetic.make_layers(1500, 'line', seed=5)
+    positions = [synthetic_fields.index(f) if f in synthetic_fields else None for f in fields]
+
+    def to_fields(features):
+        return [([attrs[i] if i is not None else None for i in positions], coords) for attrs, coords in features]
+
+    tgt_path = r'%s\%sSanitary\%s%s' % (tgt_dbpath, import_tool.sde_prefix, import_tool.sde_prefix, class_name)
+    synthetic.load_table(memory_arcpy, r'%s\Sanitary\%s' % (src_dbpath, class_name), fields,
+                         to_fields(src_features), 'line')
+    synthetic.load_table(memory_arcpy, tgt_path, fields, to_fields(tgt_features), 'line')
+    return tgt_path
+
+
+@pytest.mark.parametrize('memory_budget_mb', [None, 1])
+def test_record_replay_round_trip(memory_budget_mb, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(import_tool, 'log_dir', str(tmp_path))
+    memory_arcpy.reset()
+    memory_arcpy.install()
+    load_city_tables()
+    fixture_path = str(tmp_path / 'fixture.json.gz')
+
+    recorder = replay.start_recording(fixture_path)
+    try:
+        result = import_tool.import_city(city, src_dbpath, tgt_dbpath, [class_name], resume=False,
+                                         memory_budget_mb=memory_budget_mb)
+    finally:
+        replay.stop_recording(recorder, city=city, src_dbpath=src_dbpath, tgt_dbpath=tgt_dbpath,
+                              class_names=[class_name], memory_budget_mb=memory_budget_mb)
+    assert result == {('Sanitary', class_name, 'update'): 1}
+
+    # replay serves every call from the fixture: the tables are not needed
+    memory_arcpy.reset()
+    try:
+        player, elapsed = replay.run_replay(fixture_path)
+    finally:
+        memory_arcpy.install()
+
+    assert len(player.writes) > 0
+    assert replay.compare_writes(player.fixture['writes'], player.writes) == ([], [])
+    assert bool(player.fixture['counts']) == bool(memory_budget_mb)
@@ -0,0 +1,72 @@
+import pytest
+import memory_arcpy
+import schema_mapper
+
+source_gdb = r'C:\test\city.gdb'
+template_gdb = r'C:\test\template.gdb'
+dest_gdb = r'C:\test\simple.gdb'
+spec = {'template': template_gdb,
+        'domains': {'material': {'1': 'PVC', '2': 'CONC'}},
+        'classes': [{'source': 'Sanitary/Mains', 'target': 'SimpleSewer/GravityMains',
+                     'fields': {'CITYID': 'ID', 'MATERIAL': {'source': 'MAT', 'domain': 'material'}}},
+                    {'source': 'Sanitary/Cleanouts', 'target': 'SimpleSewer/Cleanouts',
+                     'fields': {'CITYID': 'ID', 'DEPTH': {'source': 'DEPTH', 'type': 'float'}}}]}
+
+
+@pytest.fixture
+def gdbs(monkeypatch):
+    """Create source and template tables; Copy_management and Delete_management act on registered tables."""
+
+    memory_arcpy.reset()
+    mains = memory_arcpy.create_table(source_gdb + r'\Sanitary\Mains', ['ID', 'MAT'])
+    cleanouts = memory_arcpy.create_table(source_gdb + r'\Sanitary\Cleanouts', ['ID', 'DEPTH'], 'point')
+    for i in range(7):
+        mains.add_row(['M%d' % i, '1' if i % 2 else '2'], memory_arcpy.Geometry('polyline', [(i, 0.0), (i, 5.0)]))
+        cleanouts.add_row(['C%d' % i, str(i * 1.5)], memory_arcpy.Geometry('point', [(i, 1.0)]))
+    memory_arcpy.create_table(template_gdb + r'\SimpleSewer\GravityMains', ['CITYID', 'MATERIAL'])
+    memory_arcpy.create_table(template_gdb + r'\SimpleSewer\Cleanouts', ['CITYID', 'DEPTH'], 'point')
+
+    def copy(in_data, out_data):
+        for table in list(memory_arcpy.tables.values()):
+            if table.path.lower().startswith(in_data.lower() + '\\'):
+                memory_arcpy.create_table(out_data + table.path[len(in_data):], table.field_names[1:-1],
+                                          table.shape_type)
+
+    def delete(in_data):
+        for key in [key for key in memory_arcpy.tables if key.startswith(in_data.lower() + '\\')]:
+            del memory_arcpy.tables[key]
+
+    monkeypatch.setattr(memory_arcpy, 'Copy_management', copy, raising=False)
+    monkeypatch.setattr(memory_arcpy, 'Delete_management', delete, raising=False)
+
+
+def test_run_maps_classes_in_batched_operations(gdbs, monkeypatch):
+    calls = []
+    monkeypatch.setattr(memory_arcpy.Editor, 'startOperation', lambda self: calls.append('start'))
+    monkeypatch.setattr(memory_arcpy.Editor, 'stopEditing', lambda self, save=True: calls.append(('stop', save)))
+    monkeypatch.setattr(schema_mapper, 'insert_batch_rows', 3)
+
+    counts = schema_mapper.SchemaMapper(spec).run(source_gdb, dest_gdb)
+
+    assert counts == {'SimpleSewer/GravityMains': 7, 'SimpleSewer/Cleanouts': 7}
+    mains = memory_arcpy.get_table(dest_gdb + r'\SimpleSewer\GravityMains')
+    assert sorted(row[1:3] for row in mains.rows.values())[:2] == [['M0', 'CONC'], ['M1', 'PVC']]
+    # 7 rows in batches of 3 are 3 operations per class, each class in its own saved edit session
+    assert calls == ['start'] * 3 + [('stop', True)] + ['start'] * 3 + [('stop', True)]
+
+
+def test_failed_class_deletes_output(gdbs, monkeypatch):
+    insert_row = memory_arcpy.InsertCursor.insertRow
+
+    def failing_insert(self, values):
+        if values[0] == 'C4':
+            raise RuntimeError("row not valid")
+        return insert_row(self, values)
+
+    monkeypatch.setattr(memory_arcpy.InsertCursor, 'insertRow', failing_insert)
+    with pytest.raises(RuntimeError) as error:
+        schema_mapper.SchemaMapper(spec).run(source_gdb, dest_gdb)
+
+    assert 'Sanitary/Cleanouts to SimpleSewer/Cleanouts' in str(error.value)
+    assert 'row not valid' in str(error.value)
+    assert not memory_arcpy.Exists(dest_gdb + r'\SimpleSewer\GravityMains')
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+from schema_reader import GeoPackageSchemaReader, get_reader
+from schema_cache import SchemaCache
+from gdb_compare import CompareGDB
+
+
+def make_geopackage(path, extra_field=None):
+    """Create a geopackage with a GravityMains line table and a MATERIAL domain at path."""
+
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE gpkg_contents (table_name TEXT PRIMARY KEY, data_type TEXT)")
+    conn.execute("CREATE TABLE gpkg_geometry_columns (table_name TEXT, column_name TEXT, geometry_type_name TEXT)")
+    conn.execute("CREATE TABLE gpkg_data_columns (table_name TEXT, column_name TEXT, constraint_name TEXT)")
+    conn.execute("CREATE TABLE gpkg_data_column_constraints (constraint_name TEXT, value TEXT)")
+    columns = "fid INTEGER PRIMARY KEY, geom BLOB, CITYID TEXT, DIAMETER DOUBLE, MATERIAL TEXT(10)"
+    if extra_field:
+        columns += ", %s INTEGER" % extra_field
+    conn.execute("CREATE TABLE GravityMains (%s)" % columns)
+    conn.execute("INSERT INTO gpkg_contents VALUES ('GravityMains', 'features')")
+    conn.execute("INSERT INTO gpkg_geometry_columns VALUES ('GravityMains', 'geom', 'MULTILINESTRING')")
+    conn.execute("INSERT INTO gpkg_data_columns VALUES ('GravityMains', 'MATERIAL', 'Material')")
+    conn.execute("INSERT INTO gpkg_data_column_constraints VALUES ('Material', 'PVC')")
+    conn.commit()
+    conn.close()
+
+
+def test_geopackage_reader_values(tmp_path):
+    path = str(tmp_path / 'city.gpkg')
+    make_geopackage(path)
+
+    assert isinstance(get_reader(path), GeoPackageSchemaReader)
+    values = GeoPackageSchemaReader().read(path)
+
+    fc_vals = ['GravityMains', 'esriGeometryPolyline']
+    assert values['domains'] == [['Material', 'esriFieldTypeString']]
+    assert values['feat_classes'] == [fc_vals]
+    assert values['class_fields'] == [[fc_vals, [['fid', 'esriFieldTypeOID'],
+                                                 ['geom', 'esriFieldTypeGeometry'],
+                                                 ['CITYID', 'esriFieldTypeString'],
+                                                 ['DIAMETER', 'esriFieldTypeDouble'],
+                                                 ['MATERIAL', 'esriFieldTypeString']]]]
+
+
+def test_compare_geopackages_with_schema_cache(tmp_path):
+    base_path = str(tmp_path / 'base.gpkg')
+    test_path = str(tmp_path / 'test.gpkg')
+    make_geopackage(base_path)
+    make_geopackage(test_path, extra_field='SLOPE')
+    cache = SchemaCache(str(tmp_path / 'cache.sqlite'))
+    try:
+        comp = CompareGDB(base_path, test_path, cache)
+        assert comp.schema_sources == {base_path: 'direct', test_path: 'direct'}
+        assert not comp.is_unchanged()
+        assert "('SLOPE', 'esriFieldTypeInteger')" in comp.make_report()
+
+        renamed_path = str(tmp_path / 'renamed.gpkg')
+        os.rename(test_path, renamed_path)
+        comp = CompareGDB(base_path, renamed_path, cache)
+        assert comp.schema_sources == {base_path: 'cache', renamed_path: 'cache'}
+        assert not comp.is_unchanged()
+    finally:
+        cache.close()
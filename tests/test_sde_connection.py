@@ -0,0 +1,86 @@
+import os
+import sys
+import types
+import pytest
+from sde_connection import SdeConnection, LocalConnection, ConnectionFile, open_connection
+
+params = {'database_platform': 'SQL_SERVER', 'instance': 'gisdb', 'account_authentication': 'DATABASE_AUTH',
+          'username': 'gis', 'password': 'secret', 'save_user_pass': 'SAVE_USERNAME', 'database': 'GISBUG',
+          'schema': 'SDE', 'version_type': 'TRANSACTIONAL', 'version': 'sde.DEFAULT'}
+
+
+@pytest.fixture
+def fake_arcpy(monkeypatch):
+    """Install an arcpy stand-in whose connection files are plain files; return the list of created names."""
+
+    created = []
+    module = types.ModuleType('arcpy')
+    module.env = types.SimpleNamespace(overwriteOutput=False)
+
+    def create_connection(out_dir, out_name, *args):
+        created.append(out_name)
+        f = open(os.path.join(out_dir, out_name), 'w')
+        f.write(repr(args))
+        f.close()
+
+    module.CreateDatabaseConnection_management = create_connection
+    module.Exists = os.path.isfile
+    module.Describe = lambda path: types.SimpleNamespace(workspaceType='RemoteDatabase')
+    monkeypatch.setitem(sys.modules, 'arcpy', module)
+    return created
+
+
+def test_missing_parameters():
+    with pytest.raises(ValueError):
+        SdeConnection('.', **dict((k, v) for k, v in params.items() if k != 'password'))
+
+
+def test_connection_file_is_reused(tmp_path, fake_arcpy):
+    conn_dir = str(tmp_path)
+    path = SdeConnection(conn_dir, **params).get_path()
+    assert os.path.isfile(path)
+    assert fake_arcpy == [os.path.basename(path)]
+
+    # a new instance (e.g. the next run) reuses the valid file
+    assert SdeConnection(conn_dir, **params).get_path() == path
+    assert len(fake_arcpy) == 1
+
+
+def test_changed_parameters_replace_file(tmp_path, fake_arcpy):
+    conn_dir = str(tmp_path)
+    old_path = SdeConnection(conn_dir, **params).get_path()
+    new_params = dict(params, version='sde.QA')
+    new_path = SdeConnection(conn_dir, **new_params).get_path()
+
+    assert new_path != old_path
+    assert not os.path.exists(old_path)
+    assert sorted(os.listdir(conn_dir)) == [os.path.basename(new_path)]
+
+
+def test_invalidate_checks_file_again(tmp_path, fake_arcpy):
+    conn = SdeConnection(str(tmp_path), **params)
+    path = conn.get_path()
+    os.remove(path)
+    assert conn.get_path() == path
+    assert len(fake_arcpy) == 1
+
+    conn.invalidate()
+    assert conn.get_path() == path
+    assert os.path.isfile(path)
+    assert len(fake_arcpy) == 2
+
+
+def test_local_connection(tmp_path):
+    assert LocalConnection(str(tmp_path)).get_path() == str(tmp_path)
+    with pytest.raises(IOError):
+        LocalConnection(str(tmp_path / 'missing.gdb')).get_path()
+
+
+def test_open_connection(tmp_path, fake_arcpy):
+    path = SdeConnection(str(tmp_path), **params).get_path()
+    conn = open_connection(path)
+    assert isinstance(conn, ConnectionFile)
+    assert conn.get_path() == path
+    assert isinstance(open_connection(str(tmp_path)), LocalConnection)
+    with pytest.raises(IOError):
+        open_connection(str(tmp_path / 'missing.sde')).get_path()
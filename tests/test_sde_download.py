@@ -0,0 +1,33 @@
+import memory_arcpy
+import synthetic
+from sde_download import dataset_signature, stage_city
+
+server_path = r'C:\conn\gisbug.sde'
+ds_name = 'GISBUG.TIGARD.SewerStormwater'
+current_path = r'C:\data\current\2024_01_31_TIGARD.gdb'
+
+
+def run_stage(monkeypatch, previous):
+    """Stage the TIGARD dataset with previous signatures; return (downloaded, carried over) names."""
+
+    monkeypatch.setattr(memory_arcpy, 'CreateFileGDB_management', lambda *args: None, raising=False)
+    monkeypatch.setattr(memory_arcpy, 'Copy_management', lambda *args: None, raising=False)
+    monkeypatch.setattr(memory_arcpy, 'Exists', lambda path: True)
+    task = ('TIGARD', r'C:\data\staging', '2024_02_01_TIGARD', server_path, [ds_name], current_path,
+            previous, False)
+    city_name, copied, carried, signatures, error = stage_city(task)
+    assert error is None
+    return copied, carried
+
+
+def test_edited_row_is_downloaded(monkeypatch):
+    memory_arcpy.reset()
+    fields, tgt_features, src_features = synthetic.make_layers(100, 'line', seed=11)
+    table = synthetic.load_table(memory_arcpy, server_path + '\\' + ds_name + r'\GravityMains', fields,
+                                 tgt_features, 'line')
+    previous = {ds_name: dataset_signature(server_path + '\\' + ds_name)}
+    assert run_stage(monkeypatch, previous) == ([], [ds_name])
+
+    # an in-place edit keeps row count and largest object id; without editor tracking it is still found
+    table.rows[5][fields.index('MATERIAL') + 1] = 'EDITED'
+    assert run_stage(monkeypatch, previous) == ([ds_name], [])
@@ -0,0 +1,34 @@
+import memory_arcpy
+import synthetic
+import tile_index
+
+base_path = r'C:\test\base.gdb\Sanitary\GravityMains'
+test_path = r'C:\test\city.gdb\Sanitary\GravityMains'
+tile_size = 720.0
+
+
+def test_changed_tiles_finds_edited_row():
+    memory_arcpy.reset()
+    fields, tgt_features, src_features = synthetic.make_layers(2000, 'line', seed=7)
+    synthetic.load_table(memory_arcpy, base_path, fields, tgt_features, 'line')
+    table = synthetic.load_table(memory_arcpy, test_path, fields, tgt_features, 'line')
+    row = table.rows[100]
+    row[fields.index('MATERIAL') + 1] = 'EDITED'
+
+    extents = [memory_arcpy.Describe(base_path).extent, memory_arcpy.Describe(test_path).extent]
+    depth = tile_index.tree_depth(extents, tile_size)
+    base_tree = tile_index.build_tree(base_path, tile_size, depth=depth)
+    test_tree = tile_index.build_tree(test_path, tile_size, depth=depth)
+
+    assert depth < 32
+    assert len(base_tree.levels[depth]) <= 4
+    assert tile_index.changed_tiles(base_tree, test_tree) == [test_tree.tile_key(row[-1].centroid)]
+
+
+def test_tree_depth():
+    # x tiles 0..5 are tiles 0 and 1 at level 2; x tiles -1..2 (across the origin) are tiles -1 and 0 at level 2
+    assert tile_index.tree_depth([memory_arcpy.Extent(0.0, 0.0, 5990.0, 100.0)], 1000.0) == 2
+    assert tile_index.tree_depth([memory_arcpy.Extent(-10.0, 0.0, 2990.0, 100.0)], 1000.0) == 2
+    assert tile_index.tree_depth([memory_arcpy.Extent(0.0, 0.0, 1990.0, 100.0)], 1000.0) == 0
+    assert tile_index.tree_depth([memory_arcpy.Extent(0.0, 0.0, 10.0, 10.0)], 1000.0) == 0
+    assert tile_index.tree_depth([memory_arcpy.Extent(float('nan'), 0.0, 1.0, 1.0)], 1000.0) == 0